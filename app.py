@@ -2,17 +2,24 @@ import streamlit as st
 import os
 from dotenv import load_dotenv
 import json
+import uuid
 from datetime import datetime
 from pathlib import Path
 
 from services.whisper_service import WhisperService
 from services.llm_service import LLMService
-from services.task_manager import TaskManager
+from services.openai_transport import OpenAITransport
+from services.response_cache import ResponseCache
+from services.task_manager import TaskManager, PRIORITIES, CATEGORIES
 from services.tts_service import TTSService
 from services.help_service import HelpService
+from services.command_parser import FastCommandRouter
 
 load_dotenv()
 
+# Tasks shown per page in the task list
+TASK_PAGE_SIZE = 20
+
 st.set_page_config(
     page_title="Voice Task Manager",
     page_icon="🎤",
@@ -26,23 +33,41 @@ def init_services():
         st.error("Please set your OPENAI_API_KEY in the .env file")
         st.stop()
     
-    whisper = WhisperService(api_key)
-    llm = LLMService(api_key)
-    task_manager = TaskManager()
+    # One pooled connection layer shared by every service and session
+    transport = OpenAITransport(
+        api_key,
+        max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "20")),
+        max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+    )
+    whisper = WhisperService(api_key, transport)
+    llm = LLMService(api_key, cache=ResponseCache(
+        max_entries=int(os.getenv("LLM_CACHE_SIZE", "256")),
+        ttl_seconds=float(os.getenv("LLM_CACHE_TTL_HOURS", "24")) * 3600,
+        path=os.getenv("LLM_CACHE_PATH") or None
+    ), transport=transport)
+    task_manager = TaskManager(
+        backend=os.getenv("TASK_STORAGE_BACKEND", "json"),
+        durability=os.getenv("TASK_STORAGE_DURABILITY", "sync"),
+        shared=os.getenv("TASK_STORAGE_SHARED", "false").lower() == "true",
+        archive_after_days=int(os.getenv("TASK_ARCHIVE_AFTER_DAYS")) if os.getenv("TASK_ARCHIVE_AFTER_DAYS") else None
+    )
     tts_service = TTSService()
     
     # Try to initialize the agent service (optional enhancement)
     agent_service = None
     try:
         from services.agent_service import AgentService
-        agent_service = AgentService(api_key, task_manager)
+        agent_service = AgentService(api_key, task_manager, transport)
         print("✅ Agent service initialized successfully")
     except Exception as e:
         print(f"ℹ️ Agent service not available (optional): {e}")
         # Continue without agent - app works fine with existing functionality
     
+    # Simple commands are carried out locally; the rest go to the agent
+    fast_path = FastCommandRouter(task_manager, threshold=float(os.getenv("FAST_PATH_THRESHOLD", "0.85")))
+    
     # Pass agent_service to HelpService (will use if available)
-    help_service = HelpService(llm, agent_service)
+    help_service = HelpService(llm, agent_service, fast_path)
     
     return whisper, llm, task_manager, tts_service, help_service
 
@@ -127,6 +152,31 @@ def render_task(task, task_manager, tts_service):
     with col_delete:
         st.button("🗑️", key=f"del_{task['id']}", on_click=delete_task, args=(task['id'],))
 
+def announce_task_changes(task_manager, since_version):
+    """Summarize this session's task changes made since a version (e.g. by the agent's tools)"""
+    feed = task_manager.changes_since(since_version)
+    # Other sessions write to the same task list meanwhile; only announce our own changes
+    events = [event for event in feed['events'] if event['actor'] == st.session_state.history_actor]
+    if not events:
+        print(f"DEBUG: Response ready, no task changes")
+        return
+    
+    counts = {'put': 0, 'delete': 0}
+    for event in events:
+        if event['op'] in counts:
+            counts[event['op']] += 1
+    print(f"DEBUG: Tasks updated (version {since_version} -> {feed['version']}): {counts}")
+    
+    parts = []
+    if counts['put']:
+        parts.append(f"{counts['put']} task{'s' if counts['put'] != 1 else ''} added or updated")
+    if counts['delete']:
+        parts.append(f"{counts['delete']} deleted")
+    if any(event['op'] == 'clear' for event in events):
+        parts.append("task list refreshed")
+    # Shown by main() after the rerun that follows
+    st.session_state.task_change_summary = ", ".join(parts).capitalize()
+
 def render_stats(stats):
     """Render enhanced statistics"""
     st.subheader("📊 Task Statistics")
@@ -148,6 +198,51 @@ def render_stats(stats):
         st.metric("Business Tasks", stats['business_tasks'])
         st.metric("Personal Tasks", stats['personal_tasks'])
 
+def render_metrics_panel(metrics):
+    """Debug panel with per-operation latency, tokens and cost of model calls"""
+    with st.expander("🔧 LLM call metrics"):
+        summary = metrics.summary()
+        if not summary:
+            st.info("No model calls yet.")
+            return
+        
+        def seconds(value):
+            return f"{value:.2f}s" if value is not None else "–"
+        
+        st.dataframe([
+            {
+                "Operation": operation,
+                "Calls": stats['calls'],
+                "Cache hits": stats['cache_hits'],
+                "p50": seconds(stats['p50_seconds']),
+                "p90": seconds(stats['p90_seconds']),
+                "p99": seconds(stats['p99_seconds']),
+                "First token p50": seconds(stats['p50_first_token_seconds']),
+                "Prompt tokens": stats['prompt_tokens'],
+                "Completion tokens": stats['completion_tokens'],
+                "Cost ($)": round(stats['cost'], 5),
+                "Retries": stats['retries'],
+                "Errors": stats['errors']
+            }
+            for operation, stats in summary.items()
+        ], use_container_width=True, hide_index=True)
+        total_cost = sum(stats['cost'] for stats in summary.values())
+        st.caption(f"Estimated cost of the last {sum(stats['calls'] for stats in summary.values())} calls: ${total_cost:.4f}")
+        
+        col_download, col_reset = st.columns(2)
+        with col_download:
+            st.download_button(
+                "Download JSON",
+                data=metrics.to_json(),
+                file_name=f"llm_metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                mime="application/json",
+                key="download_llm_metrics"
+            )
+        with col_reset:
+            if st.button("Reset", key="reset_llm_metrics"):
+                metrics.reset()
+                st.rerun()
+
 def main():
     print(f"DEBUG: === APP START ===")
     print(f"DEBUG: Session state keys: {list(st.session_state.keys())}")
@@ -157,6 +252,14 @@ def main():
     
     whisper, llm, task_manager, tts_service, help_service = init_services()
     
+    # The task manager is shared by every session; undo and redo stay within this one
+    if 'history_actor' not in st.session_state:
+        st.session_state.history_actor = uuid.uuid4().hex
+    task_manager.set_actor(st.session_state.history_actor)
+    
+    if 'task_change_summary' in st.session_state:
+        st.toast(st.session_state.pop('task_change_summary'))
+    
     # Initialize session state
     if 'mode' not in st.session_state:
         st.session_state.mode = 'braindump'
@@ -274,23 +377,8 @@ def main():
                     st.session_state.help_question = help_transcription
                     st.session_state.last_help_question_processed = help_transcription
                     
-                    # Process based on mode
-                    with st.spinner("Processing..."):
-                        # Pass mode to help service
-                        help_response = help_service.get_help_response(
-                            help_transcription, 
-                            None,  # No context needed - LLM will use tools
-                            mode=st.session_state.help_mode
-                        )
-                        st.session_state.help_response = help_response
-                        print(f"DEBUG: Help response generated from voice: {len(help_response)} characters")
-                    
-                    # Check if tasks were updated (command mode)
-                    if 'tasks_updated' in st.session_state and st.session_state.tasks_updated:
-                        print(f"DEBUG: Tasks were updated, triggering rerun")
-                        st.session_state.tasks_updated = False
-                    else:
-                        print(f"DEBUG: Response ready, triggering rerun to display")
+                    # Answered (streamed) in the response area after the rerun
+                    st.session_state.help_pending = {'question': help_transcription, 'with_tasks': False}
                     
                     # Increment audio version to reset the widget
                     st.session_state.help_audio_version += 1
@@ -311,21 +399,8 @@ def main():
                     st.session_state.help_question = help_text
                     st.session_state.last_help_question_processed = help_text
                     
-                    # Process based on mode
-                    current_tasks = task_manager.get_tasks()
-                    help_response = help_service.get_help_response(
-                        help_text,
-                        current_tasks,
-                        mode=st.session_state.help_mode
-                    )
-                    st.session_state.help_response = help_response
-                    print(f"DEBUG: Help response generated: {len(help_response)} characters")
-                    
-                    # Check if tasks were updated
-                    if 'tasks_updated' in st.session_state and st.session_state.tasks_updated:
-                        print(f"DEBUG: Tasks were updated, triggering full rerun")
-                        st.session_state.tasks_updated = False
-                    st.rerun()
+                    # Answered (streamed) in the response area below
+                    st.session_state.help_pending = {'question': help_text, 'with_tasks': True}
             
             # Response Area - FIXED AT BOTTOM
             st.divider()
@@ -335,7 +410,29 @@ def main():
                 st.markdown("**Transcribed/Input:**")
                 st.code(st.session_state.help_question)
             
-            if st.session_state.help_response:
+            pending = st.session_state.pop('help_pending', None)
+            if pending:
+                # Stream the answer as it is generated; voice feedback starts with the first sentence
+                st.markdown("**Response:**")
+                version_before = task_manager.version
+                help_response = st.write_stream(tts_service.speak_stream(help_service.stream_help_response(
+                    pending['question'],
+                    task_manager.get_tasks() if pending['with_tasks'] else None,
+                    mode=st.session_state.help_mode
+                )))
+                st.session_state.help_response = help_response if isinstance(help_response, str) else ""
+                print(f"DEBUG: Help response streamed: {len(st.session_state.help_response)} characters")
+                
+                # Check if tasks were updated (command mode); the task list below is rendered after this
+                announce_task_changes(task_manager, version_before)
+                if 'task_change_summary' in st.session_state:
+                    st.toast(st.session_state.pop('task_change_summary'))
+                
+                if st.button("Clear", key="clear_response"):
+                    st.session_state.help_response = ""
+                    st.session_state.help_question = ""
+                    st.rerun()
+            elif st.session_state.help_response:
                 # Show response
                 st.markdown("**Response:**")
                 st.markdown(st.session_state.help_response)
@@ -349,10 +446,20 @@ def main():
             else:
                 mode_label = "question" if st.session_state.help_mode == 'question' else "command"
                 st.info(f"💭 Ready for your {mode_label}...")
-    
+
+            if st.session_state.help_mode == 'command' and help_service.fast_path is not None:
+                fast_path_stats = help_service.fast_path.stats()
+                if fast_path_stats['hits'] + fast_path_stats['misses']:
+                    st.caption(
+                        f"⚡ Handled locally: {fast_path_stats['hits']} of "
+                        f"{fast_path_stats['hits'] + fast_path_stats['misses']} commands "
+                        f"({fast_path_stats['hit_rate']:.0%})"
+                    )
+
     # Call the help panel in the sidebar
     with st.sidebar:
         render_help_panel()
+        render_metrics_panel(llm.metrics)
     
     # Mode selector
     st.subheader("🎯 Mode Selection")
@@ -432,17 +539,19 @@ def main():
                     # Process based on mode
                     if st.session_state.mode == 'braindump':
                         print(f"DEBUG: Processing in BRAIN DUMP mode")
+                        # Each task is listed as soon as the model has finished writing it
+                        processed_tasks = []
+                        task_list = st.container()
                         with st.spinner("Processing brain dump..."):
-                            processed_tasks = llm.process_braindump(transcription)
-                            st.session_state.processed_tasks = processed_tasks
-                            print(f"DEBUG: Processed tasks: {processed_tasks}")
-                        
-                        if processed_tasks:
-                            st.info("AI Processed Tasks:")
-                            for task in processed_tasks:
+                            for task in llm.stream_braindump(transcription):
+                                if not processed_tasks:
+                                    task_list.info("AI Processed Tasks:")
+                                processed_tasks.append(task)
                                 priority_emoji = {"high": "🔴", "medium": "🟡", "low": "🟢"}.get(task.get('priority', 'medium'), '⚪')
                                 category_emoji = {"client": "👤", "business": "💼", "personal": "🏠"}.get(task.get('category'), '📝')
-                                st.write(f"• {priority_emoji} {category_emoji} {task.get('text', task)}")
+                                task_list.write(f"• {priority_emoji} {category_emoji} {task.get('text', task)}")
+                        st.session_state.processed_tasks = processed_tasks
+                        print(f"DEBUG: Processed tasks: {processed_tasks}")
                     else:
                         print(f"DEBUG: Processing in COMMAND mode")
                         # Command mode - should use AI Assistant panel instead
@@ -463,19 +572,23 @@ def main():
             if st.session_state.processed_tasks:
                 if st.button("Add to Task List", key="add_tasks"):
                     print(f"DEBUG: Add to Task List button clicked")
+                    new_tasks = []
                     for processed_task in st.session_state.processed_tasks:
-                        if isinstance(processed_task, dict):
-                            task_manager.add_task(
-                                processed_task.get('text', ''),
-                                priority=processed_task.get('priority', 'medium'),
-                                category=processed_task.get('category')
-                            )
-                            print(f"DEBUG: Added task: {processed_task.get('text', '')}")
-                        else:
+                        if not isinstance(processed_task, dict):
                             # Fallback for string tasks
-                            task_manager.add_task(processed_task, priority='medium', category=None)
-                            print(f"DEBUG: Added string task: {processed_task}")
-                    tts_service.speak_confirmation('task_added', f"Added {len(st.session_state.processed_tasks)} tasks")
+                            processed_task = {'text': processed_task}
+                        text = str(processed_task.get('text', '')).strip()
+                        if not text:
+                            continue
+                        new_tasks.append({
+                            'text': text,
+                            'priority': processed_task.get('priority') if processed_task.get('priority') in PRIORITIES else 'medium',
+                            'category': processed_task.get('category') if processed_task.get('category') in CATEGORIES else None
+                        })
+                    # One persisted write for the whole brain dump
+                    new_ids = task_manager.add_tasks(new_tasks)
+                    print(f"DEBUG: Added {len(new_ids)} tasks in one batch")
+                    tts_service.speak_confirmation('task_added', f"Added {len(new_ids)} tasks")
                     st.success("Tasks added!")
                     # Clear the processed tasks after adding
                     st.session_state.processed_tasks = None
@@ -509,14 +622,31 @@ def main():
         with col_prioritize:
             if st.button("Auto-Prioritize", type="secondary"):
                 print(f"DEBUG: Auto-Prioritize button clicked")
-                current_tasks = task_manager.get_tasks()
-                updated_tasks = llm.prioritize_tasks(current_tasks)
+                with st.spinner("Prioritizing..."):
+                    # One persisted write (and one undo step) for every changed priority
+                    changed_ids = llm.prioritize_and_save(
+                        task_manager,
+                        review_all=True,
+                        max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+                    )
+                print(f"DEBUG: Auto-Prioritize changed {len(changed_ids)} priorities")
                 tts_service.speak_confirmation('task_updated', "Tasks prioritized")
-                st.success("Tasks prioritized!")
+                st.success(f"Tasks prioritized! {len(changed_ids)} priorities changed.")
     
     with col2:
         st.header("📋 Task List")
         
+        col_undo, col_redo, _ = st.columns([1, 1, 4])
+        with col_undo:
+            if st.button("↩️ Undo", disabled=not task_manager.can_undo, key="undo_button"):
+                print(f"DEBUG: Undo button clicked")
+                task_manager.undo()
+                st.rerun()
+        with col_redo:
+            if st.button("↪️ Redo", disabled=not task_manager.can_redo, key="redo_button"):
+                print(f"DEBUG: Redo button clicked")
+                task_manager.redo()
+                st.rerun()
         
         tasks = task_manager.get_tasks()
         print(f"DEBUG: Retrieved {len(tasks)} tasks from task manager")
@@ -552,23 +682,42 @@ def main():
                 )
                 print(f"DEBUG: Status filter changed to: {status_filter}")
             
-            # Apply filters
-            filtered_tasks = tasks
-            
-            if priority_filter != "All":
-                priority_lower = priority_filter.lower()
-                filtered_tasks = [t for t in filtered_tasks if t.get('priority') == priority_lower]
+            sort_option = st.selectbox(
+                "Sort by",
+                ["Created", "Recently modified", "Priority"],
+                key="sort_option"
+            )
+            sort_by, descending = {
+                "Created": ('created_at', False),
+                "Recently modified": ('modified_at', True),
+                "Priority": ('priority', False)
+            }[sort_option]
             
-            if category_filter != "All":
-                category_lower = category_filter.lower()
-                filtered_tasks = [t for t in filtered_tasks if t.get('category') == category_lower]
+            # Start from the first page whenever the filters or sort order change
+            query_key = (priority_filter, category_filter, status_filter, sort_option)
+            if st.session_state.get('task_query_key') != query_key:
+                st.session_state.task_query_key = query_key
+                st.session_state.task_page_cursors = [None]
+            cursors = st.session_state.task_page_cursors
             
-            if status_filter == "Pending":
-                filtered_tasks = [t for t in filtered_tasks if not t['completed']]
-            elif status_filter == "Completed":
-                filtered_tasks = [t for t in filtered_tasks if t['completed']]
+            # Apply filters, sort and paging (answered from the maintained sort orders)
+            try:
+                page = task_manager.query_tasks(
+                    priority=priority_filter.lower() if priority_filter != "All" else None,
+                    category=category_filter.lower() if category_filter != "All" else None,
+                    status=status_filter.lower() if status_filter != "All" else None,
+                    sort_by=sort_by,
+                    descending=descending,
+                    limit=TASK_PAGE_SIZE,
+                    cursor=cursors[-1]
+                )
+            except ValueError:
+                # The page's cursor no longer applies; go back to the start
+                st.session_state.task_page_cursors = [None]
+                st.rerun()
+            filtered_tasks = page['tasks']
             
-            print(f"DEBUG: After filtering: {len(filtered_tasks)} tasks")
+            print(f"DEBUG: After filtering: {len(filtered_tasks)} of {page['total']} tasks on page {len(cursors)}")
             
             # Display filtered tasks
             if not filtered_tasks:
@@ -577,10 +726,35 @@ def main():
                 for task in filtered_tasks:
                     render_task(task, task_manager, tts_service)
                     st.divider()
+                
+                first = (len(cursors) - 1) * TASK_PAGE_SIZE + 1
+                col_prev, col_page, col_next = st.columns([1, 2, 1])
+                with col_prev:
+                    if st.button("◀ Previous", disabled=len(cursors) == 1, key="task_page_prev"):
+                        cursors.pop()
+                        st.rerun()
+                with col_page:
+                    st.caption(f"Showing {first}–{first + len(filtered_tasks) - 1} of {page['total']}")
+                with col_next:
+                    if st.button("Next ▶", disabled=page['next_cursor'] is None, key="task_page_next"):
+                        cursors.append(page['next_cursor'])
+                        st.rerun()
         
         # Enhanced statistics
         if tasks:
             render_stats(task_manager.get_stats())
+        
+        # Archived tasks are read-only and loaded only when asked for
+        with st.expander("🗄️ Archived tasks"):
+            if st.checkbox("Show archived tasks", key="show_archived"):
+                archived = task_manager.get_archived_tasks()
+                if not archived:
+                    st.info("No archived tasks.")
+                for task in reversed(archived[-TASK_PAGE_SIZE:]):
+                    completed_on = (task.get('completed_at') or '')[:10]
+                    st.markdown(f"✅ ~~{task['text']}~~ · completed {completed_on}")
+                if len(archived) > TASK_PAGE_SIZE:
+                    st.caption(f"Showing the {TASK_PAGE_SIZE} most recently archived of {len(archived)}")
     
     print(f"DEBUG: === APP END ===")
 
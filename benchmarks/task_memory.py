@@ -0,0 +1,61 @@
+"""
+Memory used by the in-memory task store: plain dicts vs Task records.
+
+Usage: python benchmarks/task_memory.py [task_count]
+"""
+
+import sys
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.task_record import Task
+
+PRIORITIES = ('high', 'medium', 'low')
+CATEGORIES = ('client', 'business', 'personal', None)
+
+
+def make_dicts(count):
+    """Task dicts as they come out of json.load (fresh strings per task)"""
+    start = datetime(2024, 1, 1, 9, 0, 0, 123456)
+    tasks = []
+    for i in range(count):
+        created = (start + timedelta(minutes=i)).isoformat()
+        tasks.append({
+            'id': str(uuid.uuid4()),
+            'text': f"Task number {i} with a short description",
+            'priority': ''.join(PRIORITIES[i % 3]),
+            'category': CATEGORIES[i % 4] and ''.join(CATEGORIES[i % 4]),
+            'completed': i % 5 == 0,
+            'created_at': created,
+            'modified_at': created,
+            'completed_at': created if i % 5 == 0 else None
+        })
+    return tasks
+
+
+def measure(build):
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    dicts, dict_size = measure(lambda: make_dicts(count))
+    # The intermediate dicts are freed; only what the records retain is counted
+    records, record_size = measure(lambda: [Task.from_dict(task) for task in make_dicts(count)])
+
+    print(f"{count} tasks")
+    print(f"  dict:  {dict_size / 1024:10.1f} KiB  ({dict_size / count:6.0f} bytes/task)")
+    print(f"  Task:  {record_size / 1024:10.1f} KiB  ({record_size / count:6.0f} bytes/task)")
+    print(f"  saved: {1 - record_size / dict_size:10.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,12 +4,16 @@ This service provides a modular agent using direct LangChain tools
 while maintaining compatibility with the existing app architecture.
 """
 
-from typing import Dict, Any, Optional
-import asyncio
+from typing import Dict, Any, AsyncIterator, Iterator, Optional
 import streamlit as st
 from langchain_openai import ChatOpenAI
 from langgraph.prebuilt import create_react_agent
-from langchain_core.tools import tool
+from langchain_core.tools import tool, StructuredTool
+
+from services.async_task_manager import AsyncTaskManager
+from services.openai_transport import OpenAITransport, get_transport
+from services.task_query import PAGE_SIZE
+from services.task_search import is_unambiguous
 
 class AgentService:
     """
@@ -17,19 +21,31 @@ class AgentService:
     This runs alongside the existing LLMService without breaking current functionality.
     """
     
-    def __init__(self, api_key: str, task_manager):
+    def __init__(self, api_key: str, task_manager, transport: Optional[OpenAITransport] = None):
         """
         Initialize the agent service with direct LangChain tools.
         
         Args:
             api_key: OpenAI API key
             task_manager: Task manager instance for performing actions
+            transport: Shared OpenAI transport (the process-wide one for the key by default)
         """
         self.api_key = api_key
         self.task_manager = task_manager
+        self.transport = transport if transport is not None else get_transport(api_key)
+        # Tools run their TaskManager calls on this pool when the agent is invoked asynchronously
+        self.async_task_manager = AsyncTaskManager(task_manager)
+        self.metrics = self.transport.metrics
+        self.model = "gpt-5-nano"  # GPT-5 nano: 3x cheaper than GPT-4o-mini, 3x more context
+        # Same connection pools as the other services; ChatOpenAI's SDK client does its own (jittered) retries
         self.llm = ChatOpenAI(
-            model="gpt-5-nano",  # GPT-5 nano: 3x cheaper than GPT-4o-mini, 3x more context
-            api_key=api_key
+            model=self.model,
+            api_key=api_key,
+            http_client=self.transport.http_client,
+            http_async_client=self.transport.async_http_client,
+            timeout=self.transport.timeout('agent'),
+            max_retries=self.transport.max_retries,
+            stream_usage=True  # streamed replies report their token usage too
         )
         
         # Create tools directly
@@ -58,40 +74,95 @@ Always execute actions rather than explaining how to do them."""
         task_manager = self.task_manager
         
         @tool
-        def list_tasks(show_completed: bool = False) -> str:
+        def list_tasks(show_completed: bool = False, priority: Optional[str] = None, category: Optional[str] = None,
+                       sort_by: str = "created_at", limit: int = PAGE_SIZE, cursor: Optional[str] = None) -> str:
             """
-            List all tasks in the system with their IDs.
+            List tasks in the system with their IDs, one page at a time.
             
             IMPORTANT: This returns task IDs that you need for other operations like toggle_task.
             
             Args:
                 show_completed: Whether to include completed tasks (default: False, only shows pending)
+                priority: Only list tasks with this priority - 'high', 'medium' or 'low' (optional)
+                category: Only list tasks in this category - 'client', 'business' or 'personal' (optional)
+                sort_by: 'created_at' (oldest first, default), 'modified_at' (recently changed first)
+                         or 'priority' (high first)
+                limit: Number of tasks per page (default: 20)
+                cursor: The cursor printed at the end of the previous page, to fetch the next one
             
             Returns:
-                A formatted list of tasks with their IDs, status, text, and priority
+                A formatted page of tasks with their IDs, status, text, and priority,
+                followed by a cursor when more tasks remain
             """
             print(f"\n{'='*50}")
             print(f"LIST_TASKS TOOL CALLED BY LLM")
-            print(f"show_completed: {show_completed}")
+            print(f"show_completed: {show_completed}, priority: {priority}, category: {category}")
+            print(f"sort_by: {sort_by}, limit: {limit}, cursor: {cursor}")
             print(f"{'='*50}\n")
             
-            tasks = task_manager.get_tasks()
-            
-            if show_completed:
-                task_list = tasks
-            else:
-                task_list = [t for t in tasks if not t.get('completed', False)]
+            try:
+                page = task_manager.query_tasks(
+                    priority=priority,
+                    category=category,
+                    status=None if show_completed else 'pending',
+                    sort_by=sort_by,
+                    descending=sort_by == 'modified_at',
+                    limit=limit,
+                    cursor=cursor
+                )
+            except ValueError as e:
+                return f"❌ Error: {str(e)}"
+            task_list = page['tasks']
             
             if not task_list:
                 return "No tasks found."
             
-            result = "Tasks:\n"
+            result = f"Tasks ({len(task_list)} of {page['total']}):\n"
             for i, task in enumerate(task_list, 1):
                 status = "✅" if task.get('completed', False) else "⬜"
                 priority = task.get('priority', 'medium') or 'medium'  # Handle None
                 category = task.get('category', 'none') or 'none'  # Handle None
                 result += f"{i}. {status} [{task['id']}] {task['text']} (Priority: {priority}, Category: {category})\n"
             
+            if page['next_cursor']:
+                result += f"\nMore tasks available: call list_tasks again with cursor='{page['next_cursor']}'\n"
+            
+            return result
+        
+        @tool
+        def find_tasks(query: str, limit: int = 5) -> str:
+            """
+            Find tasks whose text matches a description, best match first.
+            
+            Use this instead of list_tasks when the user refers to a task by what it says
+            (e.g. "the dentist one", "mark buy milk as done"). It returns task IDs for
+            complete_task, update_task and delete_task.
+            
+            Args:
+                query: Words from the task description
+                limit: Maximum number of matches to return (default: 5)
+            
+            Returns:
+                Matching tasks with their IDs and a relevance score, noting whether
+                the best match is clear or the user should be asked which one they mean
+            """
+            print(f"\n{'='*50}")
+            print(f"FIND_TASKS TOOL CALLED BY LLM")
+            print(f"query: {query}")
+            print(f"{'='*50}\n")
+            
+            matches = task_manager.search_tasks(query, limit)
+            
+            if not matches:
+                return f"No tasks match '{query}'. Try list_tasks to see everything."
+            
+            result = "Clear match:\n" if is_unambiguous(matches) else "Several tasks match similarly well:\n"
+            for i, (task, score) in enumerate(matches, 1):
+                status = "✅" if task.get('completed', False) else "⬜"
+                priority = task.get('priority', 'medium') or 'medium'
+                result += f"{i}. {status} [{task['id']}] {task['text']} (Priority: {priority}, Score: {score:.2f})\n"
+            
+            print(f"FOUND {len(matches)} matching tasks")
             return result
         
         @tool
@@ -158,7 +229,7 @@ Always execute actions rather than explaining how to do them."""
             """
             Mark a task as complete or incomplete by toggling its status.
             
-            IMPORTANT: You must first call list_tasks to get the task IDs, then use the exact ID here.
+            IMPORTANT: You must first call find_tasks (or list_tasks) to get the task ID, then use the exact ID here.
             
             Args:
                 task_id: The UUID of the task (e.g., '5e1986b6-7e1f-445f-8ea0-b0be817ba232')
@@ -169,8 +240,8 @@ Always execute actions rather than explaining how to do them."""
                 
             Example workflow:
                 1. User says "mark buy milk as complete"
-                2. Call list_tasks() to see all tasks with their IDs
-                3. Find the task with text "buy milk" and note its ID in brackets
+                2. Call find_tasks("buy milk") to get matching tasks with their IDs
+                3. Note the ID in brackets of the matching task
                 4. Call complete_task with that ID
             """
             print(f"\n{'='*50}")
@@ -179,8 +250,7 @@ Always execute actions rather than explaining how to do them."""
             print(f"{'='*50}\n")
             
             # Get task info before toggle for better message
-            tasks = task_manager.get_tasks()
-            task = next((t for t in tasks if t['id'] == task_id), None)
+            task = task_manager.get_task(task_id)
             
             if not task:
                 return f"❌ Error: No task found with ID '{task_id}'"
@@ -201,7 +271,7 @@ Always execute actions rather than explaining how to do them."""
             Update an existing task's properties.
             
             You can update the text, priority, category, or any combination of these.
-            First call list_tasks to get the task ID you want to update.
+            First call find_tasks (or list_tasks) to get the task ID you want to update.
             
             Args:
                 task_id: The UUID of the task to update (from list_tasks output)
@@ -242,8 +312,7 @@ Always execute actions rather than explaining how to do them."""
                 return "❌ Error: No updates specified. Provide at least one field to update."
             
             # Get task info for better message
-            tasks = task_manager.get_tasks()
-            task = next((t for t in tasks if t['id'] == task_id), None)
+            task = task_manager.get_task(task_id)
             
             if not task:
                 return f"❌ Error: No task found with ID '{task_id}'"
@@ -263,10 +332,10 @@ Always execute actions rather than explaining how to do them."""
         @tool
         def delete_task(task_id: str) -> str:
             """
-            Permanently delete a task from the system.
+            Delete a task from the system.
             
-            WARNING: This action cannot be undone. The task will be permanently removed.
-            First call list_tasks to get the task ID you want to delete.
+            The deletion can be reverted with undo_last_change if the user changes their mind.
+            First call find_tasks (or list_tasks) to get the task ID you want to delete.
             
             Args:
                 task_id: The UUID of the task to delete (from list_tasks output)
@@ -276,7 +345,7 @@ Always execute actions rather than explaining how to do them."""
                 
             Example:
                 User: "Delete the task about reviewing contracts"
-                1. Call list_tasks() to find the task
+                1. Call find_tasks("reviewing contracts") to find the task
                 2. Call delete_task with the task's ID
             """
             print(f"\n{'='*50}")
@@ -285,8 +354,7 @@ Always execute actions rather than explaining how to do them."""
             print(f"{'='*50}\n")
             
             # Get task info before deletion for confirmation message
-            tasks = task_manager.get_tasks()
-            task = next((t for t in tasks if t['id'] == task_id), None)
+            task = task_manager.get_task(task_id)
             
             if not task:
                 return f"❌ Error: No task found with ID '{task_id}'"
@@ -405,12 +473,16 @@ Always execute actions rather than explaining how to do them."""
             return result
         
         @tool
-        def get_completed_tasks() -> str:
+        def get_completed_tasks(include_archived: bool = False) -> str:
             """
             Get all completed tasks.
             
             This shows tasks that have been marked as done, useful for reviewing accomplishments.
             
+            Args:
+                include_archived: Also include tasks completed long ago that were moved to the archive
+                                  (default: False)
+            
             Returns:
                 Formatted list of all completed tasks with their completion status
                 
@@ -422,7 +494,7 @@ Always execute actions rather than explaining how to do them."""
             print(f"GET_COMPLETED_TASKS TOOL CALLED BY LLM")
             print(f"{'='*50}\n")
             
-            tasks = task_manager.get_completed_tasks()
+            tasks = task_manager.get_completed_tasks(include_archived=include_archived)
             
             if not tasks:
                 return "No completed tasks yet."
@@ -482,9 +554,49 @@ Always execute actions rather than explaining how to do them."""
             print(f"STATS RETURNED: {stats['total']} total, {stats['completed']} completed")
             return result
         
+        @tool
+        def undo_last_change() -> str:
+            """
+            Undo the most recent change to the task list.
+            
+            Reverts the last add, update, completion, deletion or clear. Adding several
+            tasks at once or clearing all tasks counts as a single change.
+            
+            Returns:
+                Confirmation message, or a note that there is nothing to undo
+                
+            Example:
+                - "Undo that" → undo_last_change()
+                - "Bring back the task I just deleted" → undo_last_change()
+            """
+            print(f"\n{'='*50}")
+            print(f"UNDO_LAST_CHANGE TOOL CALLED BY LLM")
+            print(f"{'='*50}\n")
+            
+            if not task_manager.undo():
+                return "Nothing to undo."
+            return "↩️ Undid the last change."
+        
+        @tool
+        def redo_last_change() -> str:
+            """
+            Redo the change most recently reverted with undo_last_change.
+            
+            Returns:
+                Confirmation message, or a note that there is nothing to redo
+            """
+            print(f"\n{'='*50}")
+            print(f"REDO_LAST_CHANGE TOOL CALLED BY LLM")
+            print(f"{'='*50}\n")
+            
+            if not task_manager.redo():
+                return "Nothing to redo."
+            return "↪️ Redid the last undone change."
+        
         # Return list of tools - now includes all task management capabilities
-        return [
+        tools = [
             list_tasks, 
+            find_tasks,
             add_task, 
             complete_task,
             update_task,
@@ -493,8 +605,31 @@ Always execute actions rather than explaining how to do them."""
             get_tasks_by_category,
             get_pending_tasks,
             get_completed_tasks,
-            get_task_stats
+            get_task_stats,
+            undo_last_change,
+            redo_last_change
         ]
+        return [self._with_async_variant(sync_tool) for sync_tool in tools]
+    
+    def _with_async_variant(self, sync_tool):
+        """
+        Give a tool a coroutine for ainvoke. The tool body (TaskManager calls that
+        may write to disk) runs on the TaskManager I/O pool instead of the event loop,
+        so concurrent agent requests don't stall each other.
+        """
+        func = sync_tool.func
+        async_task_manager = self.async_task_manager
+        
+        async def coroutine(**kwargs):
+            return await async_task_manager.run(func, **kwargs)
+        
+        return StructuredTool.from_function(
+            func=func,
+            coroutine=coroutine,
+            name=sync_tool.name,
+            description=sync_tool.description,
+            args_schema=sync_tool.args_schema
+        )
     
     async def process_request(self, user_input: str, context: Optional[Dict] = None) -> Dict[str, Any]:
         """
@@ -521,9 +656,13 @@ Always execute actions rather than explaining how to do them."""
             
             # Invoke the agent with just the user input
             # The agent will use tools to get what it needs
-            result = await self.agent.ainvoke({
-                "messages": [{"role": "user", "content": user_input}]
-            })
+            with self.metrics.measure('agent.request', self.model) as record:
+                result = await self.agent.ainvoke({
+                    "messages": [{"role": "user", "content": user_input}]
+                })
+                # Every model turn of the run (tool calls and the final reply) reports its usage
+                for msg in result.get("messages", []):
+                    record.add_usage(getattr(msg, 'usage_metadata', None))
             
             print(f"\n{'='*100}")
             print(f"!!! LLM RESPONSE - WHAT GPT-5-NANO DECIDED TO DO !!!")
@@ -585,6 +724,54 @@ Always execute actions rather than explaining how to do them."""
                 "response": f"I encountered an error: {str(e)}"
             }
     
+    async def stream_request(self, user_input: str) -> AsyncIterator[str]:
+        """
+        Process a user request through the agent, yielding the response as it arrives.
+        
+        Like process_request, tool results are the response once a tool has been
+        called: each tool's result is yielded when the tool finishes, and the model's
+        text is streamed token by token only while no tool has been called.
+        
+        Args:
+            user_input: The user's input/question
+        
+        Yields:
+            Chunks of response text
+        """
+        print(f"AGENT SERVICE - STREAMING USER REQUEST: '{user_input}'")
+        tool_called = False
+        tool_results = 0
+        with self.metrics.measure('agent.stream', self.model) as record:
+            async for message, _ in self.agent.astream(
+                {"messages": [{"role": "user", "content": user_input}]},
+                stream_mode="messages"
+            ):
+                msg_type = getattr(message, 'type', None)
+                if msg_type == 'tool':
+                    print(f"TOOL RESPONSE: {message.content}")
+                    record.first_token()
+                    yield ("\n" if tool_results else "") + str(message.content)
+                    tool_results += 1
+                elif msg_type in ('ai', 'AIMessageChunk'):
+                    record.add_usage(getattr(message, 'usage_metadata', None))
+                    if getattr(message, 'tool_call_chunks', None) or getattr(message, 'tool_calls', None):
+                        tool_called = True
+                    elif not tool_called and isinstance(message.content, str) and message.content:
+                        record.first_token()
+                        yield message.content
+    
+    def stream_request_sync(self, user_input: str) -> Iterator[str]:
+        """
+        Synchronous iterator over stream_request (for Streamlit's write_stream).
+        
+        Args:
+            user_input: The user's input/question
+        
+        Yields:
+            Chunks of response text
+        """
+        return self.transport.iterate(self.stream_request(user_input))
+    
     def process_request_sync(self, user_input: str, context: Optional[Dict] = None) -> Dict[str, Any]:
         """
         Synchronous wrapper for process_request (for Streamlit compatibility).
@@ -596,9 +783,5 @@ Always execute actions rather than explaining how to do them."""
         Returns:
             Dict with response and metadata
         """
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            return loop.run_until_complete(self.process_request(user_input, context))
-        finally:
-            loop.close()
\ No newline at end of file
+        # Runs on the transport's long-lived loop, where the pooled async connections stay warm
+        return self.transport.run(self.process_request(user_input, context))
\ No newline at end of file
@@ -0,0 +1,66 @@
+"""
+Async facade over TaskManager for code running on an event loop.
+
+TaskManager persists synchronously: a write returns after the storage backend
+has written (or, with 'group' durability, after the batched flush). Called from
+a coroutine that blocks the whole loop, so one agent request's disk write
+stalls every other request. AsyncTaskManager runs those calls on a small
+thread pool instead. Concurrent writers then queue on TaskManager's own lock
+and, with 'group' durability, share flushes.
+"""
+
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from services.task_manager import TaskManager
+
+# Reads are offloaded too: several of them wait on the writer lock, which a
+# write holds for the duration of its disk I/O
+_METHODS = (
+    'add_task', 'add_tasks', 'update_task', 'update_tasks', 'complete_tasks', 'toggle_task',
+    'delete_task', 'delete_tasks', 'clear_all', 'archive_completed', 'undo', 'redo', 'compact', 'flush',
+    'get_tasks', 'get_task', 'filter_tasks', 'query_tasks', 'search_tasks', 'next_tasks', 'get_tasks_by_priority',
+    'get_tasks_by_category', 'get_pending_tasks', 'get_completed_tasks', 'get_archived_tasks',
+    'get_stats', 'changes_since'
+)
+
+
+class AsyncTaskManager:
+    """Awaitable versions of the TaskManager methods, with blocking work kept off the event loop"""
+
+    def __init__(self, task_manager: TaskManager, max_workers: int = 4, executor: Optional[ThreadPoolExecutor] = None):
+        self.task_manager = task_manager
+        self._executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="TaskManagerIO")
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Run a blocking callable on the I/O pool. It sees the caller's context
+        variables, so changes are still attributed to the caller's undo actor.
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._executor, functools.partial(context.run, func, *args, **kwargs))
+
+    @property
+    def version(self) -> int:
+        return self.task_manager.version
+
+    async def close(self):
+        """Flush and close the TaskManager, then stop the pool"""
+        await self.run(self.task_manager.close)
+        self._executor.shutdown(wait=False)
+
+
+def _offloaded(name: str):
+    async def method(self, *args, **kwargs):
+        return await self.run(getattr(self.task_manager, name), *args, **kwargs)
+    method.__name__ = name
+    method.__doc__ = getattr(TaskManager, name).__doc__
+    return method
+
+
+for _name in _METHODS:
+    setattr(AsyncTaskManager, _name, _offloaded(_name))
@@ -0,0 +1,279 @@
+"""
+Local fast path for simple voice commands.
+
+"Add a task to buy milk", "what should I work on next" or "how many tasks do
+I have" don't need a model round trip. parse_command matches the utterance
+against a small grammar and returns an intent with a confidence;
+FastCommandRouter carries out confident intents directly against TaskManager
+and returns None for everything else, so the caller falls through to the
+agent. Commands that name an existing task ("mark the dentist task as done")
+are resolved with the local search index and only count as confident when
+the match is clear.
+"""
+
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+from services.task_query import PAGE_SIZE
+from services.task_search import is_unambiguous, tokenize
+
+PRIORITY = r"(?P<priority>high|medium|low)"
+CATEGORY = r"(?P<category>client|business|personal)"
+TASK_WORD = r"(?:tasks?|items?|to-?dos?|things)"
+
+_POLITE = re.compile(r"^(?:(?:hey|ok|okay|so|please|can you|could you|would you|i want to|i'd like to|i need to)[\s,]+)+", re.I)
+_TRAILING = re.compile(r"[\s.!?]+$")
+
+_ADD = re.compile(
+    rf"^(?:add|create|make)(?: me)?(?: an?)?(?: new)?(?: {PRIORITY}[- ]priority)?(?: {CATEGORY})?"
+    rf" {TASK_WORD}(?: (?:to|for|called|named|that says))?[:,]? (?P<text>.+?)"
+    rf"(?:,? (?:with|as|at) (?P<suffix_priority>high|medium|low) priority)?$",
+    re.I
+)
+_REMIND = re.compile(r"^remind me to (?P<text>.+)$", re.I)
+_SHOW = r"(?:show|list|display|give|tell|read)(?: me)?(?: all)?(?: of)?(?: my| the)?"
+_LIST_PRIORITY = re.compile(rf"^(?:{_SHOW}|what are(?: all)?(?: my| the)?) {PRIORITY}[- ]priority {TASK_WORD}$", re.I)
+_LIST_CATEGORY = re.compile(rf"^(?:{_SHOW}|what are(?: all)?(?: my| the)?) {CATEGORY} {TASK_WORD}$", re.I)
+_LIST_PENDING = re.compile(
+    rf"^(?:{_SHOW} (?:pending|open|incomplete|remaining|unfinished) {TASK_WORD}"
+    r"|what do i (?:still )?(?:need|have) to do)$",
+    re.I
+)
+_LIST_COMPLETED = re.compile(
+    rf"^(?:{_SHOW} (?:completed|finished|done) {TASK_WORD}|what have i (?:completed|finished|done))$",
+    re.I
+)
+_LIST_ALL = re.compile(rf"^(?:{_SHOW} {TASK_WORD}|what are my {TASK_WORD})$", re.I)
+_COUNT = re.compile(
+    rf"^how many(?: {PRIORITY}[- ]priority| {CATEGORY}| (?P<status>pending|open|completed|finished|done))?"
+    rf" {TASK_WORD}(?: (?:do i have|are there|are left|have i (?:got|completed|finished)))?(?: left)?$",
+    re.I
+)
+_COMPLETE = re.compile(
+    rf"^(?:mark|check off|tick off|complete|finish)(?: the)?(?: {TASK_WORD})? (?P<query>.+?)"
+    rf"(?: {TASK_WORD})?(?: as (?:done|complete|completed|finished))?$",
+    re.I
+)
+_DELETE = re.compile(rf"^(?:delete|remove)(?: the)?(?: {TASK_WORD})? (?P<query>.+?)(?: {TASK_WORD})?$", re.I)
+_NEXT = re.compile(
+    r"^(?:what(?:'s| is)? next|what should i (?:work on|do|tackle|focus on)(?: next| now| first)?"
+    r"|what(?:'s| is) my next task|(?:suggest|give me|pick)(?: me)? (?:a|the|my) next task)$",
+    re.I
+)
+_UNDO = re.compile(r"^undo(?: that| the last change| it)?$", re.I)
+_REDO = re.compile(r"^redo(?: that| the last change| it)?$", re.I)
+
+# Words that turn a task reference into a bulk or relative one the fast path won't guess at
+_VAGUE = re.compile(r"\b(?:all|every|everything|each|last|first|these|those|them|other)\b", re.I)
+
+# A reference containing these names part of a task ("remove milk from the grocery list"), not a whole one
+_PARTIAL = re.compile(r"\b(?:from|out of|off|in|on|inside|within|part of)\b", re.I)
+
+# Added text containing these may be several tasks, or a sentence to interpret
+_COMPOUND = re.compile(r"\b(?:and|then|also)\b|[,;]", re.I)
+
+# Confidence of a clean grammatical match, and of one the model should interpret instead
+FIXED_CONFIDENCE = 0.95
+PARTIAL_MATCH_CONFIDENCE = 0.6
+
+
+def _clean(text: str) -> str:
+    text = ' '.join(text.split())
+    text = _TRAILING.sub('', text)
+    return _POLITE.sub('', text)
+
+
+def parse_command(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Match an utterance against the local command grammar.
+
+    Returns:
+        A dict with 'intent', 'confidence' and the intent's arguments, or None if nothing matched
+    """
+    text = _clean(text)
+    if not text:
+        return None
+
+    match = _ADD.match(text) or _REMIND.match(text)
+    if match:
+        fields = match.groupdict()
+        task_text = fields['text'].strip()
+        priority = (fields.get('priority') or fields.get('suffix_priority') or 'medium').lower()
+        category = (fields.get('category') or '').lower() or None
+        confidence = PARTIAL_MATCH_CONFIDENCE if _COMPOUND.search(task_text) else FIXED_CONFIDENCE
+        return {'intent': 'add', 'confidence': confidence, 'text': task_text[:1].upper() + task_text[1:],
+                'priority': priority, 'category': category}
+
+    if _NEXT.match(text):
+        return {'intent': 'next', 'confidence': FIXED_CONFIDENCE}
+    if _UNDO.match(text):
+        return {'intent': 'undo', 'confidence': FIXED_CONFIDENCE}
+    if _REDO.match(text):
+        return {'intent': 'redo', 'confidence': FIXED_CONFIDENCE}
+
+    match = _COUNT.match(text)
+    if match:
+        fields = match.groupdict()
+        status = fields.get('status')
+        if status:
+            status = 'pending' if status.lower() in ('pending', 'open') else 'completed'
+        return {'intent': 'count', 'confidence': FIXED_CONFIDENCE,
+                'priority': (fields.get('priority') or '').lower() or None,
+                'category': (fields.get('category') or '').lower() or None,
+                'status': status}
+
+    for pattern, intent in ((_LIST_PRIORITY, 'list_priority'), (_LIST_CATEGORY, 'list_category'),
+                            (_LIST_PENDING, 'list_pending'), (_LIST_COMPLETED, 'list_completed'),
+                            (_LIST_ALL, 'list_all')):
+        match = pattern.match(text)
+        if match:
+            fields = match.groupdict()
+            command = {'intent': intent, 'confidence': FIXED_CONFIDENCE}
+            if intent == 'list_priority':
+                command['priority'] = fields['priority'].lower()
+            elif intent == 'list_category':
+                command['category'] = fields['category'].lower()
+            return command
+
+    for pattern, intent in ((_COMPLETE, 'complete'), (_DELETE, 'delete')):
+        match = pattern.match(text)
+        if match:
+            query = match.group('query').strip()
+            uncertain = _VAGUE.search(query) or _PARTIAL.search(query)
+            confidence = PARTIAL_MATCH_CONFIDENCE if uncertain else FIXED_CONFIDENCE
+            return {'intent': intent, 'confidence': confidence, 'query': query}
+
+    return None
+
+
+def _format_tasks(title: str, tasks: List[Dict[str, Any]]) -> str:
+    result = f"{title}:\n"
+    for i, task in enumerate(tasks, 1):
+        status = "✅" if task.get('completed', False) else "⬜"
+        result += f"{i}. {status} {task['text']} (Priority: {task.get('priority', 'medium')}, Category: {task.get('category') or 'none'})\n"
+    return result
+
+
+class FastCommandRouter:
+    """Carries out confidently parsed commands locally and counts how often it could"""
+
+    def __init__(self, task_manager, threshold: float = 0.85):
+        """
+        Args:
+            task_manager: TaskManager the commands act on
+            threshold: Minimum confidence to act without the model
+        """
+        self.task_manager = task_manager
+        self.threshold = threshold
+        self._counters = {'hits': 0, 'misses': 0}
+        self._counters_lock = threading.Lock()
+
+    def handle(self, text: str) -> Optional[str]:
+        """
+        Carry out the command if the fast path is confident about it.
+
+        Returns:
+            The response text, or None if the command should go to the model
+        """
+        command = parse_command(text)
+        response = None
+        if command is not None and command['confidence'] >= self.threshold:
+            response = self._execute(command)
+        with self._counters_lock:
+            self._counters['misses' if response is None else 'hits'] += 1
+        if response is None:
+            return None
+        print(f"FastCommandRouter: Handled '{text}' locally as {command['intent']}")
+        return response
+
+    def _resolve(self, query: str):
+        """The task a reference names, if the local search is clear about it"""
+        results = self.task_manager.search_tasks(query, limit=5)
+        if not is_unambiguous(results):
+            return None
+        task = results[0][0]
+        # Every word of the reference must be in the task, or it may mean a task that doesn't exist
+        if not set(tokenize(query)) <= set(tokenize(task['text'])):
+            return None
+        return task
+
+    def _list(self, title: str, empty: str, **filters) -> str:
+        """The first page of matching tasks, the same size the agent's list_tasks tool pages by"""
+        page = self.task_manager.query_tasks(limit=PAGE_SIZE, **filters)
+        if not page['tasks']:
+            return empty
+        result = _format_tasks(title, page['tasks'])
+        if page['next_cursor']:
+            result += f"...and {page['total'] - len(page['tasks'])} more. Ask me to show the rest.\n"
+        return result
+
+    def _execute(self, command: Dict[str, Any]) -> Optional[str]:
+        task_manager = self.task_manager
+        intent = command['intent']
+
+        if intent == 'add':
+            task_manager.add_task(command['text'], priority=command['priority'], category=command['category'])
+            category_str = f" in {command['category']} category" if command['category'] else ""
+            return f"✅ Successfully added task: '{command['text']}' with {command['priority']} priority{category_str}"
+
+        if intent == 'next':
+            tasks = task_manager.next_tasks(3)
+            if not tasks:
+                return "🎉 No pending tasks! Everything is complete."
+            result = f"👉 Next up: '{tasks[0]['text']}' ({tasks[0]['priority']} priority)"
+            if len(tasks) > 1:
+                result += "\nAfter that: " + ", ".join(f"'{task['text']}'" for task in tasks[1:])
+            return result
+        if intent == 'undo':
+            return "↩️ Undid the last change." if task_manager.undo() else "Nothing to undo."
+        if intent == 'redo':
+            return "↪️ Redid the last undone change." if task_manager.redo() else "Nothing to redo."
+
+        if intent == 'count':
+            filters = {}
+            if command['priority']:
+                filters['priority'] = command['priority']
+            if command['category']:
+                filters['category'] = command['category']
+            if command['status']:
+                filters['status'] = command['status']
+            total = task_manager.query_tasks(limit=1, **filters)['total']
+            words = [command['status'], f"{command['priority']} priority" if command['priority'] else None, command['category']]
+            label = ' '.join(word for word in words if word)
+            noun = "task" if total == 1 else "tasks"
+            return f"You have {total} {label + ' ' if label else ''}{noun}."
+
+        if intent == 'list_priority':
+            priority = command['priority']
+            return self._list(f"{priority.capitalize()} Priority Tasks", f"No {priority} priority tasks found.", priority=priority)
+        if intent == 'list_category':
+            category = command['category']
+            return self._list(f"{category.capitalize()} Tasks", f"No {category} tasks found.", category=category)
+        if intent == 'list_pending':
+            return self._list("Pending Tasks", "🎉 No pending tasks! Everything is complete.", status='pending')
+        if intent == 'list_completed':
+            return self._list("Completed Tasks", "No completed tasks yet.", status='completed')
+        if intent == 'list_all':
+            return self._list("Your Tasks", "No tasks found.")
+
+        task = self._resolve(command['query'])
+        if task is None:
+            return None
+        if intent == 'complete':
+            if task['completed']:
+                return f"Task '{task['text']}' is already completed ✅"
+            task_manager.complete_tasks([task['id']])
+            return f"Task '{task['text']}' is now completed ✅"
+        if intent == 'delete':
+            task_manager.delete_task(task['id'])
+            return f"✅ Task deleted: '{task['text']}'"
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Commands handled locally vs. passed on, and the hit rate"""
+        with self._counters_lock:
+            stats = dict(self._counters)
+        handled = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / handled if handled else 0.0
+        return stats
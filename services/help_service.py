@@ -1,19 +1,26 @@
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Iterator
 import os
 from pathlib import Path
 import json
 
+# Upper bound on the length of a help answer
+HELP_MAX_TOKENS = 10000
+
+HELP_UNAVAILABLE = "I'm having trouble accessing the help system right now. Please try again or check the knowledge base documentation."
+
 class HelpService:
-    def __init__(self, llm_service, agent_service=None):
+    def __init__(self, llm_service, agent_service=None, fast_path=None):
         """
         Initialize the help service with access to the LLM service
         
         Args:
             llm_service: The existing LLMService instance
             agent_service: Optional AgentService for enhanced capabilities
+            fast_path: Optional FastCommandRouter that handles simple commands without the model
         """
         self.llm_service = llm_service
         self.agent_service = agent_service  # Optional: Use agent if available
+        self.fast_path = fast_path
         self.knowledge_base = self._load_knowledge_base()
         self.ui_reference = self._load_ui_reference()
     
@@ -77,6 +84,11 @@ class HelpService:
         """
         # In command mode, use agent service for actions
         print(f"DEBUG: get_help_response called with mode='{mode}', agent_service={self.agent_service is not None}")
+        if mode == 'command' and self.fast_path is not None:
+            response = self.fast_path.handle(user_question)
+            if response is not None:
+                return response
+        
         if mode == 'command' and self.agent_service is not None:
             print(f"DEBUG: Routing to agent service for command: {user_question}")
             try:
@@ -85,16 +97,8 @@ class HelpService:
                 result = self.agent_service.process_request_sync(user_question, None)
                 
                 if result.get("success"):
-                    response_text = result.get("response", "")
-                    
-                    # If tools were called, add a note about task being added
-                    if result.get("tool_calls"):
-                        # Mark that we need a refresh in session state
-                        import streamlit as st
-                        if 'tasks_updated' not in st.session_state:
-                            st.session_state.tasks_updated = True
-                    
-                    return response_text
+                    # Task changes made by the agent's tools show up in TaskManager's change feed
+                    return result.get("response", "")
                 else:
                     # Fall back to regular LLM if agent fails
                     print(f"CRITICAL: Agent service failed, falling back to LLM: {result.get('error')}")
@@ -106,97 +110,142 @@ class HelpService:
         
         # Question mode: Always use LLM to explain UI usage (never execute actions)
         try:
-            # Build context with knowledge base and UI reference
-            ui_ref_str = json.dumps(self.ui_reference, indent=2) if self.ui_reference else ""
-            
-            # Build context based on mode
-            if mode == 'question':
-                context = f"""
-                You are a helpful assistant for the Voice Task Manager application.
-                The user is in QUESTION MODE and wants to learn HOW to use the app themselves.
-                
-                IMPORTANT: In this mode, you should:
-                - Explain how to use the UI features
-                - Describe where buttons and controls are located
-                - Teach the user to be self-sufficient
-                - Mention that they can switch to Command Mode if they want you to do it for them
-                
-                Use the following knowledge base to answer user questions:
-                
-                {self.knowledge_base}
-                
-                UI Elements Reference (for precise location answers):
-                {ui_ref_str}
-                
-                Note: The AI Assistant panel now has two modes:
-                - Question Mode (current): For learning how to use the app
-                - Command Mode: Where the assistant can execute tasks directly
-                
-                Current application state:
-                - Total tasks: {len(current_tasks) if current_tasks else 0}
-                """
-            else:
-                # This shouldn't happen since command mode is handled above
-                context = f"""
-                You are a helpful assistant for the Voice Task Manager application.
-                {self.knowledge_base}
-                Current application state:
-                - Total tasks: {len(current_tasks) if current_tasks else 0}
-                """
-            
-            # Add task context if available
-            if current_tasks:
-                pending_tasks = [t for t in current_tasks if not t.get('completed', False)]
-                high_priority_tasks = [t for t in pending_tasks if t.get('priority') == 'high']
-                client_tasks = [t for t in current_tasks if t.get('category') == 'client']
-                business_tasks = [t for t in current_tasks if t.get('category') == 'business']
-                personal_tasks = [t for t in current_tasks if t.get('category') == 'personal']
-                
-                context += f"""
-                - Pending tasks: {len(pending_tasks)}
-                - High priority tasks: {len(high_priority_tasks)}
-                - Client tasks: {len(client_tasks)}
-                - Business tasks: {len(business_tasks)}
-                - Personal tasks: {len(personal_tasks)}
-                """
-                
-                if high_priority_tasks:
-                    context += "\nHigh priority tasks:\n"
-                    for i, task in enumerate(high_priority_tasks[:3], 1):
-                        context += f"- {i}. {task.get('text', 'Unknown task')}\n"
-            
-            # Create the prompt
-            prompt = f"""
-            {context}
-            
-            User Question: "{user_question}"
-            
-            Provide a helpful, friendly response that:
-            1. Directly answers their question
-            2. Uses the knowledge base information
-            3. Provides specific examples when helpful
-            4. Suggests relevant voice commands they could try
-            5. Keeps the response concise but informative
-            
-            If they have high priority tasks, consider mentioning them.
-            If they're asking about commands, provide specific examples they can say.
-            """
+            messages = self._build_help_messages(user_question, current_tasks, mode)
             
             # Use the LLM service to generate response
-            response = self.llm_service.client.chat.completions.create(
-                model=self.llm_service.model,
-                messages=[
-                    {"role": "system", "content": "You are a helpful Voice Task Manager assistant. Provide clear, actionable advice."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_completion_tokens=10000
+            response = self.llm_service.chat_completion(
+                messages=messages, max_completion_tokens=HELP_MAX_TOKENS, operation='help.answer'
             )
             
             return response.choices[0].message.content.strip()
             
         except Exception as e:
             print(f"Help service error: {e}")
-            return "I'm having trouble accessing the help system right now. Please try again or check the knowledge base documentation."
+            return HELP_UNAVAILABLE
+    
+    def stream_help_response(self, user_question: str, current_tasks: Optional[List[Dict[str, Any]]] = None,
+                             mode: str = 'question') -> Iterator[str]:
+        """
+        Streaming version of get_help_response: yields the response text as it is generated.
+        
+        Command mode yields the fast path's answer, or the agent's tool results and
+        replies as they arrive; question mode yields the LLM's tokens.
+        """
+        if mode == 'command' and self.fast_path is not None:
+            response = self.fast_path.handle(user_question)
+            if response is not None:
+                yield response
+                return
+        
+        if mode == 'command' and self.agent_service is not None:
+            print(f"DEBUG: Streaming agent response for command: {user_question}")
+            started = False
+            try:
+                for chunk in self.agent_service.stream_request_sync(user_question):
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if started:
+                    print(f"CRITICAL: Agent stream failed mid-response: {e}")
+                    yield f"\n\nI encountered an error: {e}"
+                    return
+                print(f"CRITICAL: Agent service error, falling back to LLM: {e}")
+        
+        try:
+            messages = self._build_help_messages(user_question, current_tasks, mode)
+            yield from self.llm_service.stream_chat_completion(
+                messages=messages, max_completion_tokens=HELP_MAX_TOKENS, operation='help.answer'
+            )
+        except Exception as e:
+            print(f"Help service error: {e}")
+            yield HELP_UNAVAILABLE
+    
+    def _build_help_messages(self, user_question: str, current_tasks: Optional[List[Dict[str, Any]]],
+                             mode: str) -> List[Dict[str, str]]:
+        """
+        Chat messages for a question-mode help answer (knowledge base, UI reference and task summary)
+        """
+        # Build context with knowledge base and UI reference
+        ui_ref_str = json.dumps(self.ui_reference, indent=2) if self.ui_reference else ""
+        
+        # Build context based on mode
+        if mode == 'question':
+            context = f"""
+            You are a helpful assistant for the Voice Task Manager application.
+            The user is in QUESTION MODE and wants to learn HOW to use the app themselves.
+        
+            IMPORTANT: In this mode, you should:
+            - Explain how to use the UI features
+            - Describe where buttons and controls are located
+            - Teach the user to be self-sufficient
+            - Mention that they can switch to Command Mode if they want you to do it for them
+        
+            Use the following knowledge base to answer user questions:
+        
+            {self.knowledge_base}
+        
+            UI Elements Reference (for precise location answers):
+            {ui_ref_str}
+        
+            Note: The AI Assistant panel now has two modes:
+            - Question Mode (current): For learning how to use the app
+            - Command Mode: Where the assistant can execute tasks directly
+        
+            Current application state:
+            - Total tasks: {len(current_tasks) if current_tasks else 0}
+            """
+        else:
+            # This shouldn't happen since command mode is handled above
+            context = f"""
+            You are a helpful assistant for the Voice Task Manager application.
+            {self.knowledge_base}
+            Current application state:
+            - Total tasks: {len(current_tasks) if current_tasks else 0}
+            """
+        
+        # Add task context if available
+        if current_tasks:
+            pending_tasks = [t for t in current_tasks if not t.get('completed', False)]
+            high_priority_tasks = [t for t in pending_tasks if t.get('priority') == 'high']
+            client_tasks = [t for t in current_tasks if t.get('category') == 'client']
+            business_tasks = [t for t in current_tasks if t.get('category') == 'business']
+            personal_tasks = [t for t in current_tasks if t.get('category') == 'personal']
+        
+            context += f"""
+            - Pending tasks: {len(pending_tasks)}
+            - High priority tasks: {len(high_priority_tasks)}
+            - Client tasks: {len(client_tasks)}
+            - Business tasks: {len(business_tasks)}
+            - Personal tasks: {len(personal_tasks)}
+            """
+        
+            if high_priority_tasks:
+                context += "\nHigh priority tasks:\n"
+                for i, task in enumerate(high_priority_tasks[:3], 1):
+                    context += f"- {i}. {task.get('text', 'Unknown task')}\n"
+        
+        # Create the prompt
+        prompt = f"""
+        {context}
+        
+        User Question: "{user_question}"
+        
+        Provide a helpful, friendly response that:
+        1. Directly answers their question
+        2. Uses the knowledge base information
+        3. Provides specific examples when helpful
+        4. Suggests relevant voice commands they could try
+        5. Keeps the response concise but informative
+        
+        If they have high priority tasks, consider mentioning them.
+        If they're asking about commands, provide specific examples they can say.
+        """
+        
+        return [
+            {"role": "system", "content": "You are a helpful Voice Task Manager assistant. Provide clear, actionable advice."},
+            {"role": "user", "content": prompt}
+        ]
     
     def get_contextual_suggestions(self, current_tasks: List[Dict[str, Any]]) -> str:
         """
@@ -0,0 +1,126 @@
+"""
+Incremental extraction of JSON array items from a token stream.
+
+JSONItemStream tracks nesting and string state as text arrives and parses
+each item of a JSON array (the brain-dump task list) as soon as its closing
+brace (or quote) is in, so one malformed item does not lose the others. Prose
+or code fences around the array are skipped, and objects that come without an
+enclosing array are accepted too. If the stream stops mid-item (output cut off
+at the token limit), salvage() closes the open brackets to recover the complete
+values written so far; a value whose string was cut short is dropped, never
+kept half-written.
+"""
+
+import json
+from typing import Any, List, Optional
+
+_CLOSERS = {'{': '}', '[': ']'}
+
+
+class JSONItemStream:
+    """Parses items of a streamed JSON array one by one"""
+
+    def __init__(self):
+        self._buffer = ''
+        self._position = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._item_start: Optional[int] = None
+        self._item_level = 0
+        self.complete = False
+
+    def feed(self, text: str) -> List[Any]:
+        """Add streamed text, returning the items it completed"""
+        self._buffer += text
+        items = []
+        buffer = self._buffer
+        for i in range(self._position, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._item_start is not None and len(self._stack) == self._item_level:
+                        self._emit(self._item_start, i + 1, items)
+            elif char == '"':
+                # Quotes outside any bracket are prose, not JSON
+                if self._stack:
+                    self._in_string = True
+                    if self._item_start is None and self._stack == ['[']:
+                        self._item_start, self._item_level = i, 1
+            elif char in _CLOSERS:
+                if self._item_start is None and (self._stack == ['['] or (not self._stack and char == '{')):
+                    self._item_start, self._item_level = i, len(self._stack)
+                self._stack.append(char)
+            elif char in ('}', ']') and self._stack:
+                self._stack.pop()
+                if self._item_start is not None and len(self._stack) == self._item_level:
+                    self._emit(self._item_start, i + 1, items)
+                elif not self._stack and char == ']':
+                    self.complete = True
+        self._position = len(buffer)
+        return items
+
+    @property
+    def truncated(self) -> bool:
+        """True when the text so far stops inside an array, an item or a string"""
+        return bool(self._stack) or self._in_string
+
+    def _emit(self, start: int, end: int, items: List[Any]):
+        self._item_start = None
+        try:
+            items.append(json.loads(self._buffer[start:end]))
+        except ValueError as e:
+            print(f"JSONItemStream: Skipped malformed item: {e}")
+
+    def salvage(self) -> Optional[Any]:
+        """
+        The item the stream stopped in the middle of, closed off, or None.
+
+        The item is cut back at its last comma until no string is left open
+        and closing the brackets gives valid JSON, so only values that were
+        written out in full survive.
+        """
+        if self._item_start is None:
+            return None
+        fragment = self._buffer[self._item_start:].rstrip()
+        while fragment:
+            closed = _close(fragment)
+            if closed is not None:
+                try:
+                    return json.loads(closed)
+                except ValueError:
+                    pass
+            cut = fragment.rfind(',')
+            if cut <= 0:
+                return None
+            fragment = fragment[:cut].rstrip()
+        return None
+
+
+def _close(fragment: str) -> Optional[str]:
+    """fragment with its open brackets closed, or None when it ends inside a string"""
+    stack = []
+    in_string = escaped = False
+    for char in fragment:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(_CLOSERS[char])
+        elif char in ('}', ']'):
+            if not stack or stack.pop() != char:
+                return None
+    if in_string:
+        return None
+    return fragment + ''.join(reversed(stack))
@@ -0,0 +1,205 @@
+"""
+Per-call metrics for model and transcription requests.
+
+Every model and transcription call is made inside LLMMetrics.measure(), which
+records one CallRecord: the operation ("llm.intent", "whisper.transcribe",
+...), wall time, time to the first streamed token, prompt and completion
+tokens, estimated cost, transport retries and cache status. Answers served
+from the response cache are recorded too, at no cost. summary() aggregates the
+recent calls per operation into latency percentiles and totals, and to_json()
+dumps both for offline analysis.
+
+The collector lives on the shared OpenAITransport, so every service reports
+into the same one.
+"""
+
+import json
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+# USD per million prompt and completion tokens, for the cost estimate
+MODEL_PRICES = {
+    'gpt-5-nano': (0.05, 0.40)
+}
+
+# USD per minute of transcribed audio
+TRANSCRIPTION_PRICES = {
+    'whisper-1': 0.006
+}
+
+PERCENTILES = (50, 90, 99)
+
+
+def estimate_cost(model: Optional[str], prompt_tokens: int = 0, completion_tokens: int = 0,
+                  audio_seconds: float = 0.0) -> Optional[float]:
+    """Estimated USD cost of one call, or None for a model without a known price"""
+    if model in TRANSCRIPTION_PRICES:
+        return TRANSCRIPTION_PRICES[model] * audio_seconds / 60
+    if model in MODEL_PRICES:
+        prompt_price, completion_price = MODEL_PRICES[model]
+        return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+    return None
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of values (None when there are none)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = math.ceil(len(ordered) * pct / 100)
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+class CallRecord:
+    """What one model or transcription call took; filled in by the caller while it runs"""
+
+    __slots__ = ('operation', 'model', 'started_at', 'seconds', 'first_token_seconds', 'prompt_tokens',
+                 'completion_tokens', 'audio_seconds', 'retries', 'cache', 'error', '_start')
+
+    def __init__(self, operation: str, model: Optional[str] = None, cache: Optional[str] = None):
+        self.operation = operation
+        self.model = model
+        self.started_at = datetime.now().isoformat()
+        self.seconds = 0.0
+        self.first_token_seconds: Optional[float] = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.audio_seconds = 0.0
+        self.retries = 0
+        # 'hit' or 'miss' for cached operations, None for the rest
+        self.cache = cache
+        self.error: Optional[str] = None
+        self._start = time.perf_counter()
+
+    def first_token(self):
+        """Mark the arrival of the first streamed token (later calls are ignored)"""
+        if self.first_token_seconds is None:
+            self.first_token_seconds = time.perf_counter() - self._start
+
+    def add_usage(self, usage: Any):
+        """
+        Add token counts from an OpenAI usage object or a LangChain usage_metadata dict.
+        """
+        if usage is None:
+            return
+        if isinstance(usage, dict):
+            self.prompt_tokens += usage.get('input_tokens', usage.get('prompt_tokens', 0)) or 0
+            self.completion_tokens += usage.get('output_tokens', usage.get('completion_tokens', 0)) or 0
+        else:
+            self.prompt_tokens += getattr(usage, 'prompt_tokens', 0) or 0
+            self.completion_tokens += getattr(usage, 'completion_tokens', 0) or 0
+
+    @property
+    def cost(self) -> Optional[float]:
+        if self.cache == 'hit':
+            return 0.0
+        return estimate_cost(self.model, self.prompt_tokens, self.completion_tokens, self.audio_seconds)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'operation': self.operation,
+            'model': self.model,
+            'started_at': self.started_at,
+            'seconds': round(self.seconds, 4),
+            'first_token_seconds': round(self.first_token_seconds, 4) if self.first_token_seconds is not None else None,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'audio_seconds': round(self.audio_seconds, 2),
+            'cost': self.cost,
+            'retries': self.retries,
+            'cache': self.cache,
+            'error': self.error
+        }
+
+
+class LLMMetrics:
+    """Thread-safe collector of the most recent CallRecords"""
+
+    def __init__(self, max_calls: int = 1000):
+        """
+        Args:
+            max_calls: Calls kept for the summary; the oldest are dropped beyond this
+        """
+        self._lock = threading.Lock()
+        self._calls: "deque[CallRecord]" = deque(maxlen=max_calls)
+
+    @contextmanager
+    def measure(self, operation: str, model: Optional[str] = None,
+                cache: Optional[str] = None) -> Iterator[CallRecord]:
+        """
+        Time the block as one call of operation; the block fills in tokens and retries.
+
+        Failures are recorded with their exception type and re-raised. A streaming
+        generator that is closed early is recorded up to that point.
+        """
+        record = CallRecord(operation, model, cache)
+        try:
+            yield record
+        except Exception as e:
+            record.error = type(e).__name__
+            raise
+        finally:
+            record.seconds = time.perf_counter() - record._start
+            self.add(record)
+
+    def record_cache_hit(self, operation: str, model: Optional[str] = None):
+        """Record an answer served from the response cache"""
+        with self.measure(operation, model, cache='hit'):
+            pass
+
+    def add(self, record: CallRecord):
+        with self._lock:
+            self._calls.append(record)
+
+    def calls(self) -> List[Dict[str, Any]]:
+        """The recorded calls, oldest first"""
+        with self._lock:
+            return [record.to_dict() for record in self._calls]
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-operation aggregates of the recorded calls.
+
+        Returns:
+            {operation: {calls, errors, retries, cache_hits, prompt_tokens, completion_tokens,
+                         cost, p50_seconds, p90_seconds, p99_seconds, p50_first_token_seconds}}
+        """
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for call in self.calls():
+            grouped.setdefault(call['operation'], []).append(call)
+
+        summary = {}
+        for operation, calls in sorted(grouped.items()):
+            seconds = [call['seconds'] for call in calls]
+            first_tokens = [call['first_token_seconds'] for call in calls if call['first_token_seconds'] is not None]
+            stats = {
+                'calls': len(calls),
+                'errors': sum(1 for call in calls if call['error']),
+                'retries': sum(call['retries'] for call in calls),
+                'cache_hits': sum(1 for call in calls if call['cache'] == 'hit'),
+                'prompt_tokens': sum(call['prompt_tokens'] for call in calls),
+                'completion_tokens': sum(call['completion_tokens'] for call in calls),
+                'cost': sum(call['cost'] or 0.0 for call in calls)
+            }
+            for pct in PERCENTILES:
+                stats[f'p{pct}_seconds'] = percentile(seconds, pct)
+            stats['p50_first_token_seconds'] = percentile(first_tokens, 50)
+            summary[operation] = stats
+        return summary
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        """The summary and every recorded call, as JSON"""
+        return json.dumps({
+            'generated_at': datetime.now().isoformat(),
+            'summary': self.summary(),
+            'calls': self.calls()
+        }, indent=indent)
+
+    def reset(self):
+        with self._lock:
+            self._calls.clear()
@@ -1,93 +1,210 @@
-from openai import OpenAI
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import json
+from concurrent.futures import ThreadPoolExecutor
+
+from services.task_search import rank_tasks, is_unambiguous
+from services.response_cache import ResponseCache, make_key, normalize_text
+from services.openai_transport import OpenAITransport, get_transport
+from services.task_context import CONTEXT_HEADER, build_task_context
+from services.json_stream import JSONItemStream
+from services.task_scoring import suggest_priority, top_tasks
+
+# Ambiguous local matches send at most this many candidates to the model
+MATCH_CANDIDATES = 5
+
+# Local ranking hands at most this many tasks to the model for re-ranking
+RERANK_CANDIDATES = 5
+
+# Tasks per prioritization request, requests in flight at once, and the output allowance per task
+PRIORITIZE_CHUNK_SIZE = 25
+PRIORITIZE_CONCURRENCY = 4
+PRIORITIZE_TOKENS_PER_TASK = 20
+# gpt-5-nano spends reasoning tokens from the same allowance before it writes the answer.
+# A response that still runs out is retried with twice the allowance, up to PRIORITIZE_ATTEMPTS calls
+PRIORITIZE_REASONING_TOKENS = 2000
+PRIORITIZE_ATTEMPTS = 2
+
+# Output allowance for the handle suggest_next_task asks for, on top of the reasoning allowance
+NEXT_TASK_TOKENS = 20
+
+# Bump when a prompt changes so cached responses to the old prompt are not reused
+PROMPT_VERSIONS = {
+    'braindump': 1,
+    'intent': 2
+}
+
+# Token budget for the task list in the intent prompt; beyond it only the most relevant tasks are sent
+INTENT_CONTEXT_TOKENS = 1500
 
 class LLMService:
-    def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
+    def __init__(self, api_key: str, cache: Optional[ResponseCache] = None,
+                 transport: Optional[OpenAITransport] = None):
+        """
+        Args:
+            api_key: OpenAI API key
+            cache: Response cache for process_braindump and detect_intent (in-memory by default)
+            transport: Shared OpenAI transport (the process-wide one for the key by default)
+        """
+        self.transport = transport if transport is not None else get_transport(api_key)
+        self.client = self.transport.client
         self.model = "gpt-5-nano"  # GPT-5 nano: 3x cheaper than GPT-4o-mini, 3x more context
+        self.cache = cache if cache is not None else ResponseCache()
+        # Every call is recorded in the transport's collector, shared with the other services
+        self.metrics = self.transport.metrics
+    
+    def chat_completion(self, messages: List[Dict[str, str]], max_completion_tokens: int,
+                        operation: str = 'llm.chat', cache: Optional[str] = None, **options):
+        """
+        Chat completion with this service's model, through the shared transport (retries, timeout).
+        
+        Args:
+            operation: Name the call is recorded under in the metrics
+            cache: 'miss' when the answer is about to be cached, None for uncached calls
+        """
+        with self.metrics.measure(operation, self.model, cache) as record:
+            response = self.transport.call('chat', lambda client: client.chat.completions.create(
+                model=self.model, messages=messages, max_completion_tokens=max_completion_tokens, **options
+            ), record)
+            record.add_usage(getattr(response, 'usage', None))
+            return response
+    
+    def stream_chat_completion(self, messages: List[Dict[str, str]], max_completion_tokens: int,
+                               operation: str = 'llm.chat', cache: Optional[str] = None,
+                               **options) -> Iterator[str]:
+        """Chat completion yielding the response text as it is generated"""
+        with self.metrics.measure(operation, self.model, cache) as record:
+            # The last chunk then carries the token usage of the whole response
+            stream = self.transport.call('chat', lambda client: client.chat.completions.create(
+                model=self.model, messages=messages, max_completion_tokens=max_completion_tokens, stream=True,
+                stream_options={"include_usage": True}, **options
+            ), record)
+            for chunk in stream:
+                record.add_usage(getattr(chunk, 'usage', None))
+                if chunk.choices and chunk.choices[0].delta.content:
+                    record.first_token()
+                    yield chunk.choices[0].delta.content
+    
+    async def achat_completion(self, messages: List[Dict[str, str]], max_completion_tokens: int,
+                               operation: str = 'llm.chat', cache: Optional[str] = None, **options):
+        """Async version of chat_completion"""
+        with self.metrics.measure(operation, self.model, cache) as record:
+            response = await self.transport.acall('chat', lambda client: client.chat.completions.create(
+                model=self.model, messages=messages, max_completion_tokens=max_completion_tokens, **options
+            ), record)
+            record.add_usage(getattr(response, 'usage', None))
+            return response
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of the response cache"""
+        return self.cache.stats()
     
     def process_braindump(self, raw_text: str) -> List[Dict[str, Any]]:
         """
         Process raw braindump text into organized, actionable tasks with priority and category
         """
-        try:
-            prompt = """
-            You are a task organization assistant. Convert the following brain dump into a clean, organized list of actionable tasks with priority and category.
+        return list(self.stream_braindump(raw_text))
+    
+    def stream_braindump(self, raw_text: str) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming version of process_braindump: yields each task as soon as the
+        model has finished writing it.
+        
+        Output that breaks off mid-task (token limit, dropped connection) keeps
+        the tasks already written plus the fully written fields of the last one.
+        Only output without a single parseable task falls back to the raw text
+        as one task. Only complete responses are cached, never cut-off ones.
+        """
+        cache_key = make_key('braindump', PROMPT_VERSIONS['braindump'], self.model, normalize_text(raw_text))
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            print("LLM cache hit: braindump")
+            self.metrics.record_cache_hit('llm.braindump', self.model)
+            yield from cached
+            return
+        
+        prompt = """
+        You are a task organization assistant. Convert the following brain dump into a clean, organized list of actionable tasks with priority and category.
 
-            Rules:
-            - Extract clear, actionable tasks
-            - Remove filler words and make tasks concise
-            - Group related items if appropriate
-            - Each task should be self-contained and clear
-            - Assign priority (high/medium/low) based on urgency and importance
-            - Assign category (client/business/personal) based on context
-            - Return as a JSON array of task objects
+        Rules:
+        - Extract clear, actionable tasks
+        - Remove filler words and make tasks concise
+        - Group related items if appropriate
+        - Each task should be self-contained and clear
+        - Assign priority (high/medium/low) based on urgency and importance
+        - Assign category (client/business/personal) based on context
+        - Return as a JSON array of task objects
 
-            Brain dump:
-            {text}
+        Brain dump:
+        {text}
 
-            Return ONLY a JSON array of task objects, no additional text.
-            Example: [
-                {{"text": "Review quarterly report", "priority": "high", "category": "business"}},
-                {{"text": "Call client about project", "priority": "medium", "category": "client"}},
-                {{"text": "Schedule team meeting", "priority": "low", "category": "personal"}}
-            ]
-            """.format(text=raw_text)
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
+        Return ONLY a JSON array of task objects, no additional text.
+        Example: [
+            {{"text": "Review quarterly report", "priority": "high", "category": "business"}},
+            {{"text": "Call client about project", "priority": "medium", "category": "client"}},
+            {{"text": "Schedule team meeting", "priority": "low", "category": "personal"}}
+        ]
+        """.format(text=raw_text)
+        
+        parser = JSONItemStream()
+        tasks = []
+        finished = False
+        try:
+            for chunk in self.stream_chat_completion(
                 messages=[
                     {"role": "system", "content": "You are a helpful task organization assistant."},
                     {"role": "user", "content": prompt}
                 ],
-                max_completion_tokens=500
-            )
-            
-            result = response.choices[0].message.content.strip()
-            
-            # Parse JSON response
-            tasks = json.loads(result)
-            
-            # Ensure we have a list of dictionaries
-            if isinstance(tasks, list):
-                # Convert string tasks to dict format for backward compatibility
-                structured_tasks = []
-                for task in tasks:
-                    if isinstance(task, str):
-                        structured_tasks.append({
-                            "text": task,
-                            "priority": "medium",
-                            "category": None
-                        })
-                    elif isinstance(task, dict):
-                        structured_tasks.append({
-                            "text": task.get("text", ""),
-                            "priority": task.get("priority", "medium"),
-                            "category": task.get("category")
-                        })
-                return structured_tasks
-            else:
-                return []
-            
+                max_completion_tokens=500,
+                operation='llm.braindump',
+                cache='miss'
+            ):
+                for item in parser.feed(chunk):
+                    task = _structured_task(item)
+                    if task is not None:
+                        tasks.append(task)
+                        yield task
+            finished = True
         except Exception as e:
             print(f"LLM processing error: {e}")
+        
+        salvaged = _structured_task(parser.salvage())
+        if salvaged is not None:
+            print(f"LLM processing: salvaged a task from cut-off output: {salvaged['text']}")
+            tasks.append(salvaged)
+            yield salvaged
+        elif finished and not parser.truncated and (tasks or parser.complete):
+            self.cache.put(cache_key, tasks)
+        
+        # An empty array is an answer; no parseable output at all is not
+        if not tasks and raw_text and not (finished and parser.complete):
             # Fallback: return the raw text as a single task
-            return [{"text": raw_text, "priority": "medium", "category": None}] if raw_text else []
+            yield {"text": raw_text, "priority": "medium", "category": None}
     
-    def detect_intent(self, transcription: str, current_tasks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def detect_intent(self, transcription: str, current_tasks: List[Dict[str, Any]],
+                      task_manager=None) -> Dict[str, Any]:
         """
         Detect user intent from voice command
+        
+        Args:
+            task_manager: TaskManager the tasks come from; its search index picks the
+                relevant tasks when the list is over the context budget
         """
+        search = task_manager.search_tasks if task_manager is not None else None
+        task_context, handles = build_task_context(current_tasks, transcription, INTENT_CONTEXT_TOKENS, search)
+        # The cached answer names a task by handle, which is resolved against the current list on every hit
+        cache_key = make_key('intent', PROMPT_VERSIONS['intent'], self.model, normalize_text(transcription), task_context)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            print("LLM cache hit: intent")
+            self.metrics.record_cache_hit('llm.intent', self.model)
+            return self._resolve_handle(cached, handles)
+        
         try:
-            # Convert tasks to JSON for context
-            tasks_json = json.dumps(current_tasks, indent=2)
-            
             prompt = f"""
             You are a task management assistant. Analyze the following voice command and determine the user's intent.
 
-            Current tasks:
-            {tasks_json}
+            Current tasks, one per line ({CONTEXT_HEADER}):
+            {task_context}
 
             User said: "{transcription}"
 
@@ -101,7 +218,7 @@ class LLMService:
             - braindump: User is doing a general brain dump (multiple tasks)
 
             Also identify:
-            - Which task they're referring to (if applicable) - return the task ID
+            - Which task they're referring to (if applicable) - return its handle, e.g. "t3"
             - New content (for add/modify)
             - Priority level mentioned (high/medium/low)
             - Category mentioned (client/business/personal)
@@ -110,24 +227,27 @@ class LLMService:
             {{
                 "intent": "...",
                 "confidence": 0.0-1.0,
-                "target_task_id": "..." or null,
+                "target_task_id": "t1" or null,
                 "new_content": "..." or null,
                 "priority": "..." or null,
                 "category": "..." or null
             }}
             """
             
-            response = self.client.chat.completions.create(
-                model=self.model,
+            response = self.chat_completion(
                 messages=[
                     {"role": "system", "content": "You are a task management assistant that analyzes voice commands."},
                     {"role": "user", "content": prompt}
                 ],
-                max_completion_tokens=300
+                max_completion_tokens=300,
+                operation='llm.intent',
+                cache='miss'
             )
             
             result = response.choices[0].message.content.strip()
-            return json.loads(result)
+            intent = json.loads(result)
+            self.cache.put(cache_key, intent)
+            return self._resolve_handle(intent, handles)
             
         except Exception as e:
             print(f"Intent detection error: {e}")
@@ -141,14 +261,37 @@ class LLMService:
                 "category": None
             }
     
-    def match_task(self, query: str, tasks: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    @staticmethod
+    def _resolve_handle(intent: Dict[str, Any], handles: Dict[str, str]) -> Dict[str, Any]:
+        """Replace the task handle in target_task_id with the task's id"""
+        handle = intent.get('target_task_id')
+        if handle is not None:
+            intent['target_task_id'] = handles.get(str(handle).strip().lower())
+        return intent
+    
+    def match_task(self, query: str, tasks: List[Dict[str, Any]],
+                   candidates: Optional[List[Tuple[Dict[str, Any], float]]] = None) -> Optional[Dict[str, Any]]:
         """
-        Find task by natural language description
+        Find task by natural language description.
+        
+        The text index answers clear matches locally; the model only sees the
+        shortlist when several tasks match about equally well, and the full list
+        when no task shares a word with the description.
+        
+        Args:
+            candidates: Ranked (task, score) pairs from TaskManager.search_tasks, if available
         """
         try:
             if not tasks:
                 return None
             
+            if candidates is None:
+                candidates = rank_tasks(query, tasks, MATCH_CANDIDATES)
+            if is_unambiguous(candidates):
+                return candidates[0][0]
+            if candidates:
+                tasks = [task for task, _ in candidates[:MATCH_CANDIDATES]]
+            
             # Create a simple task list for matching
             task_list = []
             for task in tasks:
@@ -166,13 +309,13 @@ class LLMService:
             Example: "123e4567-e89b-12d3-a456-426614174000"
             """
             
-            response = self.client.chat.completions.create(
-                model=self.model,
+            response = self.chat_completion(
                 messages=[
                     {"role": "system", "content": "You are a task matching assistant."},
                     {"role": "user", "content": prompt}
                 ],
-                max_completion_tokens=50
+                max_completion_tokens=50,
+                operation='llm.match_task'
             )
             
             result = response.choices[0].message.content.strip()
@@ -188,71 +331,139 @@ class LLMService:
             print(f"Task matching error: {e}")
             return None
     
-    def suggest_next_task(self, tasks: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    def _complete_uncut(self, messages: List[Dict[str, str]], max_tokens: int, operation: str):
         """
-        Suggest what task to work on next
+        Chat completion that is asked for again with twice the token allowance
+        when the output is cut off, up to PRIORITIZE_ATTEMPTS calls.
+        
+        Returns:
+            The first choice of the last response
         """
+        for attempt in range(PRIORITIZE_ATTEMPTS):
+            response = self.chat_completion(messages=messages, max_completion_tokens=max_tokens, operation=operation)
+            choice = response.choices[0]
+            if choice.finish_reason != 'length':
+                break
+            print(f"LLM: {operation} response cut off at {max_tokens} tokens")
+            max_tokens *= 2
+        return choice
+    
+    def suggest_next_task(self, tasks: List[Dict[str, Any]], candidates: Optional[List[Dict[str, Any]]] = None,
+                          rerank: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Suggest what task to work on next.
+        
+        The local score (priority, category, urgency words, age) decides; with
+        rerank the model picks among the top few candidates only.
+        
+        Args:
+            candidates: Best-first pending tasks from TaskManager.next_tasks, if available
+            rerank: Let the model choose among the top RERANK_CANDIDATES
+        """
+        if candidates is None:
+            candidates = top_tasks(tasks, RERANK_CANDIDATES)
+        if not candidates:
+            return None
+        if not rerank or len(candidates) == 1:
+            return candidates[0]
+        
         try:
-            pending_tasks = [t for t in tasks if not t['completed']]
-            if not pending_tasks:
-                return None
-            
-            # Create task list with priorities
-            task_list = []
-            for task in pending_tasks:
-                priority_emoji = {"high": "🔴", "medium": "🟡", "low": "🟢"}.get(task['priority'], "⚪")
-                task_list.append(f"{priority_emoji} {task['text']} (Priority: {task['priority']})")
-            
-            task_text = "\n".join(task_list)
+            candidates = candidates[:RERANK_CANDIDATES]
+            task_context, handles = build_task_context(candidates, "")
             
             prompt = f"""
-            Based on these pending tasks, suggest which one the user should work on next.
-            Consider priority levels and task content.
+            These pending tasks are ranked by priority, urgency and age. Suggest which
+            one the user should work on next, considering the task content too.
 
-            Pending tasks:
-            {task_text}
+            Tasks, one per line ({CONTEXT_HEADER}):
+            {task_context}
 
-            Return ONLY the task text that should be worked on next.
+            Return ONLY the handle of the task to work on next, e.g. "t1".
             """
             
-            response = self.client.chat.completions.create(
-                model=self.model,
+            choice = self._complete_uncut(
                 messages=[
                     {"role": "system", "content": "You are a task prioritization assistant."},
                     {"role": "user", "content": prompt}
                 ],
-                max_completion_tokens=100
+                max_tokens=PRIORITIZE_REASONING_TOKENS + NEXT_TASK_TOKENS,
+                operation='llm.next_task'
             )
             
-            result = response.choices[0].message.content.strip()
-            
-            # Find the matching task
-            for task in pending_tasks:
-                if task['text'].lower() in result.lower() or result.lower() in task['text'].lower():
-                    return task
-            
-            # Fallback to highest priority task
-            priority_order = {'high': 3, 'medium': 2, 'low': 1}
-            return max(pending_tasks, key=lambda t: priority_order.get(t['priority'], 0))
+            # A response that is still cut off has no handle and keeps the local pick
+            result = (choice.message.content or "").strip().strip('"\'.').lower()
+            by_id = {task['id']: task for task in candidates}
+            return by_id.get(handles.get(result), candidates[0])
             
         except Exception as e:
             print(f"Task suggestion error: {e}")
-            return None
+            return candidates[0]
     
-    def prioritize_tasks(self, tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def prioritize_tasks(self, tasks: List[Dict[str, Any]], rerank: bool = False, review_all: bool = False,
+                         chunk_size: int = PRIORITIZE_CHUNK_SIZE,
+                         max_concurrency: int = PRIORITIZE_CONCURRENCY) -> List[Dict[str, Any]]:
         """
-        Suggest task priorities based on content
+        Suggest task priorities based on content.
+        
+        Urgency words in the text ("today", "deadline"; "someday") set the
+        priority locally. With rerank the model reviews the RERANK_CANDIDATES
+        highest scoring tasks; with review_all it reviews every pending task,
+        in chunks of chunk_size sent up to max_concurrency at a time. A chunk
+        that fails keeps the local suggestions for its tasks.
+        
+        Returns:
+            Copies of the tasks with suggested priorities (task records are immutable)
         """
+        pending_tasks = [t for t in tasks if not t['completed']]
+        if not pending_tasks:
+            return tasks
+        
+        priorities = {task['id']: suggest_priority(task) for task in pending_tasks}
+        
+        if review_all:
+            chunks = [pending_tasks[i:i + chunk_size] for i in range(0, len(pending_tasks), chunk_size)]
+        elif rerank:
+            chunks = [top_tasks(pending_tasks, RERANK_CANDIDATES)]
+        else:
+            chunks = []
+        
+        if len(chunks) == 1:
+            priorities.update(self._review_priorities(chunks[0]))
+        elif chunks:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(chunks)))) as executor:
+                for reviewed in executor.map(self._review_priorities, chunks):
+                    priorities.update(reviewed)
+            print(f"Task prioritization: reviewed {len(pending_tasks)} tasks in {len(chunks)} chunks")
+        
+        return [
+            {**task, 'priority': priorities[task['id']]}
+            if task['id'] in priorities and priorities[task['id']] != task['priority'] else task
+            for task in tasks
+        ]
+    
+    def prioritize_and_save(self, task_manager, **options) -> List[str]:
+        """
+        Prioritize the tasks of task_manager and save every changed priority
+        with a single update_tasks call (one persisted write, one undo step).
+        
+        Args:
+            options: Passed on to prioritize_tasks (review_all, max_concurrency, ...)
+        
+        Returns:
+            Ids of the tasks whose priority changed
+        """
+        current_tasks = task_manager.get_tasks()
+        updated_tasks = self.prioritize_tasks(current_tasks, **options)
+        return task_manager.update_tasks([
+            {'id': updated['id'], 'priority': updated['priority']}
+            for updated, current in zip(updated_tasks, current_tasks)
+            if updated['priority'] != current['priority']
+        ])
+    
+    def _review_priorities(self, tasks: List[Dict[str, Any]]) -> Dict[str, str]:
+        """Model-suggested priorities for one chunk of tasks, as task id -> priority ({} on failure)"""
         try:
-            pending_tasks = [t for t in tasks if not t['completed']]
-            if not pending_tasks:
-                return tasks
-            
-            task_list = []
-            for task in pending_tasks:
-                task_list.append(f"ID: {task['id']}, Text: {task['text']}, Current Priority: {task['priority']}")
-            
-            task_text = "\n".join(task_list)
+            task_context, handles = build_task_context(tasks, "")
             
             prompt = f"""
             Analyze these tasks and suggest appropriate priority levels (high/medium/low) based on:
@@ -261,37 +472,48 @@ class LLMService:
             - Dependencies
             - Effort required
 
-            Tasks:
-            {task_text}
+            Tasks, one per line ({CONTEXT_HEADER}):
+            {task_context}
 
-            Return JSON array with task IDs and suggested priorities:
+            Return JSON array with task handles and suggested priorities:
             [
-                {{"id": "task_id", "priority": "high/medium/low"}},
+                {{"handle": "t1", "priority": "high/medium/low"}},
                 ...
             ]
             """
             
-            response = self.client.chat.completions.create(
-                model=self.model,
+            choice = self._complete_uncut(
                 messages=[
                     {"role": "system", "content": "You are a task prioritization assistant."},
                     {"role": "user", "content": prompt}
                 ],
-                max_completion_tokens=500
+                max_tokens=PRIORITIZE_REASONING_TOKENS + PRIORITIZE_TOKENS_PER_TASK * len(tasks),
+                operation='llm.prioritize'
             )
             
-            result = response.choices[0].message.content.strip()
-            suggestions = json.loads(result)
-            
-            # Apply suggestions
-            for suggestion in suggestions:
-                for task in tasks:
-                    if task['id'] == suggestion['id']:
-                        task['priority'] = suggestion['priority']
-                        break
-            
-            return tasks
+            # Only complete suggestions count; the tasks of a cut-off tail keep their local priority
+            priorities = {}
+            for suggestion in JSONItemStream().feed(choice.message.content or ""):
+                if not isinstance(suggestion, dict):
+                    continue
+                task_id = handles.get(str(suggestion.get('handle', '')).strip().lower())
+                if task_id is not None and suggestion.get('priority') in ('high', 'medium', 'low'):
+                    priorities[task_id] = suggestion['priority']
+            return priorities
             
         except Exception as e:
-            print(f"Task prioritization error: {e}")
-            return tasks
\ No newline at end of file
+            print(f"Task prioritization error ({len(tasks)} tasks): {e}")
+            return {}
+
+
+def _structured_task(item: Any) -> Optional[Dict[str, Any]]:
+    """Task dict from one parsed array item (plain strings are accepted for backward compatibility)"""
+    if isinstance(item, str) and item.strip():
+        return {"text": item, "priority": "medium", "category": None}
+    if isinstance(item, dict) and str(item.get("text", "")).strip():
+        return {
+            "text": item["text"],
+            "priority": item.get("priority", "medium"),
+            "category": item.get("category")
+        }
+    return None
@@ -0,0 +1,238 @@
+"""
+Shared OpenAI transport for every service.
+
+OpenAITransport owns one pooled, keep-alive HTTP client for sync calls and one
+for async calls, and hands the same OpenAI clients to transcription, LLM calls
+and the agent. Calls go through call()/acall(), which apply the endpoint's
+timeout and retry transient failures with jittered exponential backoff.
+
+Each transport also holds the LLMMetrics collector the services record their
+calls into; call()/acall() count retries on the record they are given.
+
+Async calls always run on the transport's own event loop, in a background
+thread. Pooled async connections belong to the loop that opened them, so
+reusing them from per-request loops would fail. run() lets synchronous code
+(Streamlit) wait for a coroutine on that loop.
+"""
+
+import asyncio
+import queue
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional
+
+import httpx
+from openai import (OpenAI, AsyncOpenAI, APIConnectionError, APITimeoutError,
+                    InternalServerError, RateLimitError)
+
+from services.llm_metrics import CallRecord, LLMMetrics
+
+# Seconds to wait on each read or write of a request, per kind of endpoint
+# (a streamed response may take longer in total, as long as tokens keep coming)
+ENDPOINT_TIMEOUTS = {
+    'chat': 30.0,
+    'transcription': 60.0,
+    'agent': 60.0
+}
+CONNECT_TIMEOUT = 5.0
+
+RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
+
+
+class OpenAITransport:
+    """Pooled sync and async OpenAI clients with per-endpoint timeouts and retries"""
+
+    def __init__(self, api_key: str, max_connections: int = 20, max_keepalive_connections: int = 10,
+                 keepalive_expiry: float = 60.0, max_retries: int = 3, backoff_base: float = 0.5,
+                 backoff_max: float = 8.0, timeouts: Optional[Dict[str, float]] = None,
+                 metrics: Optional[LLMMetrics] = None):
+        """
+        Args:
+            api_key: OpenAI API key
+            max_connections: Connections open at once per pool
+            max_keepalive_connections: Idle connections kept warm per pool
+            keepalive_expiry: Seconds an idle connection is kept
+            max_retries: Retries of a transient failure (connection, timeout, 429, 5xx)
+            backoff_base: Upper bound of the first retry delay; doubles per attempt
+            backoff_max: Upper bound of any retry delay
+            timeouts: Overrides for ENDPOINT_TIMEOUTS
+            metrics: Collector for per-call metrics (a new one by default)
+        """
+        self.api_key = api_key
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeouts = {**ENDPOINT_TIMEOUTS, **(timeouts or {})}
+        self.metrics = metrics if metrics is not None else LLMMetrics()
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        default_timeout = httpx.Timeout(self.timeouts['chat'], connect=CONNECT_TIMEOUT)
+
+        self.http_client = httpx.Client(limits=self._limits, timeout=default_timeout)
+        # Retries are done here, with jitter, so the SDK's own are turned off
+        self.client = OpenAI(api_key=api_key, http_client=self.http_client, max_retries=0)
+        self._endpoint_clients: Dict[str, OpenAI] = {}
+
+        self.async_http_client = httpx.AsyncClient(limits=self._limits, timeout=default_timeout)
+        self.async_client = AsyncOpenAI(api_key=api_key, http_client=self.async_http_client, max_retries=0)
+        self._async_endpoint_clients: Dict[str, AsyncOpenAI] = {}
+
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+
+    def timeout(self, endpoint: str) -> httpx.Timeout:
+        return httpx.Timeout(self.timeouts.get(endpoint, self.timeouts['chat']), connect=CONNECT_TIMEOUT)
+
+    def _client_for(self, endpoint: str) -> OpenAI:
+        # with_options shares the pooled HTTP client; only the timeout differs
+        with self._lock:
+            if endpoint not in self._endpoint_clients:
+                self._endpoint_clients[endpoint] = self.client.with_options(timeout=self.timeout(endpoint))
+            return self._endpoint_clients[endpoint]
+
+    def _async_client_for(self, endpoint: str) -> AsyncOpenAI:
+        with self._lock:
+            if endpoint not in self._async_endpoint_clients:
+                self._async_endpoint_clients[endpoint] = self.async_client.with_options(timeout=self.timeout(endpoint))
+            return self._async_endpoint_clients[endpoint]
+
+    def _delay(self, attempt: int, error: Exception) -> float:
+        """Full-jitter backoff, or the server's Retry-After when it sent one"""
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def call(self, endpoint: str, request: Callable[[OpenAI], Any], record: Optional[CallRecord] = None) -> Any:
+        """
+        Make a blocking request, retrying transient failures.
+
+        Args:
+            endpoint: Key of ENDPOINT_TIMEOUTS ('chat', 'transcription', ...)
+            request: Makes the request with the given client, e.g.
+                     lambda client: client.chat.completions.create(...)
+            record: Metrics record of the call, whose retries are counted here
+        """
+        client = self._client_for(endpoint)
+        for attempt in range(self.max_retries + 1):
+            try:
+                return request(client)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._delay(attempt, e)
+                if record is not None:
+                    record.retries += 1
+                print(f"OpenAITransport: {endpoint} request failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+
+    async def acall(self, endpoint: str, request: Callable[[AsyncOpenAI], Awaitable[Any]],
+                    record: Optional[CallRecord] = None) -> Any:
+        """Async version of call; the request runs on the transport's event loop"""
+        loop = self._get_loop()
+        if asyncio.get_running_loop() is loop:
+            return await self._acall(endpoint, request, record)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._acall(endpoint, request, record), loop))
+
+    async def _acall(self, endpoint: str, request: Callable[[AsyncOpenAI], Awaitable[Any]],
+                     record: Optional[CallRecord] = None) -> Any:
+        client = self._async_client_for(endpoint)
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await request(client)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._delay(attempt, e)
+                if record is not None:
+                    record.retries += 1
+                print(f"OpenAITransport: {endpoint} request failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self._loop.run_forever, name="OpenAITransportLoop", daemon=True
+                )
+                self._loop_thread.start()
+            return self._loop
+
+    async def _cancel_tasks(self):
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def run(self, coroutine: Awaitable[Any]) -> Any:
+        """
+        Run a coroutine on the transport's event loop and wait for its result (from sync code).
+        The coroutine is scheduled with call_soon_threadsafe, so it sees the caller's context
+        variables, such as the TaskManager undo actor.
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self._get_loop()).result()
+
+    def iterate(self, stream: AsyncIterator[Any]) -> Iterator[Any]:
+        """Consume an async iterator on the transport's event loop, yielding its items to sync code"""
+        items: "queue.Queue" = queue.Queue()
+        finished = object()
+
+        async def pump():
+            error = None
+            try:
+                async for item in stream:
+                    items.put((item, None))
+            except asyncio.CancelledError as e:
+                error = e
+                raise
+            except BaseException as e:
+                error = e
+            finally:
+                # Whatever ended the stream, cancellation included, the consumer must wake up
+                items.put((finished, error))
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self._get_loop())
+        try:
+            while True:
+                item, error = items.get()
+                if error is not None:
+                    raise error
+                if item is finished:
+                    return
+                yield item
+        finally:
+            # The consumer stopped early (or failed): stop producing
+            future.cancel()
+
+    def close(self):
+        """Close both connection pools and stop the event loop, cancelling calls still running on it"""
+        self.http_client.close()
+        if self._loop is not None:
+            self.run(self._cancel_tasks())
+            self.run(self.async_http_client.aclose())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join(timeout=5)
+            self._loop = None
+
+
+_transports: Dict[str, OpenAITransport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(api_key: str) -> OpenAITransport:
+    """The process-wide transport for an API key, created with default settings on first use"""
+    with _transports_lock:
+        if api_key not in _transports:
+            _transports[api_key] = OpenAITransport(api_key)
+        return _transports[api_key]
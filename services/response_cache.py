@@ -0,0 +1,146 @@
+"""
+Cache for LLM responses.
+
+Re-processing the same transcript (a retry, an accidental re-record, a demo
+phrase said again) should not pay for another model call. ResponseCache is an
+in-memory LRU with a TTL, optionally backed by a SQLite file so entries
+survive restarts. Keys are built by the caller from the normalized input, the
+model and the prompt version, so a prompt change never serves stale answers.
+Values are stored as JSON text, which means every hit returns a fresh copy.
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+_PUNCTUATION = re.compile(r"[^\w\s']")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Case, punctuation and spacing differences don't change what was said"""
+    text = _PUNCTUATION.sub(' ', text.lower())
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def make_key(*parts: Any) -> str:
+    """Stable hash of JSON-serializable key parts"""
+    data = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """LRU + TTL cache with an optional on-disk tier"""
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 24 * 3600,
+                 path: Optional[str] = None, max_disk_entries: int = 5000):
+        """
+        Args:
+            max_entries: Entries kept in memory; the least recently used is evicted beyond this
+            ttl_seconds: Age after which an entry is treated as missing
+            path: SQLite file for the on-disk tier (None keeps the cache in memory only)
+            max_disk_entries: Entries kept on disk, least recently used evicted first
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._counters = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0}
+
+        self._conn = None
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(path), check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    used_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_used_at ON responses(used_at)")
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        """The cached value, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._counters['hits'] += 1
+                    return json.loads(value)
+                del self._entries[key]
+                self._counters['expired'] += 1
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    with self._conn:
+                        self._conn.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+                    self._remember(key, row[0], row[1])
+                    self._counters['hits'] += 1
+                    self._counters['disk_hits'] += 1
+                    return json.loads(row[0])
+                if row is not None:
+                    with self._conn:
+                        self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._counters['expired'] += 1
+
+            self._counters['misses'] += 1
+            return None
+
+    def put(self, key: str, value: Any):
+        """Store a JSON-serializable value"""
+        now = time.time()
+        expires_at = now + self.ttl
+        data = json.dumps(value)
+        with self._lock:
+            self._remember(key, data, expires_at)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO responses (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)",
+                        (key, data, expires_at, now)
+                    )
+                    self._conn.execute(
+                        "DELETE FROM responses WHERE key IN "
+                        "(SELECT key FROM responses ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                        (self.max_disk_entries,)
+                    )
+
+    def _remember(self, key: str, data: str, expires_at: float):
+        """Insert into the memory tier, evicting the least recently used (lock held)"""
+        self._entries[key] = (expires_at, data)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters plus the current size and hit rate"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,57 @@
+"""
+Cold archive for long-completed tasks.
+
+Archived tasks leave the working set (saves, stats, prompts) and are appended
+to ``<storage_path>.archive.gz``. Each archiving run adds one gzip member of
+JSON lines; gzip readers see the concatenated members as one stream, so the
+file is only ever appended to and never rewritten.
+"""
+
+import gzip
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class TaskArchive:
+    """Append-only, compressed segment of archived task dicts"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._cache: Optional[List[Dict[str, Any]]] = None
+        self._cache_signature = None
+
+    def _signature(self):
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def append(self, tasks: Iterable[Dict[str, Any]]):
+        """Add tasks to the archive as a new compressed member"""
+        lines = ''.join(json.dumps(dict(task), separators=(',', ':')) + '\n' for task in tasks)
+        if not lines:
+            return
+        with gzip.open(self.path, 'at', encoding='utf-8') as f:
+            f.write(lines)
+
+    def load(self) -> List[Dict[str, Any]]:
+        """All archived tasks, oldest archiving run first (re-read only when the file changed)"""
+        signature = self._signature()
+        if signature is None:
+            return []
+        if self._cache is not None and signature == self._cache_signature:
+            return self._cache
+
+        tasks = []
+        try:
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    tasks.append(json.loads(line))
+        except (EOFError, OSError, ValueError) as e:
+            # A member cut short by a crash mid-append; everything before it is intact
+            print(f"TaskArchive: Stopped reading {self.path} at a damaged record: {e}")
+        self._cache = tasks
+        self._cache_signature = signature
+        return tasks
@@ -0,0 +1,93 @@
+"""
+Compact task context for LLM prompts.
+
+build_task_context renders one line per task, within a token budget:
+
+    t1|Call dentist|high|personal|open
+
+The short handles ("t1") stand in for UUIDs and are mapped back by the caller.
+When the whole list does not fit the token budget, the tasks most relevant to
+the utterance (by the local search ranking) are sent first, then pending tasks.
+Callers holding a TaskManager pass its search_tasks, so the ranking comes from
+the maintained index instead of one built over the list on every call.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.task_search import rank_tasks
+
+CONTEXT_HEADER = "handle|text|priority|category|status"
+
+# Long task texts are cut; the start is enough to identify a task
+MAX_TEXT_CHARS = 120
+
+# Matching tasks moved to the front when the list is over budget
+RELEVANT_TASKS = 20
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English)"""
+    return len(text) // 4 + 1
+
+
+def _task_line(handle: str, task: Dict[str, Any]) -> str:
+    text = ' '.join(str(task.get('text', '')).replace('|', '/').split())
+    if len(text) > MAX_TEXT_CHARS:
+        text = text[:MAX_TEXT_CHARS - 3] + '...'
+    status = 'done' if task.get('completed') else 'open'
+    return f"{handle}|{text}|{task.get('priority') or '-'}|{task.get('category') or '-'}|{status}"
+
+
+def _render(tasks: List[Dict[str, Any]], token_budget: int) -> Tuple[List[str], Dict[str, str]]:
+    lines = [CONTEXT_HEADER]
+    handles = {}
+    used = estimate_tokens(CONTEXT_HEADER)
+    for task in tasks:
+        handle = f"t{len(handles) + 1}"
+        line = _task_line(handle, task)
+        cost = estimate_tokens(line)
+        if used + cost > token_budget:
+            break
+        lines.append(line)
+        handles[handle] = task['id']
+        used += cost
+    return lines, handles
+
+
+def build_task_context(tasks: List[Dict[str, Any]], utterance: str, token_budget: int = 1500,
+                       search: Optional[Callable[[str, int], List[Tuple[Dict[str, Any], float]]]] = None
+                       ) -> Tuple[str, Dict[str, str]]:
+    """
+    Build the compact task listing for a prompt.
+
+    Args:
+        tasks: Tasks to list
+        utterance: What the user said; matching tasks go first when not all tasks fit
+        token_budget: Rough token limit for the listing
+        search: Ranks tasks for a query, like TaskManager.search_tasks(query, limit);
+            without it a one-off index over tasks is built when they don't all fit
+
+    Returns:
+        The context text and a handle -> task id map
+    """
+    if not tasks:
+        return "(no tasks)", {}
+
+    # Pending before completed, otherwise store order
+    ordered = sorted(tasks, key=lambda task: bool(task.get('completed')))
+    lines, handles = _render(ordered, token_budget)
+
+    if len(handles) < len(tasks) and utterance.strip():
+        # Over budget: the tasks most relevant to the utterance go first
+        if search is not None:
+            results = search(utterance, RELEVANT_TASKS)
+        else:
+            results = rank_tasks(utterance, tasks, limit=RELEVANT_TASKS)
+        listed = {task['id'] for task in tasks}
+        ranked = [task for task, _ in results if task['id'] in listed]
+        ranked_ids = {task['id'] for task in ranked}
+        lines, handles = _render(ranked + [task for task in ordered if task['id'] not in ranked_ids], token_budget)
+
+    if len(handles) < len(tasks):
+        lines.append(f"({len(tasks) - len(handles)} less relevant tasks omitted)")
+    return '\n'.join(lines), handles
@@ -1,146 +1,981 @@
-import json
 from pathlib import Path
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Callable, Iterable, Optional, Tuple
+from collections import Counter, OrderedDict, deque
+import atexit
+import contextvars
+import functools
+import threading
+import time
 import uuid
 
+from contextlib import nullcontext
+
+from services.task_storage import create_storage, apply_changes, move_task, FileLock
+from services.task_record import Task, FIELDS
+from services.task_migrations import SCHEMA_VERSION, upgrade_tasks
+from services.task_search import SearchIndex
+from services.task_archive import TaskArchive
+from services.task_query import TaskOrders, SORT_KEYS, STATUSES, PAGE_SIZE, encode_cursor, decode_cursor
+from services.task_scoring import TaskScores
+
+PRIORITIES = ('high', 'medium', 'low')
+CATEGORIES = ('client', 'business', 'personal')
+DURABILITY_LEVELS = ('sync', 'group', 'async')
+
+# Whose undo history a change belongs to (see TaskManager.set_actor)
+_actor: contextvars.ContextVar = contextvars.ContextVar('task_actor', default=None)
+
+
+def _writer(method):
+    """
+    Serialize a mutating method under the writer lock. Readers take that lock
+    only for a few in-memory reads (counters, indexes), never across I/O: the
+    changes are written after the lock is released, on this thread for 'sync'
+    durability, and group-commit writers wait for their flush then too, so
+    concurrent writers can share it. The outermost call is one step in the
+    undo history.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        state = self._thread_state
+        state.depth = getattr(state, 'depth', 0) + 1
+        try:
+            with self._lock:
+                # Start from the latest shared state so this change builds on other processes' writes
+                self._refresh_locked()
+                if state.depth == 1:
+                    self._history_step = []
+                try:
+                    result = method(self, *args, **kwargs)
+                finally:
+                    if state.depth == 1:
+                        self._commit_history_step()
+        finally:
+            state.depth -= 1
+        if state.depth == 0:
+            self._await_flush()
+        return result
+    return wrapper
+
+
 class TaskManager:
-    def __init__(self, storage_path: str = "tasks.json"):
+    def __init__(self, storage_path: str = "tasks.json", backend: str = 'json', debug: bool = False,
+                 durability: str = 'sync', flush_interval_ms: int = 50, shared: bool = False,
+                 lazy_migrations: bool = False, archive_after_days: Optional[int] = None,
+                 change_feed_size: int = 1000, history_size: int = 50, history_actors: int = 100,
+                 **storage_options):
+        """
+        Args:
+            storage_path: Where tasks are persisted
+            backend: 'json' rewrites the whole file on every change,
+                     'journal' appends changes to a log that is compacted into a snapshot,
+                     'sqlite' stores rows in an indexed database next to storage_path
+            debug: Check the incremental statistics against a full recount on every get_stats()
+            durability: 'sync' writes on the calling thread before returning,
+                        'group' queues the change and waits for the next batched flush,
+                        'async' queues the change and returns immediately
+            flush_interval_ms: Minimum time between background flushes ('group' and 'async')
+            shared: Several processes use the same store. Writes take a file lock,
+                    reads reload when another process changed the files, and writes
+                    merge with those changes instead of overwriting them.
+            lazy_migrations: When the store predates the current schema, upgrade records in
+                             memory only and let the next full write stamp the new version,
+                             instead of rewriting the store once at startup
+            archive_after_days: On startup, move tasks completed more than this many days ago
+                                to the compressed archive (None keeps everything in the store)
+            change_feed_size: Number of recent change events kept for changes_since()
+            history_size: Number of operations that can be undone, per actor
+            history_actors: Number of actors (e.g. app sessions) whose undo history is kept;
+                            the least recently active are forgotten
+            storage_options: Backend specific settings (e.g. compact_threshold for 'journal')
+        """
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"Unknown durability '{durability}'. Choose from: {', '.join(DURABILITY_LEVELS)}")
         self.storage_path = Path(storage_path)
-        self.tasks = self._load_tasks()
+        self.debug = debug
+        self.durability = durability
+        self.flush_interval = flush_interval_ms / 1000
+        self.shared = shared
+        self._lock = threading.RLock()
+        self._thread_state = threading.local()
+        self._storage = create_storage(backend, self.storage_path, **storage_options)
+        self._file_lock = FileLock(self.storage_path.with_name(self.storage_path.name + '.lock'))
+        self._archive = TaskArchive(self.storage_path.with_name(self.storage_path.name + '.archive.gz'))
+        # Ordered id -> Task map; the list returned by get_tasks() is built lazily from it
+        self._tasks: Dict[str, Task] = {}
+        self._task_list: Optional[List[Task]] = None
+        # Status/priority/category counters, the text index, the sort orders and
+        # the "what next" heap, kept in step with every mutation
+        self._counts: Counter = Counter()
+        self._search_index = SearchIndex()
+        self._orders = TaskOrders(self._tasks)
+        self._scores = TaskScores()
+        # Version bumped by every change event; the feed keeps the most recent events
+        self.version = 0
+        self._feed: deque = deque(maxlen=change_feed_size)
+        self._subscribers: List[Callable[[Dict[str, Any]], None]] = []
+        # Undo/redo steps per actor: lists of (task_id, previous task or None, position)
+        # inverse operations, where position is a deleted task's place in the order.
+        # Task records are immutable, so steps share them with the store instead of copying.
+        self.history_size = history_size
+        self.history_actors = history_actors
+        self._histories: "OrderedDict[Any, Tuple[deque, list]]" = OrderedDict()
+        self._history_step: Optional[List[Tuple[str, Optional[Task], Optional[int]]]] = None
+        # Positions of the tasks as of the current step's first delete
+        self._step_positions: Optional[Dict[str, int]] = None
+        with self._file_lock if shared else nullcontext():
+            self._reset(self._load_tasks())
+            # Fingerprint of the files as of our last load or write
+            self._signature = self._storage.signature()
+        
+        # Write-behind state: queued changes plus generation counters that
+        # let 'group' writers wait for the flush that covers their change
+        self._flush_cond = threading.Condition()
+        self._write_lock = threading.RLock()
+        self._pending_changes: List[tuple] = []
+        self._pending_save = False
+        self._queued_generation = 0
+        self._flushed_generation = 0
+        self._flush_error: Optional[Exception] = None
+        self._last_flush = 0.0
+        self._closed = False
+        self._flusher: Optional[threading.Thread] = None
+        if durability != 'sync':
+            self._flusher = threading.Thread(target=self._flush_loop, name="TaskManagerFlusher", daemon=True)
+            self._flusher.start()
+            atexit.register(self.close)
+        
         # Migrate existing tasks if needed
-        self._migrate_tasks()
+        if not lazy_migrations:
+            self._migrate_tasks()
+        
+        if archive_after_days is not None:
+            self.archive_completed(archive_after_days)
+            # Startup housekeeping is not something the user can undo
+            self._histories.clear()
+    
+    @property
+    def tasks(self) -> List[Task]:
+        """All tasks in insertion order, as an immutable snapshot safe to iterate without locks"""
+        task_list = self._task_list
+        if task_list is None:
+            # Rebuild under the writer lock so a concurrent write cannot leave a stale snapshot cached
+            with self._lock:
+                if self._task_list is None:
+                    self._task_list = list(self._tasks.values())
+                task_list = self._task_list
+        return task_list
+    
+    def _reset(self, tasks: Iterable[Dict[str, Any]]):
+        """Replace the whole in-memory store, converting loaded dicts to Task records"""
+        self._tasks = {task['id']: Task.from_dict(task) for task in tasks}
+        self._task_list = None
+        self._counts = Counter()
+        self._search_index = SearchIndex()
+        self._orders = TaskOrders(self._tasks)
+        self._scores = TaskScores()
+        for task in self._tasks.values():
+            self._link(task)
+    
+    def _put(self, task: Task):
+        """
+        Insert a new task or replace an existing one. Task records are
+        immutable, so the old version can be unlinked from the counters.
+        """
+        previous = self._tasks.get(task['id'])
+        self._remember(task.id, previous)
+        if previous is not None:
+            self._unlink(previous)
+        self._tasks[task['id']] = task
+        self._task_list = None
+        self._link(task)
+        if previous is None:
+            self._record('put', task.id, task.to_dict())
+        else:
+            self._record('put', task.id, {field: task[field] for field in FIELDS if task[field] != previous[field]})
+    
+    def _remove(self, task_id: str) -> Optional[Task]:
+        """Remove a task by id, returning it if it existed"""
+        task = self._tasks.get(task_id)
+        if task is not None:
+            self._remember(task_id, task, removed=True)
+            # Unlinked while still in the map: the sort orders look tasks up by id
+            self._unlink(task)
+            del self._tasks[task_id]
+            self._task_list = None
+            self._record('delete', task_id, None)
+        return task
     
-    def _load_tasks(self) -> List[Dict[str, Any]]:
-        """Load tasks from JSON file"""
-        if self.storage_path.exists():
+    def _remember(self, task_id: str, previous: Optional[Task], removed: bool = False):
+        """Note how to revert a change to one task in the current undo step"""
+        if self._history_step is not None:
+            position = None
+            if removed:
+                if self._step_positions is None:
+                    self._step_positions = self._positions()
+                position = self._step_positions.get(task_id)
+            self._history_step.append((task_id, previous, position))
+    
+    def _positions(self) -> Dict[str, int]:
+        return {task_id: position for position, task_id in enumerate(self._tasks)}
+    
+    def _commit_history_step(self):
+        """Close the current writer call's undo step; a new change invalidates redo"""
+        step = self._history_step
+        self._history_step = None
+        self._step_positions = None
+        if step:
+            undo_stack, redo_stack = self._history()
+            undo_stack.append(step)
+            redo_stack.clear()
+    
+    def _history(self) -> Tuple[deque, list]:
+        """The current actor's undo and redo stacks (writer lock held)"""
+        actor = _actor.get()
+        history = self._histories.get(actor)
+        if history is None:
+            history = self._histories[actor] = (deque(maxlen=self.history_size), [])
+            while len(self._histories) > self.history_actors:
+                self._histories.popitem(last=False)
+        else:
+            self._histories.move_to_end(actor)
+        return history
+    
+    def set_actor(self, actor: Any):
+        """
+        Attribute the following changes in this thread (or asyncio task) to
+        actor, e.g. an app session id, so that undo and redo only ever revert
+        that actor's own changes. Changes without an actor share one history.
+        """
+        _actor.set(actor)
+    
+    @property
+    def can_undo(self) -> bool:
+        history = self._histories.get(_actor.get())
+        return bool(history and history[0])
+    
+    @property
+    def can_redo(self) -> bool:
+        history = self._histories.get(_actor.get())
+        return bool(history and history[1])
+    
+    @_writer
+    def undo(self) -> bool:
+        """
+        Revert the current actor's most recent operation; a bulk call or
+        clear_all counts as one.
+        
+        Returns:
+            False if there was nothing to undo
+        """
+        undo_stack, redo_stack = self._history()
+        return self._replay_history(undo_stack, redo_stack)
+    
+    @_writer
+    def redo(self) -> bool:
+        """
+        Re-apply the current actor's most recently undone operation.
+        
+        Returns:
+            False if there was nothing to redo
+        """
+        undo_stack, redo_stack = self._history()
+        return self._replay_history(redo_stack, undo_stack)
+    
+    def _replay_history(self, source, target) -> bool:
+        """Apply the inverse operations of one step, pushing their own inverse onto target"""
+        # Replaying history is not itself a new undo step
+        self._history_step = None
+        if not source:
+            return False
+        step = source.pop()
+        
+        # A task's first entry holds its state from before the whole step
+        earliest = {}
+        for task_id, task, position in step:
+            earliest.setdefault(task_id, (task, position))
+        
+        # Where the tasks this removes were, so the inverse can put them back there
+        positions = self._positions() if any(task is None for task, _ in earliest.values()) else {}
+        inverse = []
+        changes = []
+        restored = []
+        for task_id, (task, position) in earliest.items():
+            current = self._tasks.get(task_id)
+            inverse.append((task_id, current, positions.get(task_id)))
+            if task is None:
+                if self._remove(task_id) is not None:
+                    changes.append(('delete', task_id, None))
+            else:
+                self._put(task)
+                changes.append(('put', task_id, task))
+                if current is None and position is not None:
+                    restored.append((position, task_id))
+        target.append(inverse)
+        
+        # Re-inserted tasks go back to where they were deleted from, not to the end.
+        # The moves are changes like any other, so a shared store replays them
+        # on top of another process's writes instead of losing them.
+        for position, task_id in sorted(restored):
+            move_task(self._tasks, task_id, position)
+            changes.append(('move', task_id, {'index': position}))
+        if restored:
+            self._task_list = None
+        if changes:
+            self._save_tasks(changes)
+        return True
+    
+    def _record(self, op: str, task_id: Optional[str], fields: Optional[Dict[str, Any]]):
+        """Append an event to the change feed and notify subscribers (writer lock held)"""
+        self.version += 1
+        # A reload brings in another process's changes, which no actor here made
+        actor = None if op == 'reload' else _actor.get()
+        event = {'version': self.version, 'op': op, 'task_id': task_id, 'fields': fields, 'actor': actor}
+        self._feed.append(event)
+        for callback in list(self._subscribers):
             try:
-                with open(self.storage_path, 'r') as f:
-                    return json.load(f)
-            except:
-                return []
-        return []
+                callback(event)
+            except Exception as e:
+                print(f"TaskManager: Change subscriber failed: {e}")
+    
+    def changes_since(self, version: int) -> Dict[str, Any]:
+        """
+        Change events after a given version, oldest first.
+        
+        Events are dicts with 'version', 'op' ('put', 'delete', 'clear' or
+        'reload'), 'task_id', 'fields' (every field for a new task, only the
+        changed ones for an update, None otherwise) and 'actor' (see set_actor).
+        'reload' means the store was replaced by another process's writes and
+        should be re-read in full.
+        
+        Returns:
+            Dict with 'version' (the current version), 'events' and 'complete',
+            which is False when older events have already left the feed
+        """
+        self._refresh()
+        with self._lock:
+            events = [event for event in self._feed if event['version'] > version]
+            oldest = self._feed[0]['version'] if self._feed else self.version + 1
+            return {
+                'version': self.version,
+                'events': events,
+                'complete': version >= oldest - 1
+            }
+    
+    def subscribe(self, callback: Callable[[Dict[str, Any]], None]) -> Callable[[], None]:
+        """
+        Call callback with every new change event. It runs on the writing thread
+        with the writer lock held, so it should be quick and must not block.
+        
+        Returns:
+            A function that unsubscribes the callback
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+        
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+    
+    def _link(self, task: Task):
+        """Add a task to the derived counters and indexes"""
+        self._counts['completed'] += task.completed
+        self._counts['priority', task.priority] += 1
+        self._counts['category', task.category] += 1
+        self._search_index.add(task.id, task.text)
+        self._orders.add(task)
+        self._scores.add(task)
+    
+    def _unlink(self, task: Task):
+        """Remove a task from the derived counters and indexes"""
+        self._counts['completed'] -= task.completed
+        self._counts['priority', task.priority] -= 1
+        self._counts['category', task.category] -= 1
+        self._search_index.remove(task.id, task.text)
+        self._orders.remove(task)
+        self._scores.remove(task)
+    
+    def _load_tasks(self) -> Iterable[Dict[str, Any]]:
+        """Load tasks from storage, upgrading records from older schema versions as they are read"""
+        tasks = self._storage.load()
+        return upgrade_tasks(tasks, self._storage.schema_version)
+    
+    def _save_tasks(self, changes: Optional[List[tuple]] = None):
+        """
+        Persist tasks. When the changes are known, incremental backends
+        write just those instead of the whole list. The changes are queued;
+        'sync' writers flush them once they release the writer lock, the
+        other durability levels leave them to the background flusher.
+        """
+        with self._flush_cond:
+            if changes is None:
+                self._pending_save = True
+            else:
+                self._pending_changes.extend(changes)
+            self._queued_generation += 1
+            self._thread_state.generation = self._queued_generation
+            self._flush_cond.notify_all()
+        if self.durability == 'sync' and not getattr(self._thread_state, 'depth', 0):
+            # Not inside a writer call (startup migration): nothing else will flush
+            self._await_flush()
+    
+    def _await_flush(self):
+        """
+        Make this thread's last queued change durable: write it now in 'sync'
+        durability, wait for the background flush that covers it in 'group'
+        """
+        generation = getattr(self._thread_state, 'generation', None)
+        if self.durability == 'async' or generation is None:
+            return
+        self._thread_state.generation = None
+        if self.durability == 'sync':
+            with self._flush_cond:
+                # Another thread's flush may already have written it
+                if self._flushed_generation >= generation:
+                    return
+            self.flush()
+            return
+        with self._flush_cond:
+            while self._flushed_generation < generation:
+                if self._flush_error is not None:
+                    raise self._flush_error
+                self._flush_cond.wait()
+    
+    def _write(self, changes: Optional[List[tuple]], tasks: List[Task]):
+        """
+        Hand changes (or a full rewrite when None) to the storage backend, with
+        the snapshot of the tasks they lead to (for backends that rewrite it all)
+        """
+        with self._write_lock, self._file_lock if self.shared else nullcontext():
+            if self.shared:
+                # Merge with whatever other processes wrote since we last looked
+                self._reload_locked(changes or [])
+                tasks = self.tasks
+            
+            if changes is None:
+                self._storage.save(tasks)
+            else:
+                self._storage.apply(changes, tasks)
+            
+            if self.shared:
+                self._signature = self._storage.signature()
+    
+    def _refresh(self):
+        """Reload if another process changed the store (shared mode only)"""
+        if self.shared and self._storage.signature() != self._signature:
+            with self._lock:
+                self._refresh_locked()
     
-    def _save_tasks(self):
-        """Save tasks to JSON file"""
-        with open(self.storage_path, 'w') as f:
-            json.dump(self.tasks, f, indent=2)
+    def _refresh_locked(self):
+        """_refresh for callers already holding the writer lock"""
+        if self.shared and self._storage.signature() != self._signature:
+            with self._write_lock, self._file_lock:
+                self._reload_locked([])
+    
+    def _reload_locked(self, in_flight: List[tuple]):
+        """
+        Reload the store from disk if it changed, then replay our changes that
+        are not on disk yet (the batch being written plus anything still queued).
+        Caller holds the writer, write and file locks.
+        """
+        signature = self._storage.signature()
+        if signature == self._signature:
+            return
+        print("TaskManager: Store changed by another process, reloading")
+        tasks = {task['id']: task for task in self._load_tasks()}
+        with self._flush_cond:
+            queued = list(self._pending_changes)
+        apply_changes(tasks, list(in_flight) + queued)
+        self._reset(list(tasks.values()))
+        self._signature = signature
+        self._record('reload', None, None)
+        # Inverse operations recorded against the old contents no longer apply
+        self._histories.clear()
+    
+    def flush(self):
+        """Write every queued change now"""
+        # The batch and the task snapshot are taken together under the writer lock,
+        # so the snapshot is exactly the state the batch leads to. Holding the write
+        # lock across take-and-write keeps batches in order. Only shared stores keep
+        # the writer lock for the write itself, since they may reload during it.
+        self._lock.acquire()
+        writer_locked = True
+        try:
+            with self._write_lock:
+                with self._flush_cond:
+                    changes = self._pending_changes
+                    full_save = self._pending_save
+                    generation = self._queued_generation
+                    self._pending_changes = []
+                    self._pending_save = False
+                tasks = self.tasks
+                if not self.shared:
+                    self._lock.release()
+                    writer_locked = False
+                
+                if changes or full_save:
+                    try:
+                        # A full rewrite already covers any individual changes
+                        self._write(None if full_save else _coalesce(changes), tasks)
+                    except Exception as e:
+                        with self._flush_cond:
+                            self._pending_changes[:0] = changes
+                            self._pending_save = self._pending_save or full_save
+                            self._flush_error = e
+                            self._flush_cond.notify_all()
+                        raise
+                
+                with self._flush_cond:
+                    self._flushed_generation = max(self._flushed_generation, generation)
+                    self._flush_error = None
+                    self._last_flush = time.monotonic()
+                    self._flush_cond.notify_all()
+        finally:
+            if writer_locked:
+                self._lock.release()
+    
+    def _flush_loop(self):
+        """Background flusher: write queued changes at most every flush_interval"""
+        while self._wait_for_batch():
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"TaskManager: Background flush failed, will retry: {e}")
+                time.sleep(self.flush_interval)
+    
+    def _wait_for_batch(self) -> bool:
+        """
+        Wait until changes are queued and flush_interval has passed since the
+        last flush, so a burst of changes shares one write. Every queued change
+        notifies the condition, so each wakeup waits out the rest of the
+        interval instead of closing the batch early.
+        
+        Returns:
+            False once the manager is closed
+        """
+        with self._flush_cond:
+            while not (self._pending_changes or self._pending_save or self._closed):
+                self._flush_cond.wait()
+            deadline = self._last_flush + self.flush_interval
+            while not self._closed and time.monotonic() < deadline:
+                self._flush_cond.wait(deadline - time.monotonic())
+            return not self._closed
+    
+    @_writer
+    def compact(self):
+        """Fold journaled changes into a fresh snapshot"""
+        self.flush()
+        self._maintain(self._storage.compact)
+    
+    def close(self):
+        """Flush outstanding changes and release storage on shutdown"""
+        if self._closed:
+            return
+        with self._flush_cond:
+            self._closed = True
+            self._flush_cond.notify_all()
+        if self._flusher is not None:
+            self._flusher.join()
+            atexit.unregister(self.close)
+        self.flush()
+        self._maintain(self._storage.close)
+    
+    def _maintain(self, operation):
+        """
+        Run a whole-store storage operation (compaction, close) on the current
+        tasks. Shared stores merge other processes' writes first.
+        """
+        with self._lock, self._write_lock, self._file_lock if self.shared else nullcontext():
+            if self.shared:
+                self._reload_locked([])
+            operation(self.tasks)
+            if self.shared:
+                self._signature = self._storage.signature()
     
     def _migrate_tasks(self):
-        """Migrate old task format to new format"""
-        migrated = False
-        for task in self.tasks:
-            if 'priority' not in task:
-                task['priority'] = 'medium'  # Default priority
-                migrated = True
-            if 'category' not in task:
-                task['category'] = None  # Default category
-                migrated = True
-            if 'modified_at' not in task:
-                task['modified_at'] = task['created_at']  # Use creation time as initial modification
-                migrated = True
-        
-        if migrated:
+        """Stamp a store written with an older schema, once; its records were upgraded on load"""
+        if self._storage.schema_version < SCHEMA_VERSION:
             self._save_tasks()
     
+    def _new_task(self, text: str, priority: str = 'medium', category: Optional[str] = None) -> Task:
+        """Build a new task record"""
+        now = datetime.now().isoformat()
+        return Task(str(uuid.uuid4()), text, priority, category, False, now, now, None)
+    
+    def _updated_task(self, current: Task, fields: Dict[str, Any]) -> Task:
+        """Build the updated copy of a task"""
+        # Update provided fields
+        changes = {key: value for key, value in fields.items() if key in ['text', 'priority', 'category', 'completed']}
+        
+        # Update modification timestamp
+        changes['modified_at'] = datetime.now().isoformat()
+        
+        # Handle completion timestamp
+        if 'completed' in fields:
+            if fields['completed']:
+                changes['completed_at'] = datetime.now().isoformat()
+            else:
+                changes['completed_at'] = None
+        
+        return current.replace(**changes)
+    
+    def _validate_fields(self, fields: Dict[str, Any], position: int) -> List[str]:
+        """Collect validation errors for one item of a bulk call"""
+        errors = []
+        if 'text' in fields and (not isinstance(fields['text'], str) or not fields['text'].strip()):
+            errors.append(f"item {position}: text cannot be empty")
+        if fields.get('priority') is not None and fields['priority'] not in PRIORITIES:
+            errors.append(f"item {position}: priority must be one of {', '.join(PRIORITIES)}, not '{fields['priority']}'")
+        if fields.get('category') is not None and fields['category'] not in CATEGORIES:
+            errors.append(f"item {position}: category must be one of {', '.join(CATEGORIES)}, not '{fields['category']}'")
+        return errors
+    
+    @_writer
     def add_task(self, text: str, priority: str = 'medium', category: Optional[str] = None) -> str:
         """Add a new task with enhanced attributes"""
-        now = datetime.now().isoformat()
-        task = {
-            'id': str(uuid.uuid4()),
-            'text': text,
-            'priority': priority,
-            'category': category,
-            'completed': False,
-            'created_at': now,
-            'modified_at': now,
-            'completed_at': None
-        }
-        self.tasks.append(task)
-        self._save_tasks()
+        task = self._new_task(text, priority, category)
+        self._put(task)
+        self._save_tasks([('put', task['id'], task)])
         return task['id']
     
+    @_writer
+    def add_tasks(self, items: List[Dict[str, Any]]) -> List[str]:
+        """
+        Add several tasks with a single persisted write.
+        
+        Args:
+            items: Dicts with 'text' and optional 'priority' and 'category'
+        
+        Returns:
+            The new task ids, in the order of items
+        
+        Raises:
+            ValueError: If any item is invalid; nothing is added in that case
+        """
+        errors = []
+        for position, item in enumerate(items):
+            if 'text' not in item:
+                errors.append(f"item {position}: text is required")
+            errors.extend(self._validate_fields(item, position))
+        if errors:
+            raise ValueError("Invalid tasks: " + "; ".join(errors))
+        
+        tasks = [
+            self._new_task(item['text'].strip(), item.get('priority') or 'medium', item.get('category'))
+            for item in items
+        ]
+        for task in tasks:
+            self._put(task)
+        if tasks:
+            self._save_tasks([('put', task['id'], task) for task in tasks])
+        return [task['id'] for task in tasks]
+    
+    @_writer
     def update_task(self, task_id: str, **kwargs) -> bool:
         """Update task attributes"""
-        for task in self.tasks:
-            if task['id'] == task_id:
-                # Update provided fields
-                for key, value in kwargs.items():
-                    if key in ['text', 'priority', 'category', 'completed']:
-                        task[key] = value
-                
-                # Update modification timestamp
-                task['modified_at'] = datetime.now().isoformat()
-                
-                # Handle completion timestamp
-                if 'completed' in kwargs:
-                    if kwargs['completed']:
-                        task['completed_at'] = datetime.now().isoformat()
-                    else:
-                        task['completed_at'] = None
-                
-                self._save_tasks()
-                return True
-        return False
+        current = self._tasks.get(task_id)
+        if current is None:
+            return False
+        task = self._updated_task(current, kwargs)
+        self._put(task)
+        self._save_tasks([('put', task_id, task)])
+        return True
+    
+    @_writer
+    def update_tasks(self, updates: List[Dict[str, Any]]) -> List[str]:
+        """
+        Update several tasks with a single persisted write.
+        
+        Args:
+            updates: Dicts with the task 'id' plus the fields to change
+        
+        Returns:
+            Ids of the tasks that were found and updated
+        
+        Raises:
+            ValueError: If any update is invalid; nothing is changed in that case
+        """
+        errors = []
+        for position, update in enumerate(updates):
+            if 'id' not in update:
+                errors.append(f"item {position}: id is required")
+            errors.extend(self._validate_fields(update, position))
+        if errors:
+            raise ValueError("Invalid updates: " + "; ".join(errors))
+        
+        changes = []
+        for update in updates:
+            current = self._tasks.get(update['id'])
+            if current is None:
+                continue
+            fields = {key: value for key, value in update.items() if key != 'id'}
+            task = self._updated_task(current, fields)
+            self._put(task)
+            changes.append(('put', task['id'], task))
+        if changes:
+            self._save_tasks(changes)
+        return [task_id for _, task_id, _ in changes]
     
+    @_writer
+    def complete_tasks(self, task_ids: List[str], completed: bool = True) -> List[str]:
+        """Mark several tasks complete (or incomplete) with a single persisted write"""
+        return self.update_tasks([
+            {'id': task_id, 'completed': completed}
+            for task_id in task_ids
+            if task_id in self._tasks and self._tasks[task_id]['completed'] != completed
+        ])
+    
+    @_writer
     def toggle_task(self, task_id: str):
         """Toggle task completion status"""
-        for task in self.tasks:
-            if task['id'] == task_id:
-                task['completed'] = not task['completed']
-                task['completed_at'] = datetime.now().isoformat() if task['completed'] else None
-                task['modified_at'] = datetime.now().isoformat()
-                self._save_tasks()
-                break
+        current = self._tasks.get(task_id)
+        if current is None:
+            return
+        completed = not current.completed
+        task = current.replace(
+            completed=completed,
+            completed_at=datetime.now().isoformat() if completed else None,
+            modified_at=datetime.now().isoformat()
+        )
+        self._put(task)
+        self._save_tasks([('put', task_id, task)])
     
+    @_writer
     def delete_task(self, task_id: str):
         """Delete a task"""
         print(f"TaskManager: Deleting task {task_id}")
-        print(f"TaskManager: Before delete - {len(self.tasks)} tasks")
-        self.tasks = [t for t in self.tasks if t['id'] != task_id]
-        print(f"TaskManager: After delete - {len(self.tasks)} tasks")
-        self._save_tasks()
+        print(f"TaskManager: Before delete - {len(self._tasks)} tasks")
+        removed = self._remove(task_id)
+        print(f"TaskManager: After delete - {len(self._tasks)} tasks")
+        if removed is not None:
+            self._save_tasks([('delete', task_id, None)])
+    
+    @_writer
+    def delete_tasks(self, task_ids: List[str]) -> List[str]:
+        """Delete several tasks with a single persisted write, returning the ids removed"""
+        removed = [task_id for task_id in task_ids if self._remove(task_id) is not None]
+        if removed:
+            self._save_tasks([('delete', task_id, None) for task_id in removed])
+        return removed
     
+    @_writer
     def clear_all(self):
         """Clear all tasks"""
-        self.tasks = []
-        self._save_tasks()
+        for task in self._tasks.values():
+            self._remember(task.id, task)
+        self._reset([])
+        self._record('clear', None, None)
+        self._save_tasks([('clear', None, None)])
     
     def get_tasks(self) -> List[Dict[str, Any]]:
         """Get all tasks"""
+        self._refresh()
         return self.tasks
     
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Look up a single task by id"""
+        self._refresh()
+        return self._tasks.get(task_id)
+    
+    def filter_tasks(self, priority: Optional[str] = None, category: Optional[str] = None,
+                     completed: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """Get tasks matching every given filter (None means any value)"""
+        filters = {}
+        if priority is not None:
+            filters['priority'] = priority
+        if category is not None:
+            filters['category'] = category
+        if completed is not None:
+            filters['completed'] = completed
+        return self._query(**filters)
+    
+    def _query(self, **filters) -> List[Dict[str, Any]]:
+        """Push field filters down to the storage indexes, or scan in memory"""
+        self._refresh()
+        with self._lock:
+            # The indexes only agree with memory once every change has been written,
+            # and once a lazily migrated store has been rewritten at the current schema
+            if self._storage_in_sync() and self._storage.schema_version >= SCHEMA_VERSION:
+                task_ids = self._storage.query_ids(**filters)
+                if task_ids is not None:
+                    return [self._tasks[task_id] for task_id in task_ids if task_id in self._tasks]
+            tasks = self.tasks
+        return [t for t in tasks if all(t[field] == value for field, value in filters.items())]
+    
+    def _storage_in_sync(self) -> bool:
+        """Whether the backend holds every change made in memory (no queued or in-flight writes)"""
+        with self._flush_cond:
+            return self._flushed_generation >= self._queued_generation
+    
+    def query_tasks(self, priority: Optional[str] = None, category: Optional[str] = None,
+                    status: Optional[str] = None, sort_by: str = 'created_at', descending: bool = False,
+                    limit: int = PAGE_SIZE, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Page through tasks matching the filters, in a maintained sort order.
+        
+        Args:
+            priority: Only tasks with this priority (None means any)
+            category: Only tasks in this category (None means any)
+            status: 'pending' or 'completed' (None means any)
+            sort_by: 'priority' (high first, then oldest), 'created_at' or 'modified_at'
+            descending: Reverse the order (e.g. most recently modified first)
+            limit: Page size
+            cursor: next_cursor from the previous page
+        
+        Returns:
+            Dict with 'tasks' (this page), 'next_cursor' (None on the last page)
+            and 'total' (number of tasks matching the filters)
+        
+        Raises:
+            ValueError: For an unknown sort key or status, or a cursor from a different sort order
+        """
+        if sort_by not in SORT_KEYS:
+            raise ValueError(f"Cannot sort tasks by '{sort_by}'. Choose from: {', '.join(SORT_KEYS)}")
+        if status is not None and status not in STATUSES:
+            raise ValueError(f"Unknown status '{status}'. Choose from: {', '.join(STATUSES)}")
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        after = decode_cursor(cursor, sort_by, descending) if cursor else None
+        
+        filters = {}
+        if priority is not None:
+            filters['priority'] = priority
+        if category is not None:
+            filters['category'] = category
+        if status is not None:
+            filters['completed'] = status == 'completed'
+        
+        self._refresh()
+        with self._lock:
+            task_ids, more = self._orders.page(sort_by, filters, limit, descending, after)
+            tasks = [self._tasks[task_id] for task_id in task_ids]
+            total = self._orders.count(filters)
+            next_cursor = encode_cursor(sort_by, descending, self._orders.key(sort_by, task_ids[-1])) if more else None
+        
+        return {'tasks': tasks, 'next_cursor': next_cursor, 'total': total}
+    
+    def search_tasks(self, query: str, limit: Optional[int] = 10) -> List[Tuple[Task, float]]:
+        """
+        Rank tasks by how well their text matches a description, using the local index.
+        
+        Returns:
+            Up to limit (task, score) pairs, best first; tasks sharing no word with the query are left out
+        """
+        self._refresh()
+        with self._lock:
+            results = self._search_index.search(query, limit)
+            return [(self._tasks[task_id], score) for task_id, score in results]
+    
+    def next_tasks(self, limit: int = 1) -> List[Task]:
+        """
+        The pending tasks to work on next, by local score (priority, category,
+        urgency words and age; see services/task_scoring.py).
+        
+        Returns:
+            Up to limit tasks, best first
+        """
+        self._refresh()
+        with self._lock:
+            return [self._tasks[task_id] for task_id in self._scores.top(limit)]
+    
     def get_tasks_by_priority(self, priority: str) -> List[Dict[str, Any]]:
         """Get tasks filtered by priority"""
-        return [t for t in self.tasks if t['priority'] == priority]
+        return self._query(priority=priority)
     
     def get_tasks_by_category(self, category: str) -> List[Dict[str, Any]]:
         """Get tasks filtered by category"""
-        return [t for t in self.tasks if t['category'] == category]
+        return self._query(category=category)
     
     def get_pending_tasks(self) -> List[Dict[str, Any]]:
         """Get all incomplete tasks"""
-        return [t for t in self.tasks if not t['completed']]
+        return self._query(completed=False)
     
-    def get_completed_tasks(self) -> List[Dict[str, Any]]:
-        """Get all completed tasks"""
-        return [t for t in self.tasks if t['completed']]
+    def get_completed_tasks(self, include_archived: bool = False) -> List[Dict[str, Any]]:
+        """Get all completed tasks, optionally with the archived ones first"""
+        tasks = self._query(completed=True)
+        if not include_archived:
+            return tasks
+        return self.get_archived_tasks() + tasks
+    
+    def get_archived_tasks(self) -> List[Dict[str, Any]]:
+        """Get tasks moved to the archive, in the order they were archived"""
+        # Same lock order as writers, so a read never overlaps an append
+        with self._write_lock, self._file_lock if self.shared else nullcontext():
+            records = self._archive.load()
+        # Last copy wins if an interrupted run archived a task twice; a task still
+        # in the store (archived but not yet deleted when a crash hit) is shown once
+        archived = {record['id']: record for record in records if record['id'] not in self._tasks}
+        return [Task.from_dict(record) for record in archived.values()]
+    
+    @_writer
+    def archive_completed(self, older_than_days: int = 30) -> int:
+        """
+        Move tasks completed more than older_than_days ago out of the store and
+        into the compressed, append-only archive.
+        
+        Returns:
+            Number of tasks archived
+        """
+        cutoff = datetime.now() - timedelta(days=older_than_days)
+        stale = [task for task in self._tasks.values() if task.completed and _completed_before(task, cutoff)]
+        if not stale:
+            return 0
+        
+        # Archive first: a crash before the deletes are saved leaves a duplicate, never a loss
+        with self._write_lock, self._file_lock if self.shared else nullcontext():
+            self._archive.append(stale)
+        for task in stale:
+            self._remove(task.id)
+        self._save_tasks([('delete', task.id, None) for task in stale])
+        print(f"TaskManager: Archived {len(stale)} tasks completed before {cutoff.date()}")
+        return len(stale)
     
     def get_stats(self) -> Dict[str, int]:
-        """Get task statistics"""
-        total = len(self.tasks)
-        completed = sum(1 for t in self.tasks if t['completed'])
+        """Get task statistics from the incrementally maintained counters"""
+        self._refresh()
+        # Held only for a handful of reads, so the counters are never seen mid-update
+        with self._lock:
+            stats = self._stats_from_counts()
+            if self.debug:
+                recounted = self._recount_stats()
+                assert stats == recounted, f"Task counters out of sync: {stats} != {recounted}"
+        return stats
+    
+    def _stats_from_counts(self) -> Dict[str, int]:
+        """Statistics dict built from the counters"""
+        counts = self._counts
+        total = len(self._tasks)
+        return {
+            'total': total,
+            'completed': counts['completed'],
+            'pending': total - counts['completed'],
+            'high_priority': counts['priority', 'high'],
+            'medium_priority': counts['priority', 'medium'],
+            'low_priority': counts['priority', 'low'],
+            'client_tasks': counts['category', 'client'],
+            'business_tasks': counts['category', 'business'],
+            'personal_tasks': counts['category', 'personal']
+        }
+    
+    def _recount_stats(self) -> Dict[str, int]:
+        """Compute statistics with full passes over the tasks (debug check)"""
+        tasks = list(self._tasks.values())
+        total = len(tasks)
+        completed = sum(1 for t in tasks if t['completed'])
         pending = total - completed
         
         # Priority breakdown
-        high_priority = len(self.get_tasks_by_priority('high'))
-        medium_priority = len(self.get_tasks_by_priority('medium'))
-        low_priority = len(self.get_tasks_by_priority('low'))
+        high_priority = sum(1 for t in tasks if t['priority'] == 'high')
+        medium_priority = sum(1 for t in tasks if t['priority'] == 'medium')
+        low_priority = sum(1 for t in tasks if t['priority'] == 'low')
         
         # Category breakdown
-        client_tasks = len(self.get_tasks_by_category('client'))
-        business_tasks = len(self.get_tasks_by_category('business'))
-        personal_tasks = len(self.get_tasks_by_category('personal'))
+        client_tasks = sum(1 for t in tasks if t['category'] == 'client')
+        business_tasks = sum(1 for t in tasks if t['category'] == 'business')
+        personal_tasks = sum(1 for t in tasks if t['category'] == 'personal')
         
         return {
             'total': total,
@@ -152,4 +987,37 @@ class TaskManager:
             'client_tasks': client_tasks,
             'business_tasks': business_tasks,
             'personal_tasks': personal_tasks
-        }
\ No newline at end of file
+        }
+
+
+def _completed_before(task: Task, cutoff: datetime) -> bool:
+    """Whether a task's completion time is known and earlier than cutoff"""
+    try:
+        return datetime.fromisoformat(task.completed_at) < cutoff
+    except (TypeError, ValueError):
+        return False
+
+
+def _coalesce(changes: List[tuple]) -> List[tuple]:
+    """
+    Collapse a batch of changes to the last change per task. Each task keeps
+    the position of its first change so replaying the batch preserves insertion
+    order, and nothing before the last 'clear' needs writing at all. Moves are
+    kept as they are, after the change they follow.
+    """
+    last_clear = max((i for i, (op, _, _) in enumerate(changes) if op == 'clear'), default=None)
+    if last_clear is not None:
+        changes = changes[last_clear:]
+    
+    positions: Dict[str, int] = {}
+    coalesced = []
+    for change in changes:
+        task_id = change[1]
+        if task_id is None or change[0] == 'move':
+            coalesced.append(change)
+        elif task_id in positions:
+            coalesced[positions[task_id]] = change
+        else:
+            positions[task_id] = len(coalesced)
+            coalesced.append(change)
+    return coalesced
@@ -0,0 +1,58 @@
+"""
+Schema migrations for stored tasks.
+
+Every store records the schema version it was written with (a header in the
+JSON snapshot, ``PRAGMA user_version`` in SQLite). On load, only the migrations
+newer than that version run, one record at a time as the records are read, so
+an up-to-date store pays nothing. Register new migrations with ``@migration(n)``
+in increasing order; each one upgrades a single task dict in place.
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+MIGRATIONS: List[Tuple[int, Callable[[Dict[str, Any]], None]]] = []
+
+
+def migration(version: int):
+    """Register a per-record migration that upgrades tasks to ``version``"""
+    def register(func):
+        if MIGRATIONS and version <= MIGRATIONS[-1][0]:
+            raise ValueError(f"Migration {version} registered after {MIGRATIONS[-1][0]}; versions must increase")
+        MIGRATIONS.append((version, func))
+        return func
+    return register
+
+
+@migration(1)
+def _backfill_attributes(task: Dict[str, Any]):
+    """Tasks from before priorities, categories and modification times"""
+    if task.get('priority') is None:
+        task['priority'] = 'medium'  # Default priority
+    task.setdefault('category', None)  # Default category
+    if task.get('modified_at') is None:
+        task['modified_at'] = task.get('created_at')  # Use creation time as initial modification
+
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def pending_migrations(version: int) -> List[Callable[[Dict[str, Any]], None]]:
+    """Migrations a store written at ``version`` still needs, oldest first"""
+    return [func for migration_version, func in MIGRATIONS if migration_version > version]
+
+
+def upgrade_tasks(tasks: Iterable[Dict[str, Any]], version: int) -> Iterable[Dict[str, Any]]:
+    """
+    Upgrade tasks written at ``version`` to SCHEMA_VERSION. Current stores are
+    returned untouched; older ones are migrated lazily as the result is iterated.
+    """
+    steps = pending_migrations(version)
+    if not steps:
+        return tasks
+    return (_upgrade(task, steps) for task in tasks)
+
+
+def _upgrade(task: Dict[str, Any], steps: List[Callable[[Dict[str, Any]], None]]) -> Dict[str, Any]:
+    for step in steps:
+        step(task)
+    return task
@@ -0,0 +1,128 @@
+"""
+Maintained sort orders behind TaskManager.query_tasks.
+
+Tasks are bucketed by (priority, category, completed) and every bucket keeps
+one list of task ids per sort field, sorted by the tasks' keys. Keys are
+computed from the task records when compared (priority rank and integer
+timestamps, ending with the task id), so the buckets hold nothing but ids. A
+filtered query merges just the matching buckets lazily and stops after
+``limit`` tasks, so the first page of "pending high-priority tasks by
+modification time" never visits the rest of the store. The id at the end of
+each key makes it unique and lets an opaque cursor resume exactly after the
+last task of the previous page.
+"""
+
+import base64
+import heapq
+import json
+from bisect import bisect_left, bisect_right, insort
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+SORT_KEYS = ('priority', 'created_at', 'modified_at')
+STATUSES = ('pending', 'completed')
+
+# Tasks per page when a listing doesn't ask for a size
+PAGE_SIZE = 20
+
+_PRIORITY_RANK = {'high': 0, 'medium': 1, 'low': 2}
+
+Bucket = Tuple[Optional[str], Optional[str], bool]
+
+
+def sort_key(task, field: str) -> tuple:
+    """Sort key for one task: priority ties fall back to creation order"""
+    if field == 'priority':
+        return (_PRIORITY_RANK.get(task.priority, len(_PRIORITY_RANK)), task.timestamp('created_at'), task.id)
+    return (task.timestamp(field), task.id)
+
+
+def encode_cursor(field: str, descending: bool, key: tuple) -> str:
+    data = json.dumps([field, descending, list(key)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor: str, field: str, descending: bool) -> tuple:
+    """Key of the last task on the previous page"""
+    try:
+        cursor_field, cursor_descending, key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_field != field or cursor_descending != descending:
+        raise ValueError("Cursor belongs to a query with a different sort order")
+    # Every part but the trailing task id is an integer rank or timestamp
+    if (not isinstance(key, list) or not key or not isinstance(key[-1], str)
+            or not all(type(part) is int for part in key[:-1])):
+        raise ValueError("Invalid cursor")
+    return tuple(key)
+
+
+class TaskOrders:
+    """Sorted id lists per sort field and (priority, category, completed) bucket"""
+
+    def __init__(self, tasks: Mapping[str, Any]):
+        """
+        Args:
+            tasks: The live id -> task map. A task must still be in it, unchanged,
+                   when it is removed here.
+        """
+        self._orders: Dict[str, Dict[Bucket, List[str]]] = {field: {} for field in SORT_KEYS}
+        self._keys: Dict[str, Callable[[str], tuple]] = {
+            field: (lambda task_id, field=field: sort_key(tasks[task_id], field)) for field in SORT_KEYS
+        }
+
+    @staticmethod
+    def _bucket(task) -> Bucket:
+        return (task.priority, task.category, task.completed)
+
+    def key(self, field: str, task_id: str) -> tuple:
+        """Sort key of a task in the field's order (what a cursor holds)"""
+        return self._keys[field](task_id)
+
+    def add(self, task):
+        bucket = self._bucket(task)
+        for field, buckets in self._orders.items():
+            insort(buckets.setdefault(bucket, []), task.id, key=self._keys[field])
+
+    def remove(self, task):
+        bucket = self._bucket(task)
+        for field, buckets in self._orders.items():
+            task_ids = buckets.get(bucket)
+            if not task_ids:
+                continue
+            position = bisect_left(task_ids, sort_key(task, field), key=self._keys[field])
+            if position < len(task_ids) and task_ids[position] == task.id:
+                del task_ids[position]
+            if not task_ids:
+                del buckets[bucket]
+
+    def _matching(self, field: str, filters: Dict[str, Any]) -> List[List[str]]:
+        positions = {'priority': 0, 'category': 1, 'completed': 2}
+        return [
+            task_ids for bucket, task_ids in self._orders[field].items()
+            if all(bucket[positions[name]] == value for name, value in filters.items())
+        ]
+
+    def count(self, filters: Dict[str, Any]) -> int:
+        """Number of tasks matching the filters, from the bucket sizes"""
+        return sum(len(task_ids) for task_ids in self._matching('created_at', filters))
+
+    def scan(self, field: str, filters: Dict[str, Any], descending: bool = False,
+             after: Optional[tuple] = None) -> Iterator[str]:
+        """Lazily yield ids of matching tasks in order, starting after a cursor key"""
+        key = self._keys[field]
+        runs = []
+        for task_ids in self._matching(field, filters):
+            if descending:
+                start = len(task_ids) if after is None else bisect_left(task_ids, after, key=key)
+                runs.append(map(task_ids.__getitem__, range(start - 1, -1, -1)))
+            else:
+                start = 0 if after is None else bisect_right(task_ids, after, key=key)
+                runs.append(map(task_ids.__getitem__, range(start, len(task_ids))))
+        return heapq.merge(*runs, key=key, reverse=descending)
+
+    def page(self, field: str, filters: Dict[str, Any], limit: int, descending: bool = False,
+             after: Optional[tuple] = None) -> Tuple[List[str], bool]:
+        """Up to limit task ids, plus whether more follow"""
+        task_ids = list(islice(self.scan(field, filters, descending, after), limit + 1))
+        return task_ids[:limit], len(task_ids) > limit
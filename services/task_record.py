@@ -0,0 +1,181 @@
+"""
+Compact in-memory task record.
+
+Task keeps the task fields in __slots__, stores priority and category as small
+interned codes and timestamps as integer epoch microseconds, and reads like a
+dict (task['text'], task.get('category'), dict(task), json via to_dict()).
+
+Records are immutable: TaskManager replaces a task with ``task.replace(...)``
+instead of editing it, which is what lets readers share them without locks.
+"""
+
+from collections.abc import Mapping
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+FIELDS = ('id', 'text', 'priority', 'category', 'completed',
+          'created_at', 'modified_at', 'completed_at')
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# Sort position of a missing or unreadable timestamp: before every real one
+MISSING_TIME = -(1 << 63)
+
+
+class _Interner:
+    """Maps a small set of repeated values (priorities, categories) to int codes"""
+
+    def __init__(self, values: List[Any]):
+        self.values = list(values)
+        self.codes = {value: code for code, value in enumerate(self.values)}
+
+    def code(self, value: Any) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+_PRIORITIES = _Interner(['high', 'medium', 'low'])
+_CATEGORIES = _Interner([None, 'client', 'business', 'personal'])
+
+
+def _pack_time(value: Optional[str]):
+    """ISO timestamp -> epoch microseconds, keeping the string if it would not round-trip"""
+    if value is None or not isinstance(value, str):
+        return value
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return value
+    if parsed.tzinfo is not None or parsed.isoformat() != value:
+        return value
+    return (parsed - _EPOCH) // _MICROSECOND
+
+
+def _unpack_time(value) -> Optional[str]:
+    if isinstance(value, int):
+        return (_EPOCH + value * _MICROSECOND).isoformat()
+    return value
+
+
+def _time_rank(value) -> int:
+    """Packed timestamp as comparable epoch microseconds (the rare kept string is parsed again)"""
+    if isinstance(value, int):
+        return value
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return MISSING_TIME
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return (parsed - _EPOCH) // _MICROSECOND
+
+
+class Task(Mapping):
+    """Immutable, slotted task record with a read-only dict interface"""
+
+    __slots__ = ('id', 'text', '_priority', '_category', 'completed',
+                 '_created_at', '_modified_at', '_completed_at', '_extra')
+
+    def __init__(self, id: str, text: str, priority: Optional[str] = 'medium', category: Optional[str] = None,
+                 completed: bool = False, created_at: Optional[str] = None, modified_at: Optional[str] = None,
+                 completed_at: Optional[str] = None, extra: Optional[Dict[str, Any]] = None):
+        self.id = id
+        self.text = text
+        self._priority = _PRIORITIES.code(priority)
+        self._category = _CATEGORIES.code(category)
+        self.completed = bool(completed)
+        self._created_at = _pack_time(created_at)
+        self._modified_at = _pack_time(modified_at)
+        self._completed_at = _pack_time(completed_at)
+        # Unknown keys from hand-edited or future files are kept, not dropped
+        self._extra = extra or None
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> 'Task':
+        if isinstance(data, Task):
+            return data
+        extra = {key: value for key, value in data.items() if key not in FIELDS}
+        return cls(
+            data['id'],
+            data.get('text', ''),
+            data.get('priority', 'medium'),
+            data.get('category'),
+            data.get('completed', False),
+            data.get('created_at'),
+            data.get('modified_at'),
+            data.get('completed_at'),
+            extra
+        )
+
+    def replace(self, **fields) -> 'Task':
+        """Return a copy with some fields changed"""
+        data = self.to_dict()
+        data.update(fields)
+        return Task.from_dict(data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {field: self[field] for field in FIELDS}
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+    @property
+    def priority(self) -> Optional[str]:
+        return _PRIORITIES.values[self._priority]
+
+    @property
+    def category(self) -> Optional[str]:
+        return _CATEGORIES.values[self._category]
+
+    @property
+    def created_at(self) -> Optional[str]:
+        return _unpack_time(self._created_at)
+
+    @property
+    def modified_at(self) -> Optional[str]:
+        return _unpack_time(self._modified_at)
+
+    @property
+    def completed_at(self) -> Optional[str]:
+        return _unpack_time(self._completed_at)
+
+    def timestamp(self, field: str) -> int:
+        """A timestamp field as epoch microseconds, for ordering without building the ISO string"""
+        return _time_rank(getattr(self, '_' + field))
+
+    def __getitem__(self, key: str) -> Any:
+        if key in FIELDS:
+            return getattr(self, key)
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        # Mapping.get goes through an exception for misses; this is on hot paths
+        if key in FIELDS:
+            return getattr(self, key)
+        if self._extra:
+            return self._extra.get(key, default)
+        return default
+
+    def __iter__(self) -> Iterator[str]:
+        yield from FIELDS
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return len(FIELDS) + (len(self._extra) if self._extra else 0)
+
+    def __repr__(self) -> str:
+        return f"Task({self.to_dict()!r})"
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        Task.__init__(self, **{key: state.get(key) for key in FIELDS if key in state},
+                      extra={key: value for key, value in state.items() if key not in FIELDS})
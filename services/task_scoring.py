@@ -0,0 +1,115 @@
+"""
+Local scoring for "what should I work on next".
+
+A pending task's score adds up its priority, its category, urgency words in its
+text ("today", "deadline", "asap"; "someday" counts against) and its age, so
+old tasks rise instead of starving. Age grows at the same rate for every task,
+so the order between two tasks never changes with time: rank_key drops the
+"now" term and is fixed when the task is written. That is what lets TaskScores
+keep the pending tasks in a heap, making the next task an O(log n) lookup.
+"""
+
+import heapq
+import re
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+PRIORITY_WEIGHTS = {'high': 3.0, 'medium': 2.0, 'low': 1.0}
+CATEGORY_WEIGHTS = {'client': 1.0, 'business': 0.5, 'personal': 0.0}
+
+# Words in the task text that make it more (or less) urgent
+URGENCY_KEYWORDS = {
+    'overdue': 3.0, 'asap': 2.5, 'urgent': 2.5, 'urgently': 2.5, 'immediately': 2.5,
+    'today': 2.0, 'tonight': 2.0, 'deadline': 1.5, 'due': 1.0, 'tomorrow': 1.0, 'soon': 0.5,
+    'someday': -1.5, 'eventually': -1.0, 'whenever': -1.0, 'maybe': -0.5
+}
+
+# Score gained per day a task stays pending: a low priority task overtakes a fresh high one after 20 days
+AGE_WEIGHT_PER_DAY = 0.1
+
+# Urgency at which prioritize_tasks raises a task to high (and below 0 lowers it to low)
+HIGH_URGENCY = 2.0
+
+_WORD = re.compile(r"[a-z]+")
+_SECONDS_PER_DAY = 86400
+
+
+def urgency(text: str) -> float:
+    """Sum of the urgency keyword weights in a task text (each word counted once)"""
+    return sum(URGENCY_KEYWORDS.get(word, 0.0) for word in set(_WORD.findall(text.lower())))
+
+
+def _created_days(task) -> float:
+    created_at = task.get('created_at')
+    try:
+        return datetime.fromisoformat(created_at).timestamp() / _SECONDS_PER_DAY
+    except (TypeError, ValueError):
+        return time.time() / _SECONDS_PER_DAY
+
+
+def rank_key(task) -> float:
+    """Time-independent part of the score: higher means sooner"""
+    return (PRIORITY_WEIGHTS.get(task.get('priority'), PRIORITY_WEIGHTS['medium'])
+            + CATEGORY_WEIGHTS.get(task.get('category'), 0.0)
+            + urgency(task.get('text', ''))
+            - AGE_WEIGHT_PER_DAY * _created_days(task))
+
+
+def score_task(task, now: Optional[float] = None) -> float:
+    """Score of a task at a point in time (epoch seconds, default now)"""
+    now = time.time() if now is None else now
+    return rank_key(task) + AGE_WEIGHT_PER_DAY * now / _SECONDS_PER_DAY
+
+
+def top_tasks(tasks: List[Dict[str, Any]], limit: int = 1) -> List[Dict[str, Any]]:
+    """Highest scoring pending tasks of a plain list, best first"""
+    pending = [task for task in tasks if not task.get('completed')]
+    return heapq.nlargest(limit, pending, key=rank_key)
+
+
+def suggest_priority(task) -> str:
+    """Priority the task's urgency words call for, or its current priority"""
+    signal = urgency(task.get('text', ''))
+    if signal >= HIGH_URGENCY:
+        return 'high'
+    if signal < 0:
+        return 'low'
+    return task.get('priority') or 'medium'
+
+
+class TaskScores:
+    """Max-heap of pending tasks by rank_key, with lazy deletion"""
+
+    def __init__(self):
+        self._heap: List[tuple] = []
+        self._keys: Dict[str, float] = {}
+
+    def add(self, task):
+        if task.completed:
+            return
+        key = rank_key(task)
+        self._keys[task.id] = key
+        heapq.heappush(self._heap, (-key, task.id))
+
+    def remove(self, task):
+        # The heap entry stays until it surfaces; rebuild once stale entries dominate
+        if self._keys.pop(task.id, None) is not None and len(self._heap) > 2 * len(self._keys) + 64:
+            self._heap = [(-key, task_id) for task_id, key in self._keys.items()]
+            heapq.heapify(self._heap)
+
+    def top(self, limit: int = 1) -> List[str]:
+        """Ids of the highest scoring pending tasks, best first"""
+        found = []
+        seen = set()
+        while self._heap and len(found) < limit:
+            entry = heapq.heappop(self._heap)
+            task_id = entry[1]
+            # Stale: the task was removed or re-scored since this entry was pushed
+            if task_id in seen or self._keys.get(task_id) != -entry[0]:
+                continue
+            seen.add(task_id)
+            found.append(entry)
+        for entry in found:
+            heapq.heappush(self._heap, entry)
+        return [task_id for _, task_id in found]
@@ -0,0 +1,122 @@
+"""
+Local full-text search over task text.
+
+SearchIndex is an inverted index (term -> task id -> term frequency) that
+TaskManager keeps in step with every mutation, ranked with BM25. Words are
+lowercased, stripped of a few filler words and reduced with a small suffix
+stemmer, so "call the dentist" finds "Calling dentist".
+"""
+
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = frozenset({
+    'a', 'an', 'and', 'about', 'at', 'for', 'i', 'in', 'is', 'it', 'me', 'my',
+    'of', 'on', 'or', 'task', 'tasks', 'that', 'the', 'this', 'to', 'with'
+})
+
+# A runner-up scoring above top / AMBIGUITY_RATIO makes a search ambiguous
+AMBIGUITY_RATIO = 1.5
+
+
+def stem(word: str) -> str:
+    """Strip common English inflections: plurals, -ing and -ed"""
+    if len(word) > 4 and word.endswith('ies'):
+        word = word[:-3] + 'y'
+    elif len(word) > 4 and word.endswith(('sses', 'ches', 'shes', 'xes', 'zes')):
+        word = word[:-2]
+    elif len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        word = word[:-1]
+
+    for suffix in ('ing', 'ed'):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            # planning -> plann -> plan
+            if len(word) > 3 and word[-1] == word[-2] and word[-1] not in 'lsz':
+                word = word[:-1]
+            break
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into stemmed search terms"""
+    return [stem(word) for word in _WORD.findall(text.lower()) if word not in STOP_WORDS]
+
+
+class SearchIndex:
+    """Incremental inverted index with BM25 ranking"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add(self, doc_id: str, text: str):
+        """Index a document; call remove() first when replacing one"""
+        terms = tokenize(text)
+        for term, count in Counter(terms).items():
+            self._postings.setdefault(term, {})[doc_id] = count
+        self._lengths[doc_id] = len(terms)
+        self._total_length += len(terms)
+
+    def remove(self, doc_id: str, text: str):
+        """Drop a document, given the text it was indexed with"""
+        if doc_id not in self._lengths:
+            return
+        for term in set(tokenize(text)):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._lengths.pop(doc_id)
+
+    def search(self, query: str, limit: Optional[int] = 10) -> List[Tuple[str, float]]:
+        """Return (doc_id, score) pairs for documents sharing a term with the query, best first"""
+        doc_count = len(self._lengths)
+        if not doc_count:
+            return []
+        average_length = self._total_length / doc_count or 1
+
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        if limit is None:
+            return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+
+def rank_tasks(query: str, tasks: List[Dict[str, Any]], limit: Optional[int] = 10) -> List[Tuple[Dict[str, Any], float]]:
+    """One-off ranking of a task list, for callers without a maintained index"""
+    index = SearchIndex()
+    by_id = {}
+    for task in tasks:
+        index.add(task['id'], task['text'])
+        by_id[task['id']] = task
+    return [(by_id[task_id], score) for task_id, score in index.search(query, limit)]
+
+
+def is_unambiguous(results: List[Tuple[Any, float]]) -> bool:
+    """True when the top result clearly beats the runner-up"""
+    if not results:
+        return False
+    if len(results) == 1:
+        return True
+    return results[0][1] >= results[1][1] * AMBIGUITY_RATIO
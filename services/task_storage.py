@@ -0,0 +1,436 @@
+"""
+Storage backends for TaskManager.
+
+A backend loads the full task list on startup and persists batches of changes.
+A change is a tuple ``(op, task_id, task)`` where ``op`` is one of:
+
+- ``'put'``: insert or replace ``task`` (a full task dict)
+- ``'delete'``: remove the task with ``task_id``
+- ``'clear'``: remove every task
+- ``'move'``: move the task with ``task_id`` to position ``task['index']`` of
+  the insertion order (undo puts a deleted task back where it was)
+
+Full snapshots carry the schema version they were written with (see
+services/task_migrations.py); after ``load()`` it is in ``schema_version``.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+from services.task_migrations import SCHEMA_VERSION
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, FileLock becomes a no-op
+    fcntl = None
+
+Change = Tuple[str, Optional[str], Optional[Dict[str, Any]]]
+
+
+class FileLock:
+    """
+    Exclusive advisory lock on a sidecar file, shared by every process using the
+    same task store. Re-entrant within the owning thread; other threads of the
+    same process wait on an in-process lock first, since flock is held per file
+    descriptor and would not keep them out.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._thread_lock = threading.RLock()
+        # Only touched by the thread holding _thread_lock
+        self._file = None
+        self._depth = 0
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            if self._depth == 0:
+                self._file = open(self.path, 'a')
+                if fcntl is not None:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        except BaseException:
+            if self._file is not None and self._depth == 0:
+                self._file.close()
+                self._file = None
+            self._thread_lock.release()
+            raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            self._depth -= 1
+            if self._depth == 0:
+                if fcntl is not None:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+                self._file.close()
+                self._file = None
+        finally:
+            self._thread_lock.release()
+
+
+def _stat_signature(path: Path) -> Optional[Tuple[int, int, int]]:
+    """Inode, mtime and size of a file, or None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def _write_json_atomic(path: Path, tasks: Iterable[Dict[str, Any]], schema_version: int):
+    """Write a versioned JSON snapshot via a temp file so readers never see a partial file"""
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump({'schema_version': schema_version, 'tasks': [dict(task) for task in tasks]}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class JsonStorage:
+    """Whole-file JSON storage (the original tasks.json format)"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.schema_version = SCHEMA_VERSION
+
+    def load(self) -> List[Dict[str, Any]]:
+        """Load tasks from JSON file"""
+        self.schema_version = SCHEMA_VERSION
+        if self.path.exists():
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+            except:
+                return []
+            if isinstance(data, list):
+                # A bare list predates the versioned header
+                self.schema_version = 0
+                return data
+            self.schema_version = data.get('schema_version', 0)
+            return data.get('tasks', [])
+        return []
+
+    def save(self, tasks: Iterable[Dict[str, Any]], schema_version: int = SCHEMA_VERSION):
+        """Rewrite the whole file"""
+        _write_json_atomic(self.path, tasks, schema_version)
+        self.schema_version = schema_version
+
+    def apply(self, changes: List[Change], tasks: Iterable[Dict[str, Any]]):
+        """Persist a batch of changes; plain JSON can only rewrite everything"""
+        self.save(tasks)
+
+    def compact(self, tasks: Iterable[Dict[str, Any]]):
+        """Nothing to compact for a single file"""
+        self.save(tasks)
+
+    def query_ids(self, **filters) -> Optional[List[str]]:
+        """
+        Return ids of tasks matching all field filters, or None when the
+        backend has no index and the caller should scan in memory
+        """
+        return None
+
+    def signature(self):
+        """Cheap fingerprint of the files on disk, used to notice writes by other processes"""
+        return _stat_signature(self.path)
+
+    def close(self, tasks: Iterable[Dict[str, Any]]):
+        """Release resources on shutdown"""
+        pass
+
+
+class JournalStorage(JsonStorage):
+    """
+    Snapshot plus append-only journal.
+
+    Mutations are appended to ``<storage_path>.journal`` as one JSON record per
+    line. Once the journal holds ``compact_threshold`` records it is folded into
+    a fresh snapshot and truncated. Startup replays snapshot plus journal.
+    """
+
+    def __init__(self, path: Path, compact_threshold: int = 500):
+        super().__init__(path)
+        self.journal_path = self.path.with_name(self.path.name + '.journal')
+        self.compact_threshold = compact_threshold
+        self.journal_records = 0
+
+    def load(self) -> List[Dict[str, Any]]:
+        """Load the snapshot and replay the journal on top of it"""
+        tasks = {task['id']: task for task in super().load()}
+        self.journal_records = 0
+
+        if self.journal_path.exists():
+            with open(self.journal_path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn final line from an interrupted append
+                        continue
+                    _replay(tasks, record)
+                    self.journal_records += 1
+
+        return list(tasks.values())
+
+    def save(self, tasks: Iterable[Dict[str, Any]], schema_version: int = SCHEMA_VERSION):
+        """Write a new snapshot atomically, then truncate the journal"""
+        super().save(tasks, schema_version)
+
+        # Replaying the old journal over the new snapshot is idempotent,
+        # so a crash between these two steps loses nothing
+        open(self.journal_path, 'w').close()
+        self.journal_records = 0
+
+    def apply(self, changes: List[Change], tasks: Iterable[Dict[str, Any]]):
+        """Append the changes to the journal, compacting past the threshold"""
+        lines = []
+        for op, task_id, task in changes:
+            record = {'op': op}
+            if task_id is not None:
+                record['id'] = task_id
+            if task is not None:
+                record['task'] = dict(task)
+            lines.append(json.dumps(record, separators=(',', ':')) + '\n')
+
+        with open(self.journal_path, 'a') as f:
+            f.write(''.join(lines))
+        self.journal_records += len(lines)
+
+        if self.journal_records >= self.compact_threshold:
+            self.compact(tasks)
+
+    def compact(self, tasks: Iterable[Dict[str, Any]]):
+        """Fold the journal into a fresh snapshot"""
+        self.save(tasks)
+
+    def signature(self):
+        """Fingerprint of both the snapshot and the journal"""
+        return (_stat_signature(self.path), _stat_signature(self.journal_path))
+
+    def close(self, tasks: Iterable[Dict[str, Any]]):
+        """Fold any outstanding journal records into the snapshot"""
+        if self.journal_records:
+            self.compact(tasks)
+
+
+def apply_changes(tasks: Dict[str, Dict[str, Any]], changes: Iterable[Change]):
+    """Apply change tuples to an id -> task mapping"""
+    for op, task_id, task in changes:
+        if op == 'put':
+            tasks[task['id']] = task
+        elif op == 'delete':
+            tasks.pop(task_id, None)
+        elif op == 'clear':
+            tasks.clear()
+        elif op == 'move':
+            move_task(tasks, task_id, task['index'])
+
+
+def move_task(tasks: Dict[str, Any], task_id: str, index: int):
+    """Move a task to index in the mapping's insertion order, in place (a missing task is ignored)"""
+    if task_id not in tasks:
+        return
+    task = tasks.pop(task_id)
+    items = list(tasks.items())
+    items.insert(min(index, len(items)), (task_id, task))
+    tasks.clear()
+    tasks.update(items)
+
+
+def _replay(tasks: Dict[str, Dict[str, Any]], record: Dict[str, Any]):
+    """Apply one journal record to an id -> task mapping"""
+    op = record.get('op')
+    if op == 'put':
+        task = record['task']
+        tasks[task['id']] = task
+    elif op == 'delete':
+        tasks.pop(record.get('id'), None)
+    elif op == 'clear':
+        tasks.clear()
+    elif op == 'move':
+        move_task(tasks, record.get('id'), record['task']['index'])
+
+
+class SqliteStorage(JsonStorage):
+    """
+    SQLite storage with indexes on priority, category, completed and modified_at.
+
+    Passing a ``.json`` path stores tasks in the sibling ``.db`` file. When that
+    database is first created, an existing JSON task file is imported once.
+    """
+
+    COLUMNS = ('id', 'text', 'priority', 'category', 'completed',
+               'created_at', 'modified_at', 'completed_at')
+    FILTERABLE = ('priority', 'category', 'completed')
+
+    def __init__(self, path: Path):
+        path = Path(path)
+        if path.suffix == '.json':
+            self.json_path = path
+            path = path.with_suffix('.db')
+        else:
+            self.json_path = path.with_suffix('.json')
+        super().__init__(path)
+
+        is_new = not self.path.exists()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT NOT NULL UNIQUE,
+                text TEXT NOT NULL,
+                priority TEXT,
+                category TEXT,
+                completed INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT,
+                modified_at TEXT,
+                completed_at TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks(priority);
+            CREATE INDEX IF NOT EXISTS idx_tasks_category ON tasks(category);
+            CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks(completed);
+            CREATE INDEX IF NOT EXISTS idx_tasks_modified_at ON tasks(modified_at);
+        """)
+
+        if is_new:
+            self._set_schema_version(SCHEMA_VERSION)
+        if is_new and self.json_path.exists():
+            legacy = JsonStorage(self.json_path)
+            legacy_tasks = legacy.load()
+            if legacy_tasks:
+                print(f"SqliteStorage: Migrating {len(legacy_tasks)} tasks from {self.json_path}")
+                # Keep the file's schema version so pending migrations still run on load
+                self.save(legacy_tasks, legacy.schema_version)
+
+    def _set_schema_version(self, schema_version: int):
+        # PRAGMA does not take bound parameters
+        self._conn.execute(f"PRAGMA user_version = {int(schema_version)}")
+        self.schema_version = schema_version
+
+    def _row_to_task(self, row) -> Dict[str, Any]:
+        task = dict(zip(self.COLUMNS, row))
+        task['completed'] = bool(task['completed'])
+        return task
+
+    def _upsert(self, task: Dict[str, Any]):
+        values = [task.get(column) for column in self.COLUMNS]
+        values[4] = int(bool(values[4]))
+        self._conn.execute(
+            f"INSERT INTO tasks ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))}) "
+            f"ON CONFLICT(id) DO UPDATE SET "
+            + ', '.join(f"{column} = excluded.{column}" for column in self.COLUMNS[1:]),
+            values
+        )
+
+    def load(self) -> List[Dict[str, Any]]:
+        """Load every task in insertion order"""
+        with self._lock:
+            self.schema_version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM tasks ORDER BY seq"
+            ).fetchall()
+        return [self._row_to_task(row) for row in rows]
+
+    def save(self, tasks: Iterable[Dict[str, Any]], schema_version: int = SCHEMA_VERSION):
+        """Replace the table contents in one transaction"""
+        tasks = list(tasks)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tasks")
+            for task in tasks:
+                self._upsert(task)
+            self._set_schema_version(schema_version)
+
+    def apply(self, changes: List[Change], tasks: Iterable[Dict[str, Any]]):
+        """Write only the changed rows, in one transaction"""
+        with self._lock, self._conn:
+            for op, task_id, task in changes:
+                if op == 'put':
+                    self._upsert(task)
+                elif op == 'delete':
+                    self._conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+                elif op == 'clear':
+                    self._conn.execute("DELETE FROM tasks")
+                elif op == 'move':
+                    self._move(task_id, task['index'])
+
+    def _move(self, task_id: str, index: int):
+        """Give a row the seq of the row now at index, shifting that row and the ones after it"""
+        row = self._conn.execute(
+            "SELECT seq FROM tasks WHERE id != ? ORDER BY seq LIMIT 1 OFFSET ?", (task_id, index)
+        ).fetchone()
+        if row is None:
+            # Past the end: becomes the last row
+            self._conn.execute(
+                "UPDATE tasks SET seq = (SELECT MAX(seq) + 1 FROM tasks) WHERE id = ?", (task_id,)
+            )
+            return
+        # Shift through negative values so no two rows ever share a seq mid-update
+        self._conn.execute("UPDATE tasks SET seq = -(seq + 1) WHERE seq >= ? AND id != ?", (row[0], task_id))
+        self._conn.execute("UPDATE tasks SET seq = ? WHERE id = ?", (row[0], task_id))
+        self._conn.execute("UPDATE tasks SET seq = -seq WHERE seq < 0")
+
+    def compact(self, tasks: Iterable[Dict[str, Any]]):
+        """Reclaim space left by deleted rows"""
+        with self._lock:
+            self._conn.execute("VACUUM")
+
+    def query_ids(self, **filters) -> Optional[List[str]]:
+        """Answer field filters from the indexes"""
+        clauses = []
+        params = []
+        for field, value in filters.items():
+            if field not in self.FILTERABLE:
+                raise ValueError(f"Cannot filter tasks by '{field}'")
+            if value is None:
+                clauses.append(f"{field} IS NULL")
+            else:
+                clauses.append(f"{field} = ?")
+                params.append(int(value) if field == 'completed' else value)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id FROM tasks {where} ORDER BY seq", params
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self, tasks: Iterable[Dict[str, Any]]):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+
+def migrate_json_to_sqlite(json_path: str, db_path: Optional[str] = None) -> int:
+    """
+    One-shot import of a tasks.json file into a SQLite database.
+
+    Returns:
+        Number of tasks imported
+    """
+    json_path = Path(json_path)
+    source = JsonStorage(json_path)
+    tasks = source.load()
+    storage = SqliteStorage(Path(db_path) if db_path else json_path.with_suffix('.db'))
+    storage.save(tasks, source.schema_version)
+    storage.close(tasks)
+    return len(tasks)
+
+
+STORAGE_BACKENDS = {
+    'json': JsonStorage,
+    'journal': JournalStorage,
+    'sqlite': SqliteStorage,
+}
+
+
+def create_storage(backend: str, path: Path, **options):
+    """Build the storage backend registered under ``backend``"""
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend '{backend}'. Choose from: {', '.join(STORAGE_BACKENDS)}")
+    return STORAGE_BACKENDS[backend](path, **options)
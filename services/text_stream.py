@@ -0,0 +1,54 @@
+"""
+Sentence boundaries in streamed text, for speaking a response while it is generated.
+
+SentenceSplitter collects token chunks and hands back each sentence once its
+end has arrived. speakable() strips the markdown the help answers are written
+in, so the speech synthesizer doesn't read out asterisks and hashes.
+"""
+
+import re
+from typing import List
+
+# End of a sentence (punctuation, optional closing quote or bracket, then whitespace) or of a line;
+# a period after a digit is taken for a list number ("1. Open the panel")
+_BOUNDARY = re.compile(r"(?<=[.!?])(?<!\d\.)[\"')\]]*\s+|\n+")
+
+_MARKDOWN_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_MARKDOWN_MARKS = re.compile(r"[*_`#>|~]+")
+_LIST_MARKER = re.compile(r"^\s*(?:[-+]|\d+\.)\s+", re.M)
+
+
+class SentenceSplitter:
+    """Splits a stream of text chunks into complete sentences"""
+
+    def __init__(self):
+        self._buffer = ''
+
+    def feed(self, text: str) -> List[str]:
+        """Add a chunk, returning the sentences it completed"""
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in _BOUNDARY.finditer(self._buffer):
+            # A boundary at the very end may still grow ("..." or a closing quote), so wait for more text
+            if match.end() == len(self._buffer):
+                break
+            sentence = self._buffer[start:match.end()].strip()
+            if sentence:
+                sentences.append(sentence)
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> str:
+        """The unfinished rest of the text, once the stream has ended"""
+        rest, self._buffer = self._buffer.strip(), ''
+        return rest
+
+
+def speakable(text: str) -> str:
+    """Text with markdown formatting removed and whitespace collapsed"""
+    text = _MARKDOWN_LINK.sub(r"\1", text)
+    text = _LIST_MARKER.sub('', text)
+    text = _MARKDOWN_MARKS.sub('', text)
+    return ' '.join(text.split())
@@ -1,5 +1,8 @@
 import streamlit as st
-from typing import Optional
+import json
+from typing import Iterable, Iterator, Optional
+
+from services.text_stream import SentenceSplitter, speakable
 
 class TTSService:
     def __init__(self, method: str = 'browser'):
@@ -26,14 +29,15 @@ class TTSService:
         """
         Use browser-native speech synthesis
         """
-        # Escape quotes in text to prevent JavaScript errors
-        safe_text = text.replace('"', '\\"').replace("'", "\\'")
+        # A JSON string is a valid JavaScript string literal (newlines and quotes escaped);
+        # "</" is escaped too so the text can't close the script tag
+        safe_text = json.dumps(text).replace('</', '<\\/')
         
         # Create JavaScript to trigger speech synthesis
         js_code = f"""
         <script>
         if ('speechSynthesis' in window) {{
-            const utterance = new SpeechSynthesisUtterance("{safe_text}");
+            const utterance = new SpeechSynthesisUtterance({safe_text});
             utterance.rate = {rate};
             utterance.pitch = {pitch};
             utterance.volume = 0.8;
@@ -76,6 +80,26 @@ class TTSService:
             # Fallback to just displaying the message
             st.info(f"Voice feedback: {message}")
     
+    def speak_stream(self, chunks: Iterable[str]) -> Iterator[str]:
+        """
+        Pass streamed response text through, speaking the first sentence as soon
+        as it is complete and the rest once the stream ends (the browser queues
+        utterances, so the rest follows the first)
+        """
+        splitter = SentenceSplitter()
+        first_spoken = False
+        rest = []
+        for chunk in chunks:
+            yield chunk
+            for sentence in splitter.feed(chunk):
+                if first_spoken:
+                    rest.append(sentence)
+                elif speakable(sentence):
+                    self.speak(speakable(sentence))
+                    first_spoken = True
+        rest.append(splitter.flush())
+        self.speak(speakable(' '.join(rest)))
+    
     def speak_query_response(self, response: str):
         """
         Speak a response to a query
@@ -1,34 +1,39 @@
-from openai import OpenAI
-import tempfile
-import os
+import io
+import wave
+from typing import Optional
+
+from services.openai_transport import OpenAITransport, get_transport
 
 class WhisperService:
-    def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
+    def __init__(self, api_key: str, transport: Optional[OpenAITransport] = None):
+        self.transport = transport if transport is not None else get_transport(api_key)
+        self.model = "whisper-1"
     
     def transcribe(self, audio_bytes: bytes) -> str:
         """
         Transcribe audio bytes using OpenAI Whisper API
         """
         try:
-            # Save audio bytes to temporary file
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp_file:
-                tmp_file.write(audio_bytes)
-                tmp_file_path = tmp_file.name
-            
-            # Transcribe using Whisper
-            with open(tmp_file_path, "rb") as audio_file:
-                transcript = self.client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
+            with self.transport.metrics.measure('whisper.transcribe', self.model) as record:
+                # Transcription is billed per minute of audio
+                record.audio_seconds = _audio_seconds(audio_bytes)
+                # Uploaded straight from memory; a retry re-sends the same bytes
+                transcript = self.transport.call('transcription', lambda client: client.audio.transcriptions.create(
+                    model=self.model,
+                    file=("audio.wav", audio_bytes),
                     response_format="text"
-                )
-            
-            # Clean up temp file
-            os.unlink(tmp_file_path)
+                ), record)
             
             return transcript
             
         except Exception as e:
             print(f"Transcription error: {e}")
-            return None
\ No newline at end of file
+            return None
+
+def _audio_seconds(audio_bytes: bytes) -> float:
+    """Duration of a WAV recording, or 0 if the header can't be read"""
+    try:
+        with wave.open(io.BytesIO(audio_bytes)) as recording:
+            return recording.getnframes() / float(recording.getframerate())
+    except (wave.Error, EOFError, ZeroDivisionError):
+        return 0.0
@@ -0,0 +1,25 @@
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from services.task_manager import TaskManager
+
+
+@pytest.fixture
+def temp_dir():
+    """Temporary directory for store, cache and lock files, removed after the test"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        yield Path(temp_dir)
+
+
+@pytest.fixture
+def storage_path(temp_dir):
+    """Path of a tasks.json that does not exist yet"""
+    return str(temp_dir / "tasks.json")
+
+
+@pytest.fixture
+def task_manager(storage_path):
+    """TaskManager on an empty JSON store"""
+    return TaskManager(storage_path=storage_path)
@@ -0,0 +1,81 @@
+import pytest
+import asyncio
+import contextvars
+import time
+from services.task_manager import TaskManager
+from services.async_task_manager import AsyncTaskManager
+
+
+@pytest.mark.unit
+class TestAsyncTaskManager:
+    """Unit tests for the async TaskManager facade"""
+    
+    def test_methods_match_sync_api(self, task_manager):
+        """Test that awaited calls behave like the TaskManager methods"""
+        async def scenario():
+            tasks = AsyncTaskManager(task_manager)
+            task_id = await tasks.add_task("Async task", priority='high')
+            await tasks.toggle_task(task_id)
+            task = await tasks.get_task(task_id)
+            stats = await tasks.get_stats()
+            await tasks.close()
+            return task, stats
+        
+        task, stats = asyncio.run(scenario())
+        assert task['text'] == "Async task"
+        assert task['completed'] is True
+        assert stats['high_priority'] == 1
+    
+    def test_concurrent_writes(self, task_manager):
+        """Test that gathered writes all land"""
+        async def scenario():
+            tasks = AsyncTaskManager(task_manager)
+            await asyncio.gather(*(tasks.add_task(f"Task {i}") for i in range(20)))
+            return await tasks.get_tasks()
+        
+        assert len(asyncio.run(scenario())) == 20
+    
+    def test_slow_write_does_not_block_loop(self, task_manager, monkeypatch):
+        """Test that the event loop keeps running while a write is on disk"""
+        original = task_manager._storage.apply
+        def slow_apply(changes, tasks):
+            time.sleep(0.2)
+            original(changes, tasks)
+        monkeypatch.setattr(task_manager._storage, 'apply', slow_apply)
+        
+        async def scenario():
+            tasks = AsyncTaskManager(task_manager)
+            ticks = 0
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+            ticking = asyncio.create_task(ticker())
+            await tasks.add_task("Slow write")
+            ticking.cancel()
+            return ticks
+        
+        assert asyncio.run(scenario()) >= 5
+    
+    def test_undo_actor_reaches_the_pool(self, task_manager):
+        """Test that pooled calls, like agent tools, land in the calling session's undo history"""
+        tasks = AsyncTaskManager(task_manager)
+        
+        def session(actor, action):
+            """One app session: its own context with its actor, running an agent request"""
+            def run():
+                task_manager.set_actor(actor)
+                return asyncio.run(action())
+            return contextvars.Context().run(run)
+        
+        # The same path as an agent tool: the sync tool body handed to run()
+        alice_task = session('alice', lambda: tasks.run(task_manager.add_task, text="Alice's task"))
+        bob_task = session('bob', lambda: tasks.run(task_manager.add_task, text="Bob's task"))
+        
+        assert session('alice', lambda: tasks.run(lambda: task_manager.can_undo))
+        assert session('bob', tasks.undo)
+        assert task_manager.get_task(bob_task) is None
+        assert task_manager.get_task(alice_task) is not None
+        assert not session('bob', tasks.undo)
+        assert not task_manager.can_undo
@@ -0,0 +1,122 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from services.task_manager import TaskManager
+from services.command_parser import FastCommandRouter, parse_command
+from services.task_query import PAGE_SIZE
+
+
+@pytest.mark.unit
+class TestParseCommand:
+    """Unit tests for the local command grammar"""
+
+    def test_add(self):
+        """Test that add commands yield the task text without the command words"""
+        command = parse_command("Please add a new high priority client task to review the contract.")
+        assert command['intent'] == 'add'
+        assert command['text'] == "Review the contract"
+        assert command['priority'] == 'high'
+        assert command['category'] == 'client'
+        assert command['confidence'] >= 0.9
+
+        assert parse_command("add task call mom with low priority")['priority'] == 'low'
+        assert parse_command("Remind me to buy milk")['text'] == "Buy milk"
+
+    def test_queries(self):
+        """Test list and count commands"""
+        assert parse_command("Show me all high priority tasks") == {'intent': 'list_priority', 'confidence': 0.95, 'priority': 'high'}
+        assert parse_command("what business tasks") is None
+        assert parse_command("list my business tasks")['category'] == 'business'
+        assert parse_command("What do I still need to do?")['intent'] == 'list_pending'
+        assert parse_command("What should I work on next?")['intent'] == 'next'
+
+        count = parse_command("How many tasks do I have?")
+        assert count['intent'] == 'count'
+        assert (count['priority'], count['category'], count['status']) == (None, None, None)
+        assert parse_command("how many completed tasks are there")['status'] == 'completed'
+
+    def test_uncertain_commands_score_low(self):
+        """Test that compound and bulk requests are left to the model"""
+        assert parse_command("add a task to buy milk and call mom")['confidence'] < 0.85
+        assert parse_command("delete all tasks")['confidence'] < 0.85
+        assert parse_command("remove milk from the grocery task")['confidence'] < 0.85
+        assert parse_command("mark the milk on my grocery list as done")['confidence'] < 0.85
+        assert parse_command("move the dentist appointment to friday") is None
+        assert parse_command("") is None
+
+
+@pytest.mark.unit
+class TestFastCommandRouter:
+    """Unit tests for carrying out commands locally"""
+
+    def test_add_and_count(self, task_manager):
+        """Test that confident commands act on the TaskManager directly"""
+        router = FastCommandRouter(task_manager)
+
+        assert "Buy milk" in router.handle("add a task to buy milk")
+        assert task_manager.get_tasks()[0]['text'] == "Buy milk"
+        assert router.handle("how many tasks do I have") == "You have 1 task."
+        assert router.handle("how many high priority tasks do I have") == "You have 0 high priority tasks."
+
+    def test_task_references(self, task_manager):
+        """Test that complete and delete only act on a clear match"""
+        router = FastCommandRouter(task_manager)
+        dentist = task_manager.add_task("Call dentist")
+        task_manager.add_task("Email client about invoice")
+        task_manager.add_task("Email accountant about invoice")
+
+        assert "completed" in router.handle("mark the dentist task as done")
+        assert task_manager.get_task(dentist)['completed'] is True
+
+        # Ambiguous, or naming a task that doesn't exist: left to the model
+        assert router.handle("delete the invoice email") is None
+        assert router.handle("delete call plumber") is None
+        assert len(task_manager.get_tasks()) == 3
+
+        # Editing part of a task is not deleting it
+        grocery = task_manager.add_task("Grocery shopping: milk, eggs")
+        assert router.handle("remove milk from the grocery task") is None
+        assert task_manager.get_task(grocery) is not None
+        task_manager.delete_task(grocery)
+
+        assert "deleted" in router.handle("delete email accountant")
+        assert len(task_manager.get_tasks()) == 2
+
+    def test_lists_are_paged(self, task_manager):
+        """Test that a long list shows one page and says how many tasks are left out"""
+        router = FastCommandRouter(task_manager)
+        task_manager.add_tasks([{'text': f"Task {i}", 'priority': 'high' if i % 2 else 'low'} for i in range(25)])
+
+        lines = router.handle("show me my tasks").splitlines()
+        assert lines[0] == "Your Tasks:" and len(lines) == PAGE_SIZE + 2
+        assert "Task 19" in lines[-2] and lines[-1].startswith("...and 5 more.")
+        assert "more" not in router.handle("show me all high priority tasks")
+        assert router.handle("what have I completed") == "No completed tasks yet."
+
+    def test_hit_rate(self, task_manager):
+        """Test that hits and fall-throughs are counted"""
+        router = FastCommandRouter(task_manager)
+        router.handle("show me my tasks")
+        router.handle("undo")
+        router.handle("move the dentist appointment to friday")
+        router.handle("delete all tasks")
+
+        stats = router.stats()
+        assert stats['hits'] == 2
+        assert stats['misses'] == 2
+        assert stats['hit_rate'] == 0.5
+
+    def test_concurrent_counts(self, task_manager):
+        """Test that commands handled from several threads are all counted"""
+        router = FastCommandRouter(task_manager)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(router.handle, ["how many tasks do I have", "delete all tasks"] * 200))
+
+        stats = router.stats()
+        assert (stats['hits'], stats['misses']) == (200, 200)
+
+    def test_threshold(self, task_manager):
+        """Test that a threshold above every confidence disables the fast path"""
+        router = FastCommandRouter(task_manager, threshold=1.0)
+        assert router.handle("add a task to buy milk") is None
+        assert task_manager.get_tasks() == []
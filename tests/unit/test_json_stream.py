@@ -0,0 +1,71 @@
+import pytest
+from services.json_stream import JSONItemStream
+
+
+def feed_all(parser, text, chunk_size=3):
+    items = []
+    for i in range(0, len(text), chunk_size):
+        items.extend(parser.feed(text[i:i + chunk_size]))
+    return items
+
+
+@pytest.mark.unit
+class TestJSONItemStream:
+    """Unit tests for incremental JSON array parsing"""
+
+    def test_items_arrive_as_they_complete(self):
+        """Test that each object is returned once its closing brace is in"""
+        parser = JSONItemStream()
+        assert parser.feed('[{"text": "Buy milk", "priority": "lo') == []
+        assert parser.feed('w"}, {"text": "Call {mom}"') == [{'text': "Buy milk", 'priority': 'low'}]
+        assert parser.feed(', "tags": ["a", "b]"]}]') == [{'text': "Call {mom}", 'tags': ['a', 'b]']}]
+        assert parser.complete and not parser.truncated
+        assert parser.salvage() is None
+
+    def test_surrounding_text_and_strings(self):
+        """Test that fences and prose are skipped and string items are accepted"""
+        text = 'Here are your "tasks":\n```json\n["Email Bob", {"text": "Say \\"hi\\""}]\n```'
+        parser = JSONItemStream()
+        assert feed_all(parser, text) == ["Email Bob", {'text': 'Say "hi"'}]
+        assert parser.complete
+
+    def test_bare_objects(self):
+        """Test objects streamed without an enclosing array"""
+        parser = JSONItemStream()
+        items = feed_all(parser, '{"text": "One"}\n{"text": "Two"}\n')
+        assert items == [{'text': "One"}, {'text': "Two"}]
+
+    def test_malformed_item_is_skipped(self):
+        """Test that one bad object doesn't lose the others"""
+        parser = JSONItemStream()
+        items = feed_all(parser, '[{"text": "Good"}, {"text": oops}, {"text": "Also good"}]')
+        assert items == [{'text': "Good"}, {'text': "Also good"}]
+
+    def test_salvage_cut_off_output(self):
+        """Test that the fully written fields of the last, unfinished object are recovered"""
+        parser = JSONItemStream()
+        assert feed_all(parser, '[{"text": "Done"}, {"text": "Review contract", "priority": "hi') == [{'text': "Done"}]
+        assert parser.truncated
+        assert parser.salvage() == {'text': "Review contract"}
+
+        parser = JSONItemStream()
+        parser.feed('[{"text": "Review contract", "priority": ')
+        assert parser.salvage() == {'text': "Review contract"}
+
+        parser = JSONItemStream()
+        parser.feed('[{"te')
+        assert parser.salvage() is None
+
+    def test_salvage_drops_cut_strings(self):
+        """Test that a value whose string was cut short is never kept half-written"""
+        parser = JSONItemStream()
+        parser.feed('[{"text": "Call cli')
+        assert parser.salvage() is None
+
+        parser = JSONItemStream()
+        parser.feed('[{"text": "Call mom, then dad about the trip", "tags": ["family", "tra')
+        assert parser.salvage() == {'text': "Call mom, then dad about the trip", 'tags': ["family"]}
+
+        parser = JSONItemStream()
+        parser.feed('[{"text": "Email Bob, Alice and ')
+        assert parser.salvage() is None
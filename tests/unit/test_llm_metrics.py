@@ -0,0 +1,107 @@
+import json
+import pytest
+from services.llm_metrics import LLMMetrics, estimate_cost, percentile
+
+
+class Usage:
+    def __init__(self, prompt_tokens, completion_tokens):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+
+@pytest.mark.unit
+class TestLLMMetrics:
+    """Unit tests for per-call model metrics"""
+
+    def test_measure_records_call(self):
+        """Test that a measured call keeps its tokens, retries and cost"""
+        metrics = LLMMetrics()
+        with metrics.measure('llm.intent', 'gpt-5-nano', cache='miss') as record:
+            record.retries += 1
+            record.add_usage(Usage(1000, 200))
+            record.first_token()
+            record.first_token()
+
+        [call] = metrics.calls()
+        assert call['operation'] == 'llm.intent'
+        assert call['prompt_tokens'] == 1000 and call['completion_tokens'] == 200
+        assert call['retries'] == 1
+        assert call['cache'] == 'miss'
+        assert call['cost'] == pytest.approx(estimate_cost('gpt-5-nano', 1000, 200))
+        assert 0 <= call['first_token_seconds'] <= call['seconds']
+
+    def test_usage_metadata_dict(self):
+        """Test that LangChain usage_metadata dicts are summed"""
+        metrics = LLMMetrics()
+        with metrics.measure('agent.request', 'gpt-5-nano') as record:
+            record.add_usage({'input_tokens': 50, 'output_tokens': 5})
+            record.add_usage({'input_tokens': 70, 'output_tokens': 10})
+            record.add_usage(None)
+        assert metrics.summary()['agent.request']['prompt_tokens'] == 120
+        assert metrics.summary()['agent.request']['completion_tokens'] == 15
+
+    def test_errors_are_recorded_and_raised(self):
+        """Test that a failing call is recorded with its error type"""
+        metrics = LLMMetrics()
+        with pytest.raises(TimeoutError):
+            with metrics.measure('whisper.transcribe', 'whisper-1'):
+                raise TimeoutError()
+        assert metrics.calls()[0]['error'] == 'TimeoutError'
+        assert metrics.summary()['whisper.transcribe']['errors'] == 1
+
+    def test_early_closed_stream_is_recorded(self):
+        """Test that a streaming generator closed before the end still records its call"""
+        metrics = LLMMetrics()
+
+        def stream():
+            with metrics.measure('help.answer', 'gpt-5-nano') as record:
+                for chunk in ("a", "b", "c"):
+                    record.first_token()
+                    yield chunk
+
+        chunks = stream()
+        next(chunks)
+        chunks.close()
+        [call] = metrics.calls()
+        assert call['error'] is None and call['first_token_seconds'] is not None
+
+    def test_summary_and_json(self):
+        """Test per-operation aggregation, cache hits and the JSON dump"""
+        metrics = LLMMetrics(max_calls=10)
+        for _ in range(3):
+            with metrics.measure('llm.braindump', 'gpt-5-nano', cache='miss') as record:
+                record.add_usage(Usage(100, 10))
+        metrics.record_cache_hit('llm.braindump', 'gpt-5-nano')
+
+        stats = metrics.summary()['llm.braindump']
+        assert stats['calls'] == 4
+        assert stats['cache_hits'] == 1
+        assert stats['prompt_tokens'] == 300
+        assert stats['cost'] == pytest.approx(3 * estimate_cost('gpt-5-nano', 100, 10))
+        assert stats['p50_seconds'] <= stats['p90_seconds'] <= stats['p99_seconds']
+        assert stats['p50_first_token_seconds'] is None
+
+        dump = json.loads(metrics.to_json())
+        assert len(dump['calls']) == 4
+        assert dump['summary']['llm.braindump']['calls'] == 4
+
+        metrics.reset()
+        assert metrics.summary() == {}
+
+    def test_oldest_calls_are_dropped(self):
+        """Test that only the most recent max_calls are kept"""
+        metrics = LLMMetrics(max_calls=2)
+        for operation in ('llm.intent', 'llm.match_task', 'llm.next_task'):
+            with metrics.measure(operation):
+                pass
+        assert [call['operation'] for call in metrics.calls()] == ['llm.match_task', 'llm.next_task']
+
+    def test_cost_and_percentile(self):
+        """Test the cost estimate and nearest-rank percentiles"""
+        assert estimate_cost('whisper-1', audio_seconds=90) == pytest.approx(0.009)
+        assert estimate_cost('unknown-model', 10, 10) is None
+        assert percentile([], 50) is None
+        values = [float(i) for i in range(1, 101)]
+        assert percentile(values, 50) == 50.0
+        assert percentile(values, 99) == 99.0
+        assert percentile([3.0], 90) == 3.0
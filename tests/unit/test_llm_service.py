@@ -0,0 +1,190 @@
+import re
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+# LLMService is built on the OpenAI transport, which needs the client libraries
+pytest.importorskip("httpx")
+pytest.importorskip("openai")
+
+from services.llm_metrics import LLMMetrics
+from services.llm_service import LLMService, PRIORITIZE_ATTEMPTS, PRIORITIZE_REASONING_TOKENS
+
+_TASK_LINE = re.compile(r"^\s*(t\d+)\|([^|]*)\|", re.M)
+
+
+def response(content, finish_reason='stop'):
+    choice = SimpleNamespace(message=SimpleNamespace(content=content), finish_reason=finish_reason)
+    return SimpleNamespace(choices=[choice], usage=None)
+
+
+def stream(*texts):
+    """Streamed response chunks carrying texts"""
+    return [SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+            for text in texts]
+
+
+def suggestions(prompt, priority=lambda text: 'low'):
+    """JSON answer giving every task listed in the prompt the priority picked for its text"""
+    return '[' + ', '.join(
+        f'{{"handle": "{handle}", "priority": "{priority(text)}"}}'
+        for handle, text in _TASK_LINE.findall(prompt)
+    ) + ']'
+
+
+class StubTransport:
+    """Stands in for OpenAITransport: chat calls go to answer(prompt, max_completion_tokens)"""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.metrics = LLMMetrics()
+        self.requests = []
+        self._lock = threading.Lock()
+        self.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=self._create)))
+
+    def _create(self, model, messages, max_completion_tokens, **options):
+        prompt = messages[-1]['content']
+        with self._lock:
+            self.requests.append({'tasks': [text for _, text in _TASK_LINE.findall(prompt)],
+                                  'max_completion_tokens': max_completion_tokens})
+        return self.answer(prompt, max_completion_tokens)
+
+    def call(self, kind, request, record=None):
+        return request(self.client)
+
+
+def make_tasks(count, completed=()):
+    return [
+        {'id': f"id{i}", 'text': f"Task {i}", 'priority': 'medium', 'category': None,
+         'completed': i in completed}
+        for i in range(count)
+    ]
+
+
+@pytest.mark.unit
+class TestPrioritizeTasks:
+    """Unit tests for chunked model prioritization, with a stubbed transport"""
+
+    def test_review_all_splits_into_chunks(self):
+        """Test that every pending task is reviewed once, in chunks, and the answers merged by task"""
+        transport = StubTransport(lambda prompt, _: response(
+            suggestions(prompt, lambda text: 'high' if int(text.split()[-1]) % 2 else 'low')))
+        llm = LLMService("test-key", transport=transport)
+        tasks = make_tasks(61, completed={60})
+
+        updated = llm.prioritize_tasks(tasks, review_all=True, chunk_size=25, max_concurrency=3)
+
+        assert sorted(len(request['tasks']) for request in transport.requests) == [10, 25, 25]
+        reviewed = [text for request in transport.requests for text in request['tasks']]
+        assert sorted(reviewed) == sorted(f"Task {i}" for i in range(60))
+        assert [task['priority'] for task in updated[:60]] == ['low', 'high'] * 30
+        assert updated[60] is tasks[60]
+
+    def test_failed_chunk_keeps_local_priorities(self):
+        """Test that one failing chunk leaves its tasks alone and the other chunks still apply"""
+        def answer(prompt, _):
+            if "|Task 30|" in prompt:
+                raise TimeoutError()
+            return response(suggestions(prompt))
+        llm = LLMService("test-key", transport=StubTransport(answer))
+
+        updated = llm.prioritize_tasks(make_tasks(50), review_all=True, chunk_size=25)
+
+        assert [task['priority'] for task in updated] == ['low'] * 25 + ['medium'] * 25
+
+    def test_cut_off_response_is_retried(self):
+        """Test that a response cut off by the token limit is asked for again with a larger one"""
+        def answer(prompt, max_completion_tokens):
+            if len(transport.requests) == 1:
+                return response(suggestions(prompt)[:60], finish_reason='length')
+            return response(suggestions(prompt))
+        transport = StubTransport(answer)
+        llm = LLMService("test-key", transport=transport)
+
+        updated = llm.prioritize_tasks(make_tasks(10), review_all=True)
+
+        assert [task['priority'] for task in updated] == ['low'] * 10
+        first, second = transport.requests
+        assert second['max_completion_tokens'] == 2 * first['max_completion_tokens']
+
+    def test_cut_off_tail_is_not_guessed(self):
+        """Test that only complete suggestions count when every attempt is cut off"""
+        transport = StubTransport(lambda prompt, _: response(suggestions(prompt)[:80], finish_reason='length'))
+        llm = LLMService("test-key", transport=transport)
+
+        updated = llm.prioritize_tasks(make_tasks(10), review_all=True)
+
+        assert len(transport.requests) == PRIORITIZE_ATTEMPTS
+        assert [task['priority'] for task in updated] == ['low', 'low'] + ['medium'] * 8
+
+    def test_prioritize_and_save_writes_once(self, task_manager, monkeypatch):
+        """Test that all changed priorities are saved by one update_tasks call, undone in one step"""
+        task_manager.add_tasks([{'text': f"Task {i}"} for i in range(30)])
+        llm = LLMService("test-key", transport=StubTransport(lambda prompt, _: response(suggestions(prompt))))
+        writes = []
+        update_tasks = task_manager.update_tasks
+        monkeypatch.setattr(task_manager, 'update_tasks', lambda updates: writes.append(updates) or update_tasks(updates))
+
+        changed = llm.prioritize_and_save(task_manager, review_all=True, chunk_size=10)
+
+        assert len(writes) == 1 and len(changed) == 30
+        assert {task['priority'] for task in task_manager.get_tasks()} == {'low'}
+        assert task_manager.undo()
+        assert {task['priority'] for task in task_manager.get_tasks()} == {'medium'}
+
+
+@pytest.mark.unit
+class TestSuggestNextTask:
+    """Unit tests for the model rerank of the next task, with a stubbed transport"""
+
+    def test_rerank_leaves_room_to_reason(self):
+        """Test that the handle is asked for again when reasoning used up the allowance"""
+        def answer(prompt, max_completion_tokens):
+            if len(transport.requests) == 1:
+                return response("", finish_reason='length')
+            return response('"t3"')
+        transport = StubTransport(answer)
+        llm = LLMService("test-key", transport=transport)
+        candidates = make_tasks(4)
+
+        assert llm.suggest_next_task(candidates, candidates, rerank=True) is candidates[2]
+        first, second = transport.requests
+        assert first['max_completion_tokens'] > PRIORITIZE_REASONING_TOKENS
+        assert second['max_completion_tokens'] == 2 * first['max_completion_tokens']
+
+    def test_cut_off_rerank_keeps_local_pick(self):
+        """Test that the best local candidate is kept when every attempt is cut off"""
+        transport = StubTransport(lambda prompt, _: response(None, finish_reason='length'))
+        llm = LLMService("test-key", transport=transport)
+        candidates = make_tasks(4)
+
+        assert llm.suggest_next_task(candidates, candidates, rerank=True) is candidates[0]
+        assert len(transport.requests) == PRIORITIZE_ATTEMPTS
+
+
+@pytest.mark.unit
+class TestStreamBraindump:
+    """Unit tests for streamed brain dumps, with a stubbed transport"""
+
+    def test_cut_off_output_is_not_cached(self):
+        """Test that a cut-off response yields only fully written tasks and is asked for again next time"""
+        transport = StubTransport(lambda prompt, _: stream(
+            '[{"text": "Done", "priority": "low"}, {"text": "Review contract", ', '"category": "cli'))
+        llm = LLMService("test-key", transport=transport)
+
+        tasks = list(llm.stream_braindump("done, review the contract"))
+        assert [task['text'] for task in tasks] == ["Done", "Review contract"]
+        assert tasks[1]['category'] is None
+
+        transport.answer = lambda prompt, _: stream('[{"text": "Done"}, {"text": "Call cli')
+        assert [task['text'] for task in llm.stream_braindump("done, review the contract")] == ["Done"]
+        assert len(transport.requests) == 2
+
+    def test_complete_output_is_cached(self):
+        """Test that a complete response is served from the cache the second time"""
+        transport = StubTransport(lambda prompt, _: stream('[{"text": "Done"}', ']'))
+        llm = LLMService("test-key", transport=transport)
+
+        assert list(llm.stream_braindump("done")) == list(llm.stream_braindump("done"))
+        assert len(transport.requests) == 1
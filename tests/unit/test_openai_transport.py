@@ -0,0 +1,162 @@
+import asyncio
+import contextvars
+import threading
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+openai = pytest.importorskip("openai")
+
+from services.async_task_manager import AsyncTaskManager
+from services.llm_metrics import CallRecord
+from services.openai_transport import OpenAITransport, get_transport
+
+
+def timeout_error():
+    return openai.APITimeoutError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+
+
+class FlakyRequest:
+    """Request that raises the given errors on its first calls, then returns 'ok'"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.clients = []
+
+    def __call__(self, client):
+        self.clients.append(client)
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+    async def acall(self, client):
+        return self(client)
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    transport = OpenAITransport("test-key", max_retries=2, backoff_base=0.02, backoff_max=0.03)
+    delays = transport.delays = []
+    delay = transport._delay
+    monkeypatch.setattr(transport, '_delay', lambda attempt, error: delays.append(delay(attempt, error)) or delays[-1])
+    yield transport
+    transport.close()
+
+
+@pytest.mark.unit
+class TestOpenAITransport:
+    """Unit tests for retries, pooled clients and streaming, with fake requests instead of the API"""
+
+    def test_transient_failures_are_retried(self, transport):
+        """Test that retryable errors are retried with jittered, capped backoff and counted"""
+        request = FlakyRequest(timeout_error(), timeout_error())
+        record = CallRecord('llm.chat')
+        assert transport.call('chat', request, record) == 'ok'
+        assert len(request.clients) == 3
+        assert record.retries == 2
+        assert 0 <= transport.delays[0] <= 0.02 and 0 <= transport.delays[1] <= 0.03
+
+    def test_retries_are_bounded(self, transport):
+        """Test that the last transient failure is raised after max_retries retries"""
+        request = FlakyRequest(*(timeout_error() for _ in range(5)))
+        with pytest.raises(openai.APITimeoutError):
+            transport.call('chat', request)
+        assert len(request.clients) == 3
+
+    def test_other_errors_pass_through(self, transport):
+        """Test that a non-retryable error is raised at once"""
+        request = FlakyRequest(ValueError("bad request"))
+        record = CallRecord('llm.chat')
+        with pytest.raises(ValueError):
+            transport.call('chat', request, record)
+        assert len(request.clients) == 1 and record.retries == 0
+
+    def test_async_calls_are_retried(self, transport):
+        """Test that acall retries like call, on the transport's own loop"""
+        request = FlakyRequest(timeout_error())
+        record = CallRecord('llm.chat')
+        assert transport.run(transport.acall('chat', request.acall, record)) == 'ok'
+        assert len(request.clients) == 2 and record.retries == 1
+        with pytest.raises(ValueError):
+            transport.run(transport.acall('chat', FlakyRequest(ValueError()).acall))
+
+    def test_clients_share_the_pool(self, transport):
+        """Test that per-endpoint clients are reused and share one pooled HTTP client"""
+        request = FlakyRequest()
+        transport.call('chat', request)
+        transport.call('chat', request)
+        transport.call('transcription', request)
+        chat, again, transcription = request.clients
+        assert chat is again and chat is not transcription
+        assert chat._client is transcription._client is transport.http_client
+        assert get_transport("test-key") is get_transport("test-key")
+
+    def test_iterate_passes_items_and_errors(self, transport):
+        """Test that a stream's items and its error reach the sync consumer"""
+        async def stream():
+            yield 1
+            yield 2
+            raise ValueError("stream broke")
+
+        items = transport.iterate(stream())
+        assert next(items) == 1 and next(items) == 2
+        with pytest.raises(ValueError):
+            next(items)
+
+    def test_cancelled_stream_wakes_consumer(self, transport):
+        """Test that a stream cancelled on the loop ends the consumer's wait instead of hanging"""
+        started = threading.Event()
+
+        async def stream():
+            yield 1
+            started.set()
+            await asyncio.sleep(60)
+            yield 2
+
+        items = transport.iterate(stream())
+        assert next(items) == 1
+        started.wait(5)
+        closer = threading.Thread(target=transport.close)
+        closer.start()
+        with pytest.raises(asyncio.CancelledError):
+            next(items)
+        closer.join()
+
+    def test_consumer_closing_stops_stream(self, transport):
+        """Test that closing the consumer early stops the producer on the loop"""
+        stopped = threading.Event()
+
+        async def stream():
+            try:
+                while True:
+                    yield 1
+                    await asyncio.sleep(0.01)
+            finally:
+                stopped.set()
+
+        items = transport.iterate(stream())
+        assert next(items) == 1
+        items.close()
+        assert stopped.wait(5)
+
+    def test_loop_work_keeps_the_callers_actor(self, transport, task_manager):
+        """Test that agent-style work on the transport's loop is undone only by the session that ran it"""
+        tasks = AsyncTaskManager(task_manager)
+
+        def session(actor, action):
+            def run():
+                task_manager.set_actor(actor)
+                return action()
+            return contextvars.Context().run(run)
+
+        async def add_streamed(text):
+            yield await tasks.add_task(text)
+
+        [bob_task] = session('bob', lambda: list(transport.iterate(add_streamed("Bob's task"))))
+        alice_task = session('alice', lambda: transport.run(tasks.add_task("Alice's task")))
+
+        assert session('bob', lambda: transport.run(tasks.undo()))
+        assert task_manager.get_task(bob_task) is None
+        assert task_manager.get_task(alice_task) is not None
+        assert session('alice', lambda: task_manager.can_undo)
+        assert not task_manager.can_undo
@@ -0,0 +1,62 @@
+import pytest
+import time
+from services.response_cache import ResponseCache, make_key, normalize_text
+
+
+@pytest.mark.unit
+class TestResponseCache:
+    """Unit tests for the LLM response cache"""
+    
+    def test_normalized_keys(self):
+        """Test that case, punctuation and spacing map to the same key"""
+        assert normalize_text("  Buy milk,  and CALL mom! ") == "buy milk and call mom"
+        assert make_key('braindump', 1, 'model', normalize_text("Buy milk.")) == \
+               make_key('braindump', 1, 'model', normalize_text("buy  milk"))
+        assert make_key('braindump', 1, 'model', "buy milk") != make_key('braindump', 2, 'model', "buy milk")
+    
+    def test_hit_miss_counters(self):
+        """Test that lookups are counted and hits return copies"""
+        cache = ResponseCache()
+        assert cache.get("key") is None
+        cache.put("key", [{"text": "Buy milk"}])
+        value = cache.get("key")
+        value[0]["text"] = "changed"
+        assert cache.get("key") == [{"text": "Buy milk"}]
+        
+        stats = cache.stats()
+        assert (stats['hits'], stats['misses'], stats['size']) == (2, 1, 1)
+        assert stats['hit_rate'] == pytest.approx(2 / 3)
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = ResponseCache(max_entries=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.stats()['evictions'] == 1
+    
+    def test_ttl(self):
+        """Test that expired entries are misses"""
+        cache = ResponseCache(ttl_seconds=0.01)
+        cache.put("key", "value")
+        time.sleep(0.02)
+        assert cache.get("key") is None
+        assert cache.stats()['expired'] == 1
+    
+    def test_disk_tier(self, temp_dir):
+        """Test that entries survive a restart and disk size is bounded"""
+        path = str(temp_dir / "llm.db")
+        cache = ResponseCache(path=path, max_disk_entries=2)
+        for key in ("a", "b", "c"):
+            cache.put(key, key.upper())
+        
+        restarted = ResponseCache(path=path, max_disk_entries=2)
+        assert restarted.get("a") is None
+        assert restarted.get("c") == "C"
+        assert restarted.stats()['disk_hits'] == 1
+        # Now in memory as well
+        assert restarted.get("c") == "C"
+        assert restarted.stats()['disk_hits'] == 1
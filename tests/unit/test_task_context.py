@@ -0,0 +1,69 @@
+import pytest
+from services import task_context
+from services.task_context import CONTEXT_HEADER, build_task_context, estimate_tokens
+
+
+def make_tasks(count):
+    return [
+        {'id': f"id-{i}", 'text': f"Routine chore number {i}", 'priority': 'low',
+         'category': 'personal', 'completed': False}
+        for i in range(count)
+    ]
+
+
+@pytest.mark.unit
+class TestTaskContext:
+    """Unit tests for the compact prompt context"""
+
+    def test_compact_lines_and_handles(self):
+        """Test that each task becomes one line with a short handle"""
+        tasks = [
+            {'id': 'uuid-a', 'text': "Call dentist", 'priority': 'high', 'category': 'personal', 'completed': False},
+            {'id': 'uuid-b', 'text': "Send | invoice", 'priority': 'medium', 'category': None, 'completed': True},
+        ]
+        context, handles = build_task_context(tasks, "something unrelated")
+
+        lines = context.split('\n')
+        assert lines[0] == CONTEXT_HEADER
+        assert "t1|Call dentist|high|personal|open" in lines
+        assert "t2|Send / invoice|medium|-|done" in lines
+        assert handles == {'t1': 'uuid-a', 't2': 'uuid-b'}
+
+    def test_empty(self):
+        """Test the context for an empty task list"""
+        assert build_task_context([], "add milk") == ("(no tasks)", {})
+
+    def test_budget_keeps_relevant_tasks(self):
+        """Test that an over-budget list keeps the tasks matching the utterance"""
+        tasks = make_tasks(500)
+        tasks.append({'id': 'target', 'text': "Renew passport", 'priority': 'high',
+                      'category': 'personal', 'completed': False})
+
+        context, handles = build_task_context(tasks, "delete the passport task", token_budget=200)
+
+        assert estimate_tokens(context) <= 220
+        assert handles['t1'] == 'target'
+        assert len(handles) < len(tasks)
+        assert context.endswith("less relevant tasks omitted)")
+
+    def test_budget_prefers_pending(self):
+        """Test that pending tasks fill the budget before completed ones"""
+        done = [dict(task, id=f"done-{i}", completed=True) for i, task in enumerate(make_tasks(100))]
+        pending = make_tasks(3)
+
+        _, handles = build_task_context(done + pending, "hello", token_budget=100)
+
+        assert list(handles.values())[:3] == ['id-0', 'id-1', 'id-2']
+
+    def test_budget_uses_maintained_index(self, task_manager, monkeypatch):
+        """Test that a TaskManager's search picks the relevant tasks, without a one-off index"""
+        task_manager.add_tasks(make_tasks(300))
+        target = task_manager.add_task("Renew passport", priority='high')
+        monkeypatch.setattr(task_context, 'rank_tasks', lambda *args, **kwargs: pytest.fail("built a one-off index"))
+
+        _, handles = build_task_context(task_manager.get_tasks(), "renew the passport", token_budget=200,
+                                        search=task_manager.search_tasks)
+        assert handles['t1'] == target
+
+        _, handles = build_task_context(task_manager.get_tasks()[:3], "renew the passport")
+        assert list(handles.values()) == [task['id'] for task in task_manager.get_tasks()[:3]]
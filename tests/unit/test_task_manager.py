@@ -1,9 +1,11 @@
 import pytest
+import contextvars
 import tempfile
 import os
 import json
 from datetime import datetime
 from services.task_manager import TaskManager
+from services.task_query import encode_cursor
 
 
 @pytest.mark.unit
@@ -93,6 +95,98 @@ class TestTaskManager:
         tasks = task_manager.get_tasks()
         assert tasks[0]['text'] == "Updated text"
     
+    def test_get_task(self, task_manager):
+        """Test looking up a single task by id"""
+        task_id = task_manager.add_task("Find me", priority="high")
+        task_manager.add_task("Other task")
+        
+        task = task_manager.get_task(task_id)
+        assert task['text'] == "Find me"
+        assert task is task_manager.get_tasks()[0]
+        assert task_manager.get_task("nonexistent_id") is None
+        
+        task_manager.delete_task(task_id)
+        assert task_manager.get_task(task_id) is None
+    
+    def test_order_preserved_after_delete_and_update(self, task_manager):
+        """Test that the id index keeps tasks in insertion order"""
+        ids = [task_manager.add_task(f"Task {i}") for i in range(4)]
+        task_manager.delete_task(ids[1])
+        task_manager.update_task(ids[0], text="Task 0 (edited)")
+        task_manager.toggle_task(ids[3])
+        
+        assert [t['text'] for t in task_manager.get_tasks()] == ["Task 0 (edited)", "Task 2", "Task 3"]
+    
+    def test_add_tasks(self, task_manager):
+        """Test adding a batch of tasks"""
+        ids = task_manager.add_tasks([
+            {'text': "First", 'priority': "high", 'category': "client"},
+            {'text': "  Second  "},
+        ])
+        tasks = task_manager.get_tasks()
+        
+        assert [t['id'] for t in tasks] == ids
+        assert tasks[0]['priority'] == "high"
+        assert tasks[1]['text'] == "Second"
+        assert tasks[1]['priority'] == "medium"
+        assert tasks[1]['category'] is None
+    
+    def test_add_tasks_single_write(self, task_manager, monkeypatch):
+        """Test that a batch is persisted with one write"""
+        writes = []
+        monkeypatch.setattr(task_manager._storage, 'save', lambda tasks: writes.append(list(tasks)))
+        task_manager.add_tasks([{'text': f"Task {i}"} for i in range(30)])
+        
+        assert len(writes) == 1
+        assert len(writes[0]) == 30
+    
+    def test_add_tasks_validates_everything_first(self, task_manager):
+        """Test that one invalid item rejects the whole batch"""
+        with pytest.raises(ValueError) as error:
+            task_manager.add_tasks([
+                {'text': "Valid"},
+                {'text': "   "},
+                {'text': "Bad priority", 'priority': "urgent"},
+                {'text': "Bad category", 'category': "hobby"},
+            ])
+        
+        assert "item 1" in str(error.value)
+        assert "item 2" in str(error.value)
+        assert "item 3" in str(error.value)
+        assert task_manager.get_tasks() == []
+    
+    def test_update_tasks(self, task_manager):
+        """Test updating a batch of tasks"""
+        first_id, second_id = task_manager.add_tasks([{'text': "First"}, {'text': "Second"}])
+        
+        updated = task_manager.update_tasks([
+            {'id': first_id, 'priority': "high"},
+            {'id': second_id, 'text': "Second (edited)", 'category': "personal"},
+            {'id': "nonexistent_id", 'text': "Ignored"},
+        ])
+        
+        assert updated == [first_id, second_id]
+        assert task_manager.get_task(first_id)['priority'] == "high"
+        assert task_manager.get_task(second_id)['text'] == "Second (edited)"
+        assert task_manager.get_task(second_id)['category'] == "personal"
+        
+        with pytest.raises(ValueError):
+            task_manager.update_tasks([{'id': first_id, 'priority': "urgent"}])
+        assert task_manager.get_task(first_id)['priority'] == "high"
+    
+    def test_complete_and_delete_tasks(self, task_manager):
+        """Test completing and deleting batches of tasks"""
+        ids = task_manager.add_tasks([{'text': f"Task {i}"} for i in range(3)])
+        
+        assert task_manager.complete_tasks(ids[:2]) == ids[:2]
+        assert task_manager.get_stats()['completed'] == 2
+        assert task_manager.get_task(ids[0])['completed_at'] is not None
+        # Already completed tasks are left alone
+        assert task_manager.complete_tasks(ids[:2]) == []
+        
+        assert task_manager.delete_tasks([ids[0], "nonexistent_id", ids[2]]) == [ids[0], ids[2]]
+        assert [t['id'] for t in task_manager.get_tasks()] == [ids[1]]
+    
     def test_get_tasks_by_priority(self, task_manager):
         """Test filtering tasks by priority"""
         task_manager.add_task("High task", priority="high")
@@ -161,6 +255,43 @@ class TestTaskManager:
         assert stats['business_tasks'] == 1
         assert stats['personal_tasks'] == 1
     
+    def test_stats_track_mutations(self, temp_task_file):
+        """Test that incremental counters match a full recount after every kind of change"""
+        task_manager = TaskManager(storage_path=temp_task_file, debug=True)
+        high_id = task_manager.add_task("High client task", priority="high", category="client")
+        low_id = task_manager.add_task("Low task", priority="low")
+        task_manager.get_stats()
+        
+        task_manager.update_task(high_id, priority="medium", category="business")
+        task_manager.toggle_task(low_id)
+        task_manager.update_task(low_id, completed=False)
+        task_manager.update_task("nonexistent_id", priority="high")
+        stats = task_manager.get_stats()
+        assert stats['medium_priority'] == 1
+        assert stats['high_priority'] == 0
+        assert stats['business_tasks'] == 1
+        assert stats['client_tasks'] == 0
+        assert stats['completed'] == 0
+        
+        task_manager.delete_task(high_id)
+        assert task_manager.get_stats()['total'] == 1
+        
+        task_manager.clear_all()
+        assert task_manager.get_stats()['total'] == 0
+    
+    def test_stats_after_reload(self, temp_task_file):
+        """Test that counters are rebuilt when tasks are loaded and migrated"""
+        with open(temp_task_file, 'w') as f:
+            json.dump([
+                {'id': '1', 'text': 'Old format', 'completed': True, 'created_at': datetime.now().isoformat()}
+            ], f)
+        
+        task_manager = TaskManager(storage_path=temp_task_file, debug=True)
+        stats = task_manager.get_stats()
+        assert stats['total'] == 1
+        assert stats['completed'] == 1
+        assert stats['medium_priority'] == 1
+    
     def test_clear_all(self, task_manager):
         """Test clearing all tasks"""
         task_manager.add_task("Task 1")
@@ -183,4 +314,404 @@ class TestTaskManager:
         
         # Should not crash and tasks should remain empty
         tasks = task_manager.get_tasks()
-        assert len(tasks) == 0 
\ No newline at end of file
+        assert len(tasks) == 0 
+
+@pytest.mark.unit
+class TestTaskManagerQuery:
+    """Unit tests for sorted, paginated task queries"""
+    
+    @pytest.fixture
+    def task_manager(self, storage_path):
+        task_manager = TaskManager(storage_path=storage_path)
+        task_manager.add_tasks([
+            {'text': f"Task {i}", 'priority': ('high', 'medium', 'low')[i % 3],
+             'category': ('client', 'personal')[i % 2]}
+            for i in range(25)
+        ])
+        return task_manager
+    
+    def page_through(self, task_manager, **kwargs):
+        pages = []
+        cursor = None
+        while True:
+            page = task_manager.query_tasks(cursor=cursor, **kwargs)
+            pages.append(page['tasks'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                return pages
+    
+    def test_pages_cover_every_task_once(self, task_manager):
+        """Test that paging returns each task exactly once, in order"""
+        pages = self.page_through(task_manager, limit=10)
+        assert [len(page) for page in pages] == [10, 10, 5]
+        texts = [task['text'] for page in pages for task in page]
+        assert texts == [task['text'] for task in task_manager.get_tasks()]
+    
+    def test_sort_by_priority(self, task_manager):
+        """Test priority order: high first, creation order within a priority"""
+        page = task_manager.query_tasks(sort_by='priority', limit=25)
+        priorities = [task['priority'] for task in page['tasks']]
+        assert priorities == ['high'] * 9 + ['medium'] * 8 + ['low'] * 8
+        assert page['tasks'][0]['text'] == "Task 0"
+        assert page['tasks'][1]['text'] == "Task 3"
+    
+    def test_filters_and_total(self, task_manager):
+        """Test filtering by priority, category and status"""
+        task_id = task_manager.query_tasks(priority='high', limit=1)['tasks'][0]['id']
+        task_manager.toggle_task(task_id)
+        
+        page = task_manager.query_tasks(priority='high', category='client', status='pending', limit=2)
+        assert page['total'] == 4
+        assert all(task['priority'] == 'high' and task['category'] == 'client' and not task['completed']
+                   for task in page['tasks'])
+        assert task_manager.query_tasks(status='completed')['total'] == 1
+    
+    def test_descending_modified_at(self, task_manager):
+        """Test that the most recently modified task comes first"""
+        task_id = task_manager.get_tasks()[5]['id']
+        task_manager.update_task(task_id, text="Edited")
+        page = task_manager.query_tasks(sort_by='modified_at', descending=True, limit=1)
+        assert page['tasks'][0]['text'] == "Edited"
+    
+    def test_cursor_survives_inserts(self, task_manager):
+        """Test that tasks added between pages don't shift the next page"""
+        first = task_manager.query_tasks(limit=10)
+        task_manager.add_task("Added later")
+        second = task_manager.query_tasks(limit=10, cursor=first['next_cursor'])
+        assert second['tasks'][0]['text'] == "Task 10"
+    
+    def test_invalid_arguments(self, task_manager):
+        """Test that bad sort keys, statuses and cursors are rejected"""
+        cursor = task_manager.query_tasks(limit=5)['next_cursor']
+        with pytest.raises(ValueError):
+            task_manager.query_tasks(sort_by='text')
+        with pytest.raises(ValueError):
+            task_manager.query_tasks(status='done')
+        with pytest.raises(ValueError):
+            task_manager.query_tasks(sort_by='priority', cursor=cursor)
+        with pytest.raises(ValueError):
+            task_manager.query_tasks(cursor="not a cursor")
+        with pytest.raises(ValueError):
+            task_manager.query_tasks(cursor=encode_cursor('created_at', False, ('2024-01-01T10:00:00', 'abc')))
+    
+    def test_orders_hold_task_ids(self, task_manager):
+        """Test the sort orders keep bare ids, ranked on the packed timestamps"""
+        for buckets in task_manager._orders._orders.values():
+            for task_ids in buckets.values():
+                assert all(isinstance(task_id, str) for task_id in task_ids)
+        oldest = task_manager.query_tasks(limit=1)['tasks'][0]
+        assert task_manager._orders.key('created_at', oldest.id) == (oldest._created_at, oldest.id)
+
+
+@pytest.mark.unit
+class TestTaskManagerConcurrency:
+    """Concurrency tests for a TaskManager shared between session threads"""
+    
+    def run_threads(self, target, count):
+        import threading
+        errors = []
+        def guarded(index):
+            try:
+                target(index)
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=guarded, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors
+    
+    def test_concurrent_writers_and_readers(self, storage_path):
+        """Test that parallel writers and readers leave consistent state"""
+        task_manager = TaskManager(storage_path=storage_path, backend='journal', debug=True)
+        
+        def work(index):
+            for i in range(25):
+                task_id = task_manager.add_task(f"Thread {index} task {i}", priority="high" if i % 2 else "low")
+                task_manager.toggle_task(task_id)
+                if i % 5 == 0:
+                    task_manager.delete_task(task_id)
+                # Readers iterate snapshots while other threads write
+                assert all('id' in t for t in task_manager.get_tasks())
+                task_manager.get_pending_tasks()
+                task_manager.get_stats()
+        
+        assert self.run_threads(work, 8) == []
+        
+        stats = task_manager.get_stats()
+        assert stats['total'] == 8 * 20
+        assert stats['completed'] == 8 * 20
+        reloaded = TaskManager(storage_path=storage_path, backend='journal')
+        assert len(reloaded.get_tasks()) == 8 * 20
+    
+    def test_group_commit_shares_flushes(self, storage_path):
+        """Test that concurrent group-commit writers are batched into fewer writes"""
+        task_manager = TaskManager(storage_path=storage_path, backend='journal',
+                                   durability='group', flush_interval_ms=20)
+        writes = []
+        original = task_manager._storage.apply
+        def apply(changes, tasks):
+            writes.append(len(changes))
+            original(changes, tasks)
+        task_manager._storage.apply = apply
+        
+        def work(index):
+            for i in range(5):
+                task_manager.add_task(f"Thread {index} task {i}")
+        
+        assert self.run_threads(work, 10) == []
+        assert sum(writes) == 50
+        assert len(writes) < 50
+        task_manager.close()
+    
+    def test_burst_shares_one_background_write(self, storage_path):
+        """Test that changes queued within one flush interval are written together"""
+        import time
+        task_manager = TaskManager(storage_path=storage_path, backend='journal',
+                                   durability='async', flush_interval_ms=300)
+        writes = []
+        original = task_manager._storage.apply
+        def apply(changes, tasks):
+            writes.append(len(changes))
+            original(changes, tasks)
+        task_manager._storage.apply = apply
+        
+        task_manager.add_task("First")
+        task_manager.flush()
+        writes.clear()
+        # Each change wakes the flusher; none of them may end the interval early
+        for i in range(5):
+            task_manager.add_task(f"Burst {i}")
+            time.sleep(0.02)
+        deadline = time.monotonic() + 5
+        while not writes and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert writes == [5]
+        task_manager.close()
+    
+    def test_readers_do_not_wait_for_sync_writes(self, storage_path):
+        """Test that reads proceed while a sync write is on disk"""
+        import threading
+        import time
+        task_manager = TaskManager(storage_path=storage_path, backend='journal')
+        writing = threading.Event()
+        original = task_manager._storage.apply
+        def slow_apply(changes, tasks):
+            writing.set()
+            time.sleep(0.5)
+            original(changes, tasks)
+        task_manager._storage.apply = slow_apply
+        
+        writer = threading.Thread(target=task_manager.add_task, args=("Slow write",))
+        writer.start()
+        assert writing.wait(5)
+        started = time.monotonic()
+        stats = task_manager.get_stats()
+        assert time.monotonic() - started < 0.2
+        assert stats['total'] == 1
+        writer.join()
+        
+        # The write is still on disk before add_task returns
+        reloaded = TaskManager(storage_path=storage_path, backend='journal')
+        assert [t['text'] for t in reloaded.get_tasks()] == ["Slow write"]
+    
+    @pytest.mark.parametrize("durability", ['group', 'async'])
+    def test_background_flush_during_writes(self, storage_path, durability):
+        """Test that the flusher never iterates the store while writers change it"""
+        task_manager = TaskManager(storage_path=storage_path, durability=durability, flush_interval_ms=1)
+        flush_errors = []
+        original = task_manager.flush
+        def flush():
+            try:
+                original()
+            except Exception as e:
+                flush_errors.append(e)
+                raise
+        task_manager.flush = flush
+        
+        def work(index):
+            for i in range(150):
+                task_manager.add_task(f"Thread {index} task {i}")
+        
+        assert self.run_threads(work, 8) == []
+        task_manager.close()
+        assert flush_errors == []
+        reloaded = TaskManager(storage_path=storage_path)
+        assert len(reloaded.get_tasks()) == 8 * 150
+
+
+@pytest.mark.unit
+class TestTaskManagerChangeFeed:
+    """Unit tests for the version number and change feed"""
+    
+    @pytest.fixture
+    def task_manager(self, storage_path):
+        return TaskManager(storage_path=storage_path, change_feed_size=5)
+    
+    def test_events_since_version(self, task_manager):
+        """Test that each mutation bumps the version and reports what changed"""
+        assert task_manager.version == 0
+        task_id = task_manager.add_task("Write report")
+        start = task_manager.version
+        task_manager.update_task(task_id, priority='high')
+        task_manager.delete_task(task_id)
+        
+        feed = task_manager.changes_since(start)
+        assert feed['version'] == start + 2
+        assert feed['complete']
+        update, delete = feed['events']
+        assert update['op'] == 'put' and update['task_id'] == task_id
+        assert update['fields'] == {'priority': 'high', 'modified_at': update['fields']['modified_at']}
+        assert (delete['op'], delete['task_id'], delete['fields']) == ('delete', task_id, None)
+        
+        assert task_manager.changes_since(feed['version'])['events'] == []
+    
+    def test_new_tasks_and_clear(self, task_manager):
+        """Test that inserts carry every field and clear is a single event"""
+        task_manager.add_tasks([{'text': "One"}, {'text': "Two"}])
+        events = task_manager.changes_since(0)['events']
+        assert [event['fields']['text'] for event in events] == ["One", "Two"]
+        
+        task_manager.clear_all()
+        assert task_manager.changes_since(2)['events'][0]['op'] == 'clear'
+    
+    def test_events_name_the_actor(self, task_manager):
+        """Test that each event says whose change it was"""
+        def session(actor, action):
+            def run():
+                task_manager.set_actor(actor)
+                return action()
+            return contextvars.Context().run(run)
+        
+        session('alice', lambda: task_manager.add_task("Alice's task"))
+        session('bob', task_manager.clear_all)
+        task_manager.add_task("Nobody's task")
+        
+        assert [event['actor'] for event in task_manager.changes_since(0)['events']] == ['alice', 'bob', None]
+    
+    def test_bounded_feed(self, task_manager):
+        """Test that consumers behind the retained window are told to resync"""
+        for i in range(8):
+            task_manager.add_task(f"Task {i}")
+        feed = task_manager.changes_since(0)
+        assert not feed['complete']
+        assert len(feed['events']) == 5
+        assert task_manager.changes_since(3)['complete']
+    
+    def test_subscribe(self, task_manager):
+        """Test that subscribers receive events until they unsubscribe"""
+        received = []
+        unsubscribe = task_manager.subscribe(received.append)
+        task_id = task_manager.add_task("Watched")
+        unsubscribe()
+        task_manager.delete_task(task_id)
+        assert [event['op'] for event in received] == ['put']
+
+
+@pytest.mark.unit
+class TestTaskManagerHistory:
+    """Unit tests for undo and redo"""
+    
+    def test_undo_redo_single_changes(self, storage_path):
+        """Test undoing and redoing an add, an update and a delete"""
+        task_manager = TaskManager(storage_path=storage_path)
+        task_id = task_manager.add_task("Draft proposal")
+        task_manager.update_task(task_id, text="Send proposal")
+        task_manager.delete_task(task_id)
+        
+        assert task_manager.undo()
+        assert task_manager.get_task(task_id)['text'] == "Send proposal"
+        assert task_manager.undo()
+        assert task_manager.get_task(task_id)['text'] == "Draft proposal"
+        assert task_manager.undo()
+        assert task_manager.get_task(task_id) is None
+        assert not task_manager.undo()
+        
+        assert task_manager.redo()
+        assert task_manager.redo()
+        assert task_manager.get_task(task_id)['text'] == "Send proposal"
+        
+        # Undo is persisted like any other change
+        reloaded = TaskManager(storage_path=storage_path)
+        assert reloaded.get_task(task_id)['text'] == "Send proposal"
+    
+    def test_undo_clear_all_restores_order(self, storage_path):
+        """Test that clear_all is undone in one step with the original order"""
+        task_manager = TaskManager(storage_path=storage_path, debug=True)
+        task_manager.add_tasks([{'text': f"Task {i}"} for i in range(5)])
+        task_manager.clear_all()
+        
+        assert task_manager.undo()
+        assert [t['text'] for t in task_manager.get_tasks()] == [f"Task {i}" for i in range(5)]
+        assert task_manager.get_stats()['total'] == 5
+        assert task_manager.undo()
+        assert task_manager.get_tasks() == []
+    
+    def test_new_change_discards_redo(self, storage_path):
+        """Test that redo is only available until the next change"""
+        task_manager = TaskManager(storage_path=storage_path)
+        task_manager.add_task("First")
+        task_manager.undo()
+        assert task_manager.can_redo
+        task_manager.add_task("Second")
+        assert not task_manager.can_redo
+        assert not task_manager.redo()
+    
+    def test_history_is_bounded(self, storage_path):
+        """Test that only history_size steps are kept"""
+        task_manager = TaskManager(storage_path=storage_path, history_size=3)
+        for i in range(5):
+            task_manager.add_task(f"Task {i}")
+        undone = 0
+        while task_manager.undo():
+            undone += 1
+        assert undone == 3
+        assert [t['text'] for t in task_manager.get_tasks()] == ["Task 0", "Task 1"]
+    
+    @pytest.mark.parametrize("backend", ['json', 'journal', 'sqlite'])
+    def test_undo_delete_restores_position(self, storage_path, backend):
+        """Test that undoing a delete puts the task back where it was, also after a reload"""
+        task_manager = TaskManager(storage_path=storage_path, backend=backend)
+        task_ids = task_manager.add_tasks([{'text': f"Task {i}"} for i in range(5)])
+        texts = [f"Task {i}" for i in range(5)]
+        
+        task_manager.delete_task(task_ids[1])
+        task_manager.delete_tasks([task_ids[3], task_ids[0]])
+        assert task_manager.undo()
+        assert [t['text'] for t in task_manager.get_tasks()] == ["Task 0", "Task 2", "Task 3", "Task 4"]
+        assert task_manager.undo()
+        assert [t['text'] for t in task_manager.get_tasks()] == texts
+        
+        # Redoing and undoing again keeps the position too
+        assert task_manager.redo()
+        assert task_manager.undo()
+        assert [t['text'] for t in task_manager.get_tasks()] == texts
+        task_manager.close()
+        assert [t['text'] for t in TaskManager(storage_path=storage_path, backend=backend).get_tasks()] == texts
+    
+    def test_history_is_per_actor(self, storage_path):
+        """Test that an actor (an app session) only undoes and redoes its own changes"""
+        task_manager = TaskManager(storage_path=storage_path, history_actors=2)
+        
+        def as_actor(actor, action):
+            def run():
+                task_manager.set_actor(actor)
+                return action()
+            return contextvars.Context().run(run)
+        
+        alice_task = as_actor('alice', lambda: task_manager.add_task("Alice's task"))
+        bob_task = as_actor('bob', lambda: task_manager.add_task("Bob's task"))
+        
+        assert as_actor('alice', task_manager.undo)
+        assert task_manager.get_task(alice_task) is None
+        assert task_manager.get_task(bob_task) is not None
+        assert not as_actor('alice', lambda: task_manager.can_undo)
+        assert as_actor('alice', lambda: task_manager.can_redo)
+        assert not as_actor('bob', lambda: task_manager.can_redo)
+        assert not task_manager.can_undo
+        
+        # Only the most recently active actors keep their history
+        as_actor('carol', lambda: task_manager.add_task("Carol's task"))
+        assert not as_actor('bob', task_manager.undo)
+        assert task_manager.get_task(bob_task) is not None
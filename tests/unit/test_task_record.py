@@ -0,0 +1,80 @@
+import pytest
+import json
+from services.task_record import Task
+
+
+@pytest.mark.unit
+class TestTask:
+    """Unit tests for the compact Task record"""
+    
+    @pytest.fixture
+    def task_dict(self):
+        return {
+            'id': '1',
+            'text': 'Call the client',
+            'priority': 'high',
+            'category': 'client',
+            'completed': True,
+            'created_at': '2024-01-01T10:00:00',
+            'modified_at': '2024-01-02T11:30:00.250000',
+            'completed_at': '2024-01-02T11:30:00.250000'
+        }
+    
+    def test_reads_like_dict(self, task_dict):
+        """Test item access, get, len and equality with the source dict"""
+        task = Task.from_dict(task_dict)
+        assert task['text'] == 'Call the client'
+        assert task.get('category') == 'client'
+        assert task.get('missing', 'default') == 'default'
+        assert len(task) == len(task_dict)
+        assert task == task_dict
+        with pytest.raises(KeyError):
+            task['missing']
+    
+    def test_round_trip(self, task_dict):
+        """Test dict(), to_dict() and json serialization give back the original"""
+        task = Task.from_dict(task_dict)
+        assert dict(task) == task_dict
+        assert json.loads(json.dumps(task.to_dict())) == task_dict
+    
+    def test_compact_storage(self, task_dict):
+        """Test timestamps are packed as ints and records have no __dict__"""
+        task = Task.from_dict(task_dict)
+        assert isinstance(task._created_at, int)
+        assert not hasattr(task, '__dict__')
+    
+    def test_unusual_timestamps_kept_verbatim(self, task_dict):
+        """Test timestamps that would not round-trip are stored as given"""
+        task_dict['created_at'] = '2024-01-01 10:00:00'
+        task_dict['modified_at'] = '2024-01-01T10:00:00+02:00'
+        task = Task.from_dict(task_dict)
+        assert task['created_at'] == '2024-01-01 10:00:00'
+        assert task['modified_at'] == '2024-01-01T10:00:00+02:00'
+    
+    def test_timestamps_compare_as_ints(self, task_dict):
+        """Test sortable timestamps come straight from the packed slots, kept strings included"""
+        task = Task.from_dict(task_dict)
+        assert task.timestamp('created_at') == task._created_at
+        task_dict['created_at'] = '2024-01-01T10:00:00+02:00'
+        task_dict['modified_at'] = None
+        unusual = Task.from_dict(task_dict)
+        assert unusual.timestamp('created_at') == Task.from_dict(
+            dict(task_dict, created_at='2024-01-01T08:00:00')).timestamp('created_at')
+        assert unusual.timestamp('modified_at') < unusual.timestamp('created_at')
+    
+    def test_extra_fields_preserved(self, task_dict):
+        """Test keys outside the known fields survive a round trip"""
+        task_dict['notes'] = 'bring slides'
+        task = Task.from_dict(task_dict)
+        assert task['notes'] == 'bring slides'
+        assert task.replace(text='Email the client')['notes'] == 'bring slides'
+    
+    def test_replace_is_a_copy(self, task_dict):
+        """Test replace leaves the original record untouched"""
+        task = Task.from_dict(task_dict)
+        updated = task.replace(priority='low', completed=False)
+        assert updated['priority'] == 'low'
+        assert updated['completed'] is False
+        assert task['priority'] == 'high'
+        with pytest.raises(AttributeError):
+            task.missing = 1
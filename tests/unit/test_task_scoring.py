@@ -0,0 +1,77 @@
+import pytest
+from datetime import datetime, timedelta
+from services.task_scoring import rank_key, score_task, suggest_priority, top_tasks, urgency
+
+
+def make_task(task_id, text, priority='medium', category=None, days_old=0, completed=False):
+    return {'id': task_id, 'text': text, 'priority': priority, 'category': category,
+            'completed': completed, 'created_at': (datetime.now() - timedelta(days=days_old)).isoformat()}
+
+
+@pytest.mark.unit
+class TestTaskScoring:
+    """Unit tests for the local next-task scoring"""
+
+    def test_signals(self):
+        """Test that priority, category, urgency words and age all raise the score"""
+        base = make_task('1', "Write report")
+        assert rank_key(make_task('2', "Write report", priority='high')) > rank_key(base)
+        assert rank_key(make_task('3', "Write report", category='client')) > rank_key(base)
+        assert rank_key(make_task('4', "Write report today")) > rank_key(base)
+        assert rank_key(make_task('5', "Write report", days_old=3)) > rank_key(base)
+        assert rank_key(make_task('6', "Write report someday")) < rank_key(base)
+
+    def test_order_is_time_independent(self):
+        """Test that the order between two tasks doesn't change as time passes"""
+        old_low = make_task('1', "Tidy desk", priority='low', days_old=5)
+        new_high = make_task('2', "Fix outage", priority='high')
+        now = datetime.now().timestamp()
+        for later in (0, 86400, 30 * 86400):
+            assert score_task(new_high, now + later) > score_task(old_low, now + later)
+
+    def test_top_tasks_and_priorities(self):
+        """Test list ranking and urgency-based priority suggestions"""
+        tasks = [
+            make_task('1', "Water plants", priority='low'),
+            make_task('2', "Send contract before the deadline today", priority='low'),
+            make_task('3', "Book flights", priority='high', completed=True),
+        ]
+        assert [task['id'] for task in top_tasks(tasks, 5)] == ['2', '1']
+        assert urgency("ASAP: call the bank today") == 4.5
+        assert suggest_priority(tasks[1]) == 'high'
+        assert suggest_priority(make_task('4', "Learn Spanish someday", priority='high')) == 'low'
+        assert suggest_priority(tasks[0]) == 'low'
+
+
+@pytest.mark.unit
+class TestTaskManagerNextTasks:
+    """Unit tests for the maintained next-task heap"""
+
+    def test_heap_follows_changes(self, task_manager):
+        """Test that completed, deleted and updated tasks are reflected"""
+        low = task_manager.add_task("Tidy desk", priority='low')
+        medium = task_manager.add_task("Read newsletter", priority='medium')
+        high = task_manager.add_task("Prepare client demo", priority='high', category='client')
+
+        assert [task.id for task in task_manager.next_tasks(3)] == [high, medium, low]
+
+        task_manager.toggle_task(high)
+        task_manager.update_task(low, text="Tidy desk today")
+        assert [task.id for task in task_manager.next_tasks(3)] == [low, medium]
+
+        task_manager.delete_task(low)
+        task_manager.undo()
+        task_manager.delete_task(medium)
+        assert [task.id for task in task_manager.next_tasks(3)] == [low]
+        assert task_manager.next_tasks() == task_manager.next_tasks()
+
+    def test_matches_list_ranking(self, task_manager):
+        """Test that the heap agrees with ranking the whole list"""
+        for i in range(50):
+            task_manager.add_task(f"Task {i} {'today' if i % 7 == 0 else ''}",
+                                  priority=('high', 'medium', 'low')[i % 3])
+        for task in task_manager.get_tasks()[::4]:
+            task_manager.toggle_task(task['id'])
+
+        expected = [task['id'] for task in top_tasks(task_manager.get_tasks(), 10)]
+        assert [task.id for task in task_manager.next_tasks(10)] == expected
@@ -0,0 +1,71 @@
+import pytest
+from services.task_manager import TaskManager
+from services.task_search import SearchIndex, tokenize, rank_tasks, is_unambiguous
+
+
+@pytest.mark.unit
+class TestSearchIndex:
+    """Unit tests for the local task text index"""
+    
+    def test_tokenize_stems_and_drops_filler(self):
+        """Test that inflections collapse and filler words are ignored"""
+        assert tokenize("Calling the dentists") == ['call', 'dentist']
+        assert tokenize("Planning my meetings") == ['plan', 'meet']
+    
+    def test_ranking(self):
+        """Test that the more specific match ranks first"""
+        index = SearchIndex()
+        index.add('1', "Call dentist")
+        index.add('2', "Call client about contract")
+        index.add('3', "Buy milk")
+        
+        results = index.search("call the dentist")
+        assert [doc_id for doc_id, _ in results] == ['1', '2']
+        assert index.search("groceries") == []
+    
+    def test_remove(self):
+        """Test that removed documents no longer match"""
+        index = SearchIndex()
+        index.add('1', "Call dentist")
+        index.remove('1', "Call dentist")
+        assert index.search("dentist") == []
+        assert len(index) == 0
+    
+    def test_ambiguity(self):
+        """Test that near ties are reported as ambiguous"""
+        tasks = [
+            {'id': '1', 'text': "Email client"},
+            {'id': '2', 'text': "Email accountant"},
+            {'id': '3', 'text': "Walk dog"}
+        ]
+        assert not is_unambiguous(rank_tasks("email", tasks))
+        assert is_unambiguous(rank_tasks("email the accountant", tasks))
+        assert not is_unambiguous([])
+
+
+@pytest.mark.unit
+class TestTaskManagerSearch:
+    """Unit tests for TaskManager.search_tasks"""
+    
+    def test_index_follows_mutations(self, task_manager):
+        """Test that adds, renames and deletes are reflected in search results"""
+        dentist_id = task_manager.add_task("Call dentist")
+        milk_id = task_manager.add_task("Buy milk")
+        assert [task['id'] for task, _ in task_manager.search_tasks("dentist")] == [dentist_id]
+        
+        task_manager.update_task(milk_id, text="Buy oat milk")
+        assert task_manager.search_tasks("oat")[0][0]['text'] == "Buy oat milk"
+        
+        task_manager.toggle_task(dentist_id)
+        assert task_manager.search_tasks("dentist")[0][0]['completed'] is True
+        
+        task_manager.delete_task(dentist_id)
+        assert task_manager.search_tasks("dentist") == []
+    
+    def test_limit_and_reload(self, task_manager):
+        """Test that the limit applies and the index is rebuilt on load"""
+        task_manager.add_tasks([{'text': f"Review report {i}"} for i in range(5)])
+        assert len(task_manager.search_tasks("report", limit=3)) == 3
+        
+        reloaded = TaskManager(storage_path=str(task_manager.storage_path))
+        assert len(reloaded.search_tasks("reviewing reports", limit=None)) == 5
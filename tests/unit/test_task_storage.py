@@ -0,0 +1,500 @@
+import pytest
+import os
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+from services.task_manager import TaskManager
+from services.task_migrations import SCHEMA_VERSION, migration, pending_migrations
+
+
+@pytest.mark.unit
+class TestJournalStorage:
+    """Unit tests for the journaled TaskManager storage backend"""
+
+    def journal_lines(self, storage_path):
+        with open(storage_path + ".journal") as f:
+            return f.readlines()
+
+    def test_mutations_append_to_journal(self, storage_path):
+        """Test that each mutation appends one record instead of rewriting the snapshot"""
+        task_manager = TaskManager(storage_path=storage_path, backend='journal')
+        task_id = task_manager.add_task("Journaled task")
+        task_manager.toggle_task(task_id)
+
+        assert not os.path.exists(storage_path)
+        lines = self.journal_lines(storage_path)
+        assert len(lines) == 2
+        assert json.loads(lines[1])['task']['completed'] == True
+
+    def test_replay_on_startup(self, storage_path):
+        """Test that a new instance sees snapshot plus journal"""
+        task_manager = TaskManager(storage_path=storage_path, backend='journal')
+        keep_id = task_manager.add_task("Keep me", priority="high")
+        drop_id = task_manager.add_task("Drop me")
+        task_manager.update_task(keep_id, text="Kept")
+        task_manager.delete_task(drop_id)
+
+        reloaded = TaskManager(storage_path=storage_path, backend='journal')
+        tasks = reloaded.get_tasks()
+        assert len(tasks) == 1
+        assert tasks[0]['text'] == "Kept"
+        assert tasks[0]['priority'] == "high"
+
+    def test_clear_is_replayed(self, storage_path):
+        """Test that clear_all survives a restart"""
+        task_manager = TaskManager(storage_path=storage_path, backend='journal')
+        task_manager.add_task("Old task")
+        task_manager.clear_all()
+        task_manager.add_task("New task")
+
+        reloaded = TaskManager(storage_path=storage_path, backend='journal')
+        assert [t['text'] for t in reloaded.get_tasks()] == ["New task"]
+
+    def test_compaction_past_threshold(self, storage_path):
+        """Test that the journal is folded into the snapshot once it grows too long"""
+        task_manager = TaskManager(storage_path=storage_path, backend='journal', compact_threshold=3)
+        for i in range(4):
+            task_manager.add_task(f"Task {i}")
+
+        with open(storage_path) as f:
+            assert len(json.load(f)['tasks']) == 3
+        assert len(self.journal_lines(storage_path)) == 1
+
+        reloaded = TaskManager(storage_path=storage_path, backend='journal')
+        assert [t['text'] for t in reloaded.get_tasks()] == [f"Task {i}" for i in range(4)]
+
+    def test_close_compacts(self, storage_path):
+        """Test that closing the manager leaves an empty journal"""
+        task_manager = TaskManager(storage_path=storage_path, backend='journal')
+        task_manager.add_task("Task")
+        task_manager.close()
+
+        assert self.journal_lines(storage_path) == []
+        with open(storage_path) as f:
+            assert [t['text'] for t in json.load(f)['tasks']] == ["Task"]
+
+    def test_torn_journal_line_is_ignored(self, storage_path):
+        """Test that a partially written record does not break startup"""
+        task_manager = TaskManager(storage_path=storage_path, backend='journal')
+        task_manager.add_task("Survivor")
+        with open(storage_path + ".journal", 'a') as f:
+            f.write('{"op": "put", "task": {"id"')
+
+        reloaded = TaskManager(storage_path=storage_path, backend='journal')
+        assert [t['text'] for t in reloaded.get_tasks()] == ["Survivor"]
+
+    def test_unknown_backend(self, storage_path):
+        """Test that an unknown backend name is rejected"""
+        with pytest.raises(ValueError):
+            TaskManager(storage_path=storage_path, backend='bogus')
+
+
+@pytest.mark.unit
+class TestSqliteStorage:
+    """Unit tests for the SQLite TaskManager storage backend"""
+
+    @pytest.fixture
+    def task_manager(self, temp_dir):
+        return TaskManager(storage_path=str(temp_dir / "tasks.db"), backend='sqlite')
+
+    def test_round_trip(self, task_manager, temp_dir):
+        """Test that tasks survive a restart in insertion order"""
+        first_id = task_manager.add_task("First", priority="high", category="client")
+        task_manager.add_task("Second")
+        task_manager.toggle_task(first_id)
+        task_manager.update_task(first_id, text="First (edited)")
+
+        reloaded = TaskManager(storage_path=str(temp_dir / "tasks.db"), backend='sqlite')
+        tasks = reloaded.get_tasks()
+        assert [t['text'] for t in tasks] == ["First (edited)", "Second"]
+        assert tasks[0]['completed'] is True
+        assert tasks[0]['category'] == "client"
+        assert tasks[1]['category'] is None
+
+    def test_indexed_filters(self, task_manager):
+        """Test that filter queries are answered by the database"""
+        task_manager.add_task("High client", priority="high", category="client")
+        task_manager.add_task("Low personal", priority="low", category="personal")
+        done_id = task_manager.add_task("High done", priority="high")
+        task_manager.toggle_task(done_id)
+
+        assert [t['text'] for t in task_manager.get_tasks_by_priority("high")] == ["High client", "High done"]
+        assert [t['text'] for t in task_manager.get_tasks_by_category("personal")] == ["Low personal"]
+        assert [t['text'] for t in task_manager.get_completed_tasks()] == ["High done"]
+        assert len(task_manager.get_pending_tasks()) == 2
+        assert [t['text'] for t in task_manager.filter_tasks(priority="high", completed=False)] == ["High client"]
+
+    @pytest.mark.parametrize("durability", ['group', 'async'])
+    def test_filters_see_unflushed_changes(self, temp_dir, durability):
+        """Test that filters agree with memory while changes wait for the flusher"""
+        task_manager = TaskManager(storage_path=str(temp_dir / "tasks.db"), backend='sqlite',
+                                   durability=durability, flush_interval_ms=10000 if durability == 'async' else 20)
+        task_id = task_manager.add_task("Urgent", priority="high")
+
+        assert [t['id'] for t in task_manager.get_tasks_by_priority("high")] == [task_id]
+        assert len(task_manager.get_pending_tasks()) == task_manager.get_stats()['pending'] == 1
+
+        task_manager.update_task(task_id, priority="low")
+        task_manager.update_task(task_id, priority="medium")
+        assert task_manager.get_tasks_by_priority("low") == []
+        assert [t['priority'] for t in task_manager.get_tasks_by_priority("medium")] == ["medium"]
+
+        # Once everything is written the database answers again
+        task_manager.flush()
+        queries = []
+        original = task_manager._storage.query_ids
+        task_manager._storage.query_ids = lambda **filters: queries.append(filters) or original(**filters)
+        assert [t['id'] for t in task_manager.get_tasks_by_priority("medium")] == [task_id]
+        assert queries == [{'priority': 'medium'}]
+        task_manager.close()
+
+    def test_indexes_exist(self, task_manager):
+        """Test that the expected indexes are created"""
+        rows = task_manager._storage._conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'tasks'"
+        ).fetchall()
+        names = {row[0] for row in rows}
+        assert {'idx_tasks_priority', 'idx_tasks_category',
+                'idx_tasks_completed', 'idx_tasks_modified_at'} <= names
+
+    def test_delete_and_clear(self, task_manager, temp_dir):
+        """Test that deletes and clears reach the database"""
+        task_id = task_manager.add_task("Delete me")
+        task_manager.add_task("Keep me")
+        task_manager.delete_task(task_id)
+
+        reloaded = TaskManager(storage_path=str(temp_dir / "tasks.db"), backend='sqlite')
+        assert [t['text'] for t in reloaded.get_tasks()] == ["Keep me"]
+
+        task_manager.clear_all()
+        reloaded = TaskManager(storage_path=str(temp_dir / "tasks.db"), backend='sqlite')
+        assert reloaded.get_tasks() == []
+
+    def test_migrates_existing_json(self, temp_dir):
+        """Test the one-shot import of an existing tasks.json"""
+        json_path = temp_dir / "tasks.json"
+        json_manager = TaskManager(storage_path=str(json_path))
+        json_manager.add_task("Legacy task", priority="low")
+
+        sqlite_manager = TaskManager(storage_path=str(json_path), backend='sqlite')
+        assert (temp_dir / "tasks.db").exists()
+        assert [t['text'] for t in sqlite_manager.get_tasks()] == ["Legacy task"]
+
+        # Later JSON edits are not imported again
+        json_manager.add_task("Written after migration")
+        sqlite_manager = TaskManager(storage_path=str(json_path), backend='sqlite')
+        assert [t['text'] for t in sqlite_manager.get_tasks()] == ["Legacy task"]
+
+
+@pytest.mark.unit
+class TestSchemaMigrations:
+    """Unit tests for the versioned store header and migration pipeline"""
+
+    LEGACY_TASKS = [
+        {'id': '1', 'text': 'Old format', 'completed': False, 'created_at': '2024-01-01T10:00:00'}
+    ]
+
+    @pytest.fixture
+    def storage_path(self, temp_dir):
+        path = temp_dir / "tasks.json"
+        with open(path, 'w') as f:
+            json.dump(self.LEGACY_TASKS, f)
+        return str(path)
+
+    def test_legacy_file_migrated_once(self, storage_path, monkeypatch):
+        """Test that an unversioned file is upgraded and stamped, then left alone"""
+        task_manager = TaskManager(storage_path=storage_path)
+        task = task_manager.get_task('1')
+        assert task['priority'] == 'medium'
+        assert task['modified_at'] == '2024-01-01T10:00:00'
+        with open(storage_path) as f:
+            assert json.load(f)['schema_version'] == SCHEMA_VERSION
+
+        # A current store neither runs migrations nor rewrites on startup
+        calls = []
+        monkeypatch.setattr('services.task_manager.upgrade_tasks',
+                            lambda tasks, version: calls.append(version) or tasks)
+        mtime = os.stat(storage_path).st_mtime_ns
+        reloaded = TaskManager(storage_path=storage_path)
+        assert calls == [SCHEMA_VERSION]
+        assert pending_migrations(SCHEMA_VERSION) == []
+        assert os.stat(storage_path).st_mtime_ns == mtime
+        assert reloaded.get_task('1')['priority'] == 'medium'
+
+    def test_lazy_migrations(self, storage_path):
+        """Test that lazy mode upgrades in memory and stamps on the next full write"""
+        task_manager = TaskManager(storage_path=storage_path, backend='journal', lazy_migrations=True)
+        assert task_manager.get_task('1')['priority'] == 'medium'
+        with open(storage_path) as f:
+            assert json.load(f) == self.LEGACY_TASKS
+
+        task_manager.add_task("New task")
+        task_manager.compact()
+        with open(storage_path) as f:
+            assert json.load(f)['schema_version'] == SCHEMA_VERSION
+
+    def test_sqlite_import_keeps_legacy_version(self, storage_path):
+        """Test that tasks imported from an old JSON file still get migrated"""
+        task_manager = TaskManager(storage_path=storage_path, backend='sqlite')
+        assert task_manager.get_task('1')['priority'] == 'medium'
+        assert task_manager._storage.schema_version == SCHEMA_VERSION
+        assert task_manager.filter_tasks(priority='medium')[0]['id'] == '1'
+
+    def test_lazy_sqlite_filters_use_migrated_values(self, temp_dir):
+        """Test that filters see lazily migrated values the database rows don't have yet"""
+        from services.task_storage import SqliteStorage
+        db_path = temp_dir / "tasks.db"
+        legacy = SqliteStorage(db_path)
+        legacy.save(self.LEGACY_TASKS, schema_version=0)
+        legacy.close([])
+
+        task_manager = TaskManager(storage_path=str(db_path), backend='sqlite', lazy_migrations=True)
+        assert task_manager.get_task('1')['priority'] == 'medium'
+        assert [t['id'] for t in task_manager.get_tasks_by_priority('medium')] == ['1']
+        assert [t['id'] for t in task_manager.filter_tasks(category=None, completed=False)] == ['1']
+
+    def test_migrations_must_be_ordered(self):
+        """Test that a migration cannot be registered behind the current version"""
+        with pytest.raises(ValueError):
+            migration(SCHEMA_VERSION)(lambda task: None)
+
+
+@pytest.mark.unit
+class TestArchive:
+    """Unit tests for the cold archive of long-completed tasks"""
+
+    @pytest.fixture
+    def storage_path(self, temp_dir):
+        path = temp_dir / "tasks.json"
+        long_ago = (datetime.now() - timedelta(days=90)).isoformat()
+        recently = (datetime.now() - timedelta(days=1)).isoformat()
+        tasks = [
+            {'id': 'old', 'text': 'Old report', 'priority': 'low', 'category': None, 'completed': True,
+             'created_at': long_ago, 'modified_at': long_ago, 'completed_at': long_ago},
+            {'id': 'recent', 'text': 'Recent report', 'priority': 'low', 'category': None, 'completed': True,
+             'created_at': recently, 'modified_at': recently, 'completed_at': recently},
+            {'id': 'open', 'text': 'Open report', 'priority': 'low', 'category': None, 'completed': False,
+             'created_at': long_ago, 'modified_at': long_ago, 'completed_at': None}
+        ]
+        with open(path, 'w') as f:
+            json.dump({'schema_version': SCHEMA_VERSION, 'tasks': tasks}, f)
+        return str(path)
+
+    def test_archive_on_startup(self, storage_path):
+        """Test that old completed tasks leave the store but stay queryable"""
+        task_manager = TaskManager(storage_path=storage_path, archive_after_days=30)
+        assert [t['id'] for t in task_manager.get_tasks()] == ['recent', 'open']
+        assert task_manager.get_stats()['completed'] == 1
+        assert os.path.exists(storage_path + ".archive.gz")
+
+        assert [t['id'] for t in task_manager.get_completed_tasks()] == ['recent']
+        completed = task_manager.get_completed_tasks(include_archived=True)
+        assert [t['id'] for t in completed] == ['old', 'recent']
+        assert completed[0]['text'] == 'Old report'
+
+        reloaded = TaskManager(storage_path=storage_path)
+        assert [t['id'] for t in reloaded.get_archived_tasks()] == ['old']
+
+    def test_archive_is_append_only(self, storage_path):
+        """Test that later runs add to the archive without rewriting it"""
+        task_manager = TaskManager(storage_path=storage_path)
+        assert task_manager.archive_completed(30) == 1
+        size = os.path.getsize(storage_path + ".archive.gz")
+
+        assert task_manager.archive_completed(0) == 1
+        assert os.path.getsize(storage_path + ".archive.gz") > size
+        assert [t['id'] for t in task_manager.get_archived_tasks()] == ['old', 'recent']
+        assert task_manager.archive_completed(0) == 0
+
+    def test_interrupted_archive_shows_task_once(self, storage_path):
+        """Test that a task both archived and still stored is listed once"""
+        task_manager = TaskManager(storage_path=storage_path)
+        task_manager._archive.append([task_manager.get_task('old')])
+        completed = task_manager.get_completed_tasks(include_archived=True)
+        assert sorted(t['id'] for t in completed) == ['old', 'recent']
+
+
+@pytest.mark.unit
+class TestWriteBehind:
+    """Unit tests for TaskManager write-behind durability levels"""
+
+    def count_writes(self, task_manager, monkeypatch):
+        writes = []
+        original = task_manager._storage.apply
+        def apply(changes, tasks):
+            writes.append(list(changes))
+            original(changes, tasks)
+        monkeypatch.setattr(task_manager._storage, 'apply', apply)
+        return writes
+
+    def test_async_batches_bursts(self, storage_path, monkeypatch):
+        """Test that a burst of changes is written in a few batched flushes"""
+        task_manager = TaskManager(storage_path=storage_path, backend='journal',
+                                   durability='async', flush_interval_ms=200)
+        writes = self.count_writes(task_manager, monkeypatch)
+        ids = [task_manager.add_task(f"Task {i}") for i in range(20)]
+        for task_id in ids:
+            task_manager.toggle_task(task_id)
+        task_manager.flush()
+
+        assert 1 <= len(writes) < 5
+        # Each task is written once per batch, with its latest state
+        assert sum(len(batch) for batch in writes) <= 2 * len(ids)
+        reloaded = TaskManager(storage_path=storage_path, backend='journal')
+        assert [t['text'] for t in reloaded.get_tasks()] == [f"Task {i}" for i in range(20)]
+        assert all(t['completed'] for t in reloaded.get_tasks())
+        task_manager.close()
+
+    def test_group_waits_for_flush(self, storage_path):
+        """Test that group commit returns only once the change is on disk"""
+        task_manager = TaskManager(storage_path=storage_path, durability='group', flush_interval_ms=20)
+        task_manager.add_task("Durable task")
+
+        with open(storage_path) as f:
+            assert [t['text'] for t in json.load(f)['tasks']] == ["Durable task"]
+        task_manager.close()
+
+    def test_close_flushes(self, storage_path):
+        """Test that close() writes changes still waiting for the flusher"""
+        task_manager = TaskManager(storage_path=storage_path, durability='async', flush_interval_ms=10000)
+        task_manager.add_task("First")
+        task_manager.add_task("Queued")
+        task_manager.close()
+
+        reloaded = TaskManager(storage_path=storage_path)
+        assert [t['text'] for t in reloaded.get_tasks()] == ["First", "Queued"]
+
+    def test_unknown_durability(self, storage_path):
+        """Test that an unknown durability level is rejected"""
+        with pytest.raises(ValueError):
+            TaskManager(storage_path=storage_path, durability='eventually')
+
+    def test_coalesce_keeps_first_position_and_last_value(self):
+        """Test that batched changes collapse to one record per task"""
+        from services.task_manager import _coalesce
+        a1, a2, b = {'id': 'a', 'v': 1}, {'id': 'a', 'v': 2}, {'id': 'b'}
+        changes = [('put', 'a', a1), ('put', 'b', b), ('put', 'a', a2), ('delete', 'c', None)]
+        assert _coalesce(changes) == [('put', 'a', a2), ('put', 'b', b), ('delete', 'c', None)]
+
+        changes = [('put', 'a', a1), ('clear', None, None), ('put', 'b', b)]
+        assert _coalesce(changes) == [('clear', None, None), ('put', 'b', b)]
+
+
+def _add_tasks_in_process(storage_path, backend, worker, count):
+    """Worker for the multi-process test (module level so it can be pickled)"""
+    task_manager = TaskManager(storage_path=storage_path, backend=backend, shared=True)
+    for i in range(count):
+        task_manager.add_task(f"Worker {worker} task {i}")
+    task_manager.close()
+
+
+@pytest.mark.unit
+class TestSharedStore:
+    """Unit tests for several processes sharing one task store"""
+
+    @pytest.mark.parametrize("backend", ['json', 'journal', 'sqlite'])
+    def test_replicas_merge_instead_of_clobbering(self, storage_path, backend):
+        """Test that two managers on one store see and keep each other's writes"""
+        first = TaskManager(storage_path=storage_path, backend=backend, shared=True)
+        second = TaskManager(storage_path=storage_path, backend=backend, shared=True)
+
+        first_id = first.add_task("From first")
+        second.add_task("From second")
+        first.toggle_task(first_id)
+
+        assert [t['text'] for t in second.get_tasks()] == ["From first", "From second"]
+        assert second.get_task(first_id)['completed'] is True
+        assert second.get_stats()['completed'] == 1
+
+        reloaded = TaskManager(storage_path=storage_path, backend=backend)
+        assert [t['text'] for t in reloaded.get_tasks()] == ["From first", "From second"]
+
+    def test_reload_only_on_change(self, storage_path, monkeypatch):
+        """Test that reads skip reloading while nobody else has written"""
+        task_manager = TaskManager(storage_path=storage_path, shared=True)
+        task_manager.add_task("Task")
+        loads = []
+        original = task_manager._storage.load
+        monkeypatch.setattr(task_manager._storage, 'load', lambda: loads.append(1) or original())
+
+        task_manager.get_tasks()
+        task_manager.get_stats()
+        assert loads == []
+
+        TaskManager(storage_path=storage_path, shared=True).add_task("Elsewhere")
+        assert len(task_manager.get_tasks()) == 2
+        assert loads == [1]
+
+    def test_queued_changes_survive_reload(self, storage_path):
+        """Test that async changes not yet flushed are replayed over a reload"""
+        local = TaskManager(storage_path=storage_path, shared=True, durability='async', flush_interval_ms=10000)
+        local.add_task("Flushed right away")
+        local.add_task("Still queued")
+        TaskManager(storage_path=storage_path, shared=True).add_task("From another process")
+
+        assert {t['text'] for t in local.get_tasks()} == {"Flushed right away", "Still queued", "From another process"}
+        local.close()
+        reloaded = TaskManager(storage_path=storage_path)
+        assert len(reloaded.get_tasks()) == 3
+
+    @pytest.mark.parametrize("backend", ['json', 'journal', 'sqlite'])
+    def test_undone_delete_survives_merge(self, storage_path, backend):
+        """Test that a task restored by undo keeps its place when another process writes before the flush"""
+        local = TaskManager(storage_path=storage_path, backend=backend, shared=True,
+                            durability='async', flush_interval_ms=10000)
+        task_ids = local.add_tasks([{'text': f"Task {i}"} for i in range(4)])
+        local.delete_task(task_ids[1])
+        local.flush()
+        assert local.undo()
+        TaskManager(storage_path=storage_path, backend=backend, shared=True).add_task("From another process")
+        local.flush()
+
+        expected = ["Task 0", "Task 1", "Task 2", "Task 3", "From another process"]
+        assert [t['text'] for t in local.get_tasks()] == expected
+        local.close()
+        assert [t['text'] for t in TaskManager(storage_path=storage_path, backend=backend).get_tasks()] == expected
+
+    def test_file_lock_excludes_threads(self, storage_path):
+        """Test that threads sharing one FileLock hold it one at a time, re-entrantly"""
+        import threading
+        import time
+        from services.task_storage import FileLock
+        lock = FileLock(Path(storage_path + ".lock"))
+        holders = []
+        errors = []
+
+        def work():
+            try:
+                for _ in range(50):
+                    with lock:
+                        with lock:
+                            holders.append(threading.get_ident())
+                            time.sleep(0.0005)
+                            assert len(set(holders)) == 1
+                            holders.clear()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        assert lock._file is None
+
+    @pytest.mark.parametrize("backend", ['json', 'journal'])
+    def test_multiple_processes(self, storage_path, backend):
+        """Test concurrent writers in separate processes"""
+        import multiprocessing
+        processes = [
+            multiprocessing.Process(target=_add_tasks_in_process, args=(storage_path, backend, worker, 10))
+            for worker in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        reloaded = TaskManager(storage_path=storage_path, backend=backend)
+        assert len(reloaded.get_tasks()) == 40
@@ -0,0 +1,29 @@
+import pytest
+from services.text_stream import SentenceSplitter, speakable
+
+
+@pytest.mark.unit
+class TestSentenceSplitter:
+    """Unit tests for splitting streamed text into sentences"""
+
+    def test_sentences_complete_across_chunks(self):
+        """Test that a sentence is returned once its end has arrived"""
+        splitter = SentenceSplitter()
+        assert splitter.feed("To add a task, say ") == []
+        assert splitter.feed("'Add a task'.") == []
+        assert splitter.feed(" Then") == ["To add a task, say 'Add a task'."]
+        assert splitter.feed(" check the list! Done") == ["Then check the list!"]
+        assert splitter.flush() == "Done"
+        assert splitter.flush() == ""
+
+    def test_lines_and_numbers(self):
+        """Test that line breaks end sentences and decimals don't"""
+        splitter = SentenceSplitter()
+        sentences = splitter.feed("Steps:\n1. Open the panel\nVersion 1.5 is out. ")
+        sentences += splitter.feed("More")
+        assert sentences == ["Steps:", "1. Open the panel", "Version 1.5 is out."]
+
+    def test_speakable(self):
+        """Test that markdown formatting is removed for speech"""
+        text = "## Adding tasks\n- Click **Record** in [Brain Dump](#brain-dump) mode\n1. Say `add milk`"
+        assert speakable(text) == "Adding tasks Click Record in Brain Dump mode Say add milk"